@@ -1,78 +1,203 @@
 """
 KI-Endpunkte für Textgenerierung
 """
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models.database import Contact
 from app.models.schemas import DraftRequest, DraftResponse
-from app.services.ollama_client import OllamaClient
+from app.services.health_monitor import HealthMonitor, get_health_monitor
+from app.services.ollama_client import (
+    LlmPrompt, OllamaBusyError, OllamaClient, get_ollama_client,
+    letter_draft_prompt, offer_intro_prompt, improve_text_prompt
+)
 
 
 router = APIRouter()
 
 
+async def get_contact_name(db: AsyncSession, contact_id: Optional[int]) -> Optional[str]:
+    """Kontaktname für Personalisierung"""
+    if not contact_id:
+        return None
+    result = await db.execute(
+        select(Contact).where(Contact.id == contact_id)
+    )
+    contact = result.scalar_one_or_none()
+    if not contact:
+        return None
+    return contact.company_name or f"{contact.first_name} {contact.last_name}"
+
+
+def draft_prompt(request: DraftRequest, contact_name: Optional[str]) -> LlmPrompt:
+    """Wählt den Prompt passend zum Dokumenttyp"""
+    if request.doc_type == "offer_intro":
+        return offer_intro_prompt(
+            context=request.context,
+            contact_name=contact_name
+        )
+    return letter_draft_prompt(
+        context=request.context,
+        tone=request.tone,
+        contact_name=contact_name
+    )
+
+
+def busy_exception(e: OllamaBusyError) -> HTTPException:
+    """429 mit Warteposition und Retry-After-Hinweis"""
+    return HTTPException(
+        status_code=429,
+        detail={
+            "message": "Ollama ist ausgelastet, bitte später erneut versuchen",
+            "queue_position": e.queue_position,
+            "retry_after": e.retry_after
+        },
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_generation(
+    http_request: Request,
+    client: OllamaClient,
+    monitor: HealthMonitor,
+    prompt: LlmPrompt,
+    bypass_cache: bool = False
+) -> StreamingResponse:
+    """
+    Reicht den Token-Stream von Ollama als Server-Sent Events weiter.
+    
+    Events: ``token`` (``{"text": ...}``), abschließend ``done`` mit dem
+    Modell oder ``error``. Trennt der Client die Verbindung, wird der
+    Upstream-Stream geschlossen. Ist die Warteschlange voll, antwortet der
+    Endpunkt sofort mit 429.
+    """
+    try:
+        client.scheduler.check_capacity()
+    except OllamaBusyError as e:
+        raise busy_exception(e)
+    
+    async def events():
+        tokens = client.generate_stream(*prompt, bypass_cache=bypass_cache)
+        try:
+            async for token in tokens:
+                if await http_request.is_disconnected():
+                    break
+                yield sse_event("token", {"text": token})
+            else:
+                yield sse_event("done", {"model": client.model})
+        except Exception as e:
+            if isinstance(e, httpx.TransportError):
+                monitor.report_failure("ollama")
+            yield sse_event("error", {"detail": f"Generierung fehlgeschlagen: {str(e)}"})
+        finally:
+            await tokens.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/draft", response_model=DraftResponse)
 async def generate_draft(
     request: DraftRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    client: OllamaClient = Depends(get_ollama_client),
+    monitor: HealthMonitor = Depends(get_health_monitor)
 ):
     """Generiert einen Textentwurf mit KI"""
-    client = OllamaClient()
-    
-    if not await client.is_available():
+    if not await monitor.is_available("ollama"):
         raise HTTPException(status_code=503, detail="Ollama nicht erreichbar")
     
-    # Kontaktname für Personalisierung
-    contact_name = None
-    if request.contact_id:
-        result = await db.execute(
-            select(Contact).where(Contact.id == request.contact_id)
-        )
-        contact = result.scalar_one_or_none()
-        if contact:
-            contact_name = contact.company_name or f"{contact.first_name} {contact.last_name}"
+    contact_name = await get_contact_name(db, request.contact_id)
     
     try:
-        if request.doc_type == "letter":
-            text = await client.generate_letter_draft(
-                context=request.context,
-                tone=request.tone,
-                contact_name=contact_name
-            )
-        elif request.doc_type == "offer_intro":
-            text = await client.generate_offer_intro(
-                context=request.context,
-                contact_name=contact_name
-            )
-        else:
-            text = await client.generate_letter_draft(
-                context=request.context,
-                tone=request.tone,
-                contact_name=contact_name
-            )
+        text = await client.generate(
+            *draft_prompt(request, contact_name),
+            bypass_cache=request.bypass_cache
+        )
         
         return DraftResponse(
             text=text.strip(),
             model=client.model
         )
         
+    except OllamaBusyError as e:
+        raise busy_exception(e)
     except Exception as e:
+        if isinstance(e, httpx.TransportError):
+            monitor.report_failure("ollama")
         raise HTTPException(status_code=500, detail=f"Generierung fehlgeschlagen: {str(e)}")
 
 
+@router.post("/draft/stream")
+async def stream_draft(
+    request: DraftRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    client: OllamaClient = Depends(get_ollama_client),
+    monitor: HealthMonitor = Depends(get_health_monitor)
+):
+    """Wie ``/draft``, liefert den Text aber tokenweise als Server-Sent Events"""
+    if not await monitor.is_available("ollama"):
+        raise HTTPException(status_code=503, detail="Ollama nicht erreichbar")
+    
+    contact_name = await get_contact_name(db, request.contact_id)
+    return stream_generation(
+        http_request, client, monitor,
+        draft_prompt(request, contact_name),
+        bypass_cache=request.bypass_cache
+    )
+
+
 @router.post("/improve")
-async def improve_text(text: str):
+async def improve_text(
+    text: str,
+    bypass_cache: bool = False,
+    client: OllamaClient = Depends(get_ollama_client),
+    monitor: HealthMonitor = Depends(get_health_monitor)
+):
     """Verbessert/korrigiert einen Text"""
-    client = OllamaClient()
-    
-    if not await client.is_available():
+    if not await monitor.is_available("ollama"):
         raise HTTPException(status_code=503, detail="Ollama nicht erreichbar")
     
     try:
-        improved = await client.improve_text(text)
+        improved = await client.improve_text(text, bypass_cache=bypass_cache)
         return {"original": text, "improved": improved.strip()}
+    except OllamaBusyError as e:
+        raise busy_exception(e)
     except Exception as e:
+        if isinstance(e, httpx.TransportError):
+            monitor.report_failure("ollama")
         raise HTTPException(status_code=500, detail=f"Verbesserung fehlgeschlagen: {str(e)}")
+
+
+@router.post("/improve/stream")
+async def stream_improve_text(
+    text: str,
+    http_request: Request,
+    bypass_cache: bool = False,
+    client: OllamaClient = Depends(get_ollama_client),
+    monitor: HealthMonitor = Depends(get_health_monitor)
+):
+    """Wie ``/improve``, liefert den Text aber tokenweise als Server-Sent Events"""
+    if not await monitor.is_available("ollama"):
+        raise HTTPException(status_code=503, detail="Ollama nicht erreichbar")
+    
+    return stream_generation(
+        http_request, client, monitor,
+        improve_text_prompt(text),
+        bypass_cache=bypass_cache
+    )
@@ -1,36 +1,67 @@
 """
 Kontakte API
 """
-from fastapi import APIRouter, Depends, HTTPException
+from operator import attrgetter
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.exc import IntegrityError
 
-from app.database import get_db
-from app.models.database import Contact, Document
+from app.api.pagination import decode_cursor, set_next_cursor
+from app.database import get_db, get_read_db
+from app.models.database import Contact, Document, contact_sort_name
 from app.models.schemas import ContactCreate, ContactUpdate, ContactResponse
 
 
 router = APIRouter()
 
 
+def contact_list_query(
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple[str, int]] = None
+):
+    """
+    Abfrage für die Kontaktliste, sortiert nach Name und ID.
+    
+    Liefert ``(Contact, sort_name)``; die Sortierung nutzt den Index
+    ``ix_contacts_sort_name``. ``after`` setzt hinter dem Schlüssel der
+    vorigen Seite fort.
+    """
+    sort_name = contact_sort_name.label("sort_name")
+    query = select(Contact, sort_name)
+    if after:
+        query = query.where(tuple_(contact_sort_name, Contact.id) > tuple_(*after))
+    return query.order_by(contact_sort_name, Contact.id).offset(skip).limit(limit)
+
+
 @router.get("/", response_model=list[ContactResponse])
 async def list_contacts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Liste aller Kontakte"""
-    result = await db.execute(
-        select(Contact).offset(skip).limit(limit)
-    )
-    return result.scalars().all()
+    """
+    Liste aller Kontakte, alphabetisch.
+    
+    Die nächste Seite liefert ``?cursor=`` mit dem Wert aus dem Header
+    ``X-Next-Cursor``; ``skip`` funktioniert weiterhin.
+    """
+    after = tuple(decode_cursor(cursor, str, int)) if cursor else None
+    result = await db.execute(contact_list_query(skip, limit, after))
+    rows = result.all()
+    set_next_cursor(response, rows, limit, attrgetter("sort_name"), lambda row: row.Contact.id)
+    return [row.Contact for row in rows]
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def get_contact(
     contact_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Einzelnen Kontakt abrufen"""
     result = await db.execute(
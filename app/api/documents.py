@@ -1,24 +1,46 @@
 """
 Dokumente API - Briefe, Rechnungen, Angebote
 """
+import asyncio
+import logging
+import time
 from datetime import datetime, timedelta, date
+from operator import attrgetter
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy import select
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import case, delete, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models.database import Contact, Document, NumberSequence
+from app.api.pagination import decode_cursor, set_next_cursor
+from app.database import get_db, get_read_db, get_read_sessionmaker
+from app.models.database import Contact, Document, Job, NumberSequence
 from app.models.schemas import (
-    LetterCreate, InvoiceCreate, OfferCreate, DocumentResponse
+    LetterCreate, InvoiceCreate, OfferCreate, DocumentResponse,
+    InvoiceBatchCreate, InvoiceBatchResponse, BatchItemResult, JobResponse,
+    ArchiveBatchRequest, ArchiveBatchItem, ArchiveBatchResponse
 )
+from app.services.archive_jobs import ARCHIVABLE_STATUSES, archive_payload, claim_for_archive
+from app.services.health_monitor import HealthMonitor, get_health_monitor
+from app.services.job_queue import TERMINAL_STATES, get_job_queue, new_job
+from app.services.money import compute_totals
+from app.services.pdf_delivery import (
+    attach_pdf, cache_control, etag_for, etag_matches, file_sha256, pdf_response
+)
+from app.services.thumbnails import MEDIA_TYPES, ThumbnailError, get_thumbnail
+from app.services.preview import PREVIEW_NUMBER, PreviewFormat, get_preview_debouncer, render_preview
+from app.services.render_jobs import render_job_payload
 from app.services.typst_renderer import TypstRenderer
-from app.services.paperless_client import PaperlessClient
 from app.settings import get_settings
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 def to_datetime(d) -> datetime:
@@ -32,29 +54,128 @@ def to_datetime(d) -> datetime:
     return datetime.now()
 
 
-async def get_next_number(
+# Wiederholungen bei gesperrter Datenbank (SQLite: "database is locked")
+NUMBER_RETRIES = 5
+
+
+async def _bump_sequence(
     db: AsyncSession,
-    prefix: str
-) -> str:
-    """Generiert die nächste Dokumentennummer"""
+    prefix: str,
+    year: int,
+    count: int
+) -> Optional[int]:
+    """
+    Erhöht den Nummernkreis atomar um ``count`` und liefert die neue
+    letzte Nummer. Beim Jahreswechsel beginnt der Kreis wieder bei 1.
+    """
+    result = await db.execute(
+        update(NumberSequence)
+        .where(NumberSequence.prefix == prefix, NumberSequence.year <= year)
+        .values(
+            last_number=case(
+                (NumberSequence.year == year, NumberSequence.last_number + count),
+                else_=count
+            ),
+            year=year
+        )
+        .returning(NumberSequence.last_number)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _create_sequence(db: AsyncSession, prefix: str, year: int) -> None:
+    """Legt einen Nummernkreis an, falls er (noch) nicht existiert"""
+    dialect = db.get_bind().dialect.name
+    values = {"prefix": prefix, "year": year, "last_number": 0}
+    if dialect == "sqlite":
+        stmt = sqlite_insert(NumberSequence).values(**values).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        stmt = postgresql_insert(NumberSequence).values(**values).on_conflict_do_nothing()
+    else:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(NumberSequence).values(**values))
+        except IntegrityError:
+            pass
+        return
+    await db.execute(stmt)
+
+
+async def reserve_numbers(
+    db: AsyncSession,
+    prefix: str,
+    count: int
+) -> list[str]:
+    """
+    Reserviert einen zusammenhängenden Block von Dokumentennummern.
+    
+    Die Vergabe ist ein einzelnes ``UPDATE ... RETURNING`` auf den
+    Nummernkreis, parallele Anfragen erhalten daher nie dieselbe Nummer.
+    Die Transaktion wird sofort committet, um die Schreibsperre kurz zu
+    halten; bei gesperrter Datenbank wird mit Backoff wiederholt.
+    """
     year = datetime.now().year
     
+    for attempt in range(NUMBER_RETRIES):
+        try:
+            last_number = await _bump_sequence(db, prefix, year, count)
+            if last_number is None:
+                await _create_sequence(db, prefix, year)
+                last_number = await _bump_sequence(db, prefix, year, count)
+            if last_number is None:
+                raise RuntimeError(f"Nummernkreis {prefix} für {year} nicht verfügbar")
+            await db.commit()
+            break
+        except OperationalError:
+            await db.rollback()
+            if attempt == NUMBER_RETRIES - 1:
+                raise
+            await asyncio.sleep(0.05 * 2 ** attempt)
+    
+    first = last_number - count + 1
+    return [f"{prefix}-{year}-{n:04d}" for n in range(first, last_number + 1)]
+
+
+async def release_numbers(db: AsyncSession, numbers: list[str], used: int) -> bool:
+    """
+    Gibt die ungenutzten Nummern am Ende eines reservierten Blocks frei.
+    
+    Klappt nur, solange niemand nach dem Block reserviert hat (bedingtes
+    Update auf die letzte Nummer des Blocks); sonst bleiben sie als Lücke
+    und es wird gewarnt.
+    """
+    if used >= len(numbers):
+        return True
+    prefix, year, first = numbers[0].rsplit("-", 2)
+    block_last = int(first) + len(numbers) - 1
     result = await db.execute(
-        select(NumberSequence).where(
+        update(NumberSequence)
+        .where(
             NumberSequence.prefix == prefix,
-            NumberSequence.year == year
+            NumberSequence.year == int(year),
+            NumberSequence.last_number == block_last
         )
+        .values(last_number=int(first) + used - 1)
+        .execution_options(synchronize_session=False)
     )
-    seq = result.scalar_one_or_none()
-    
-    if not seq:
-        seq = NumberSequence(prefix=prefix, year=year, last_number=0)
-        db.add(seq)
-    
-    seq.last_number += 1
     await db.commit()
-    
-    return f"{prefix}-{year}-{seq.last_number:04d}"
+    if result.rowcount != 1:
+        logger.warning(
+            "Nummern %s bis %s bleiben ungenutzt (Nummernkreis inzwischen weitergezählt)",
+            numbers[used], numbers[-1]
+        )
+        return False
+    return True
+
+
+async def get_next_number(
+    db: AsyncSession,
+    prefix: str
+) -> str:
+    """Generiert die nächste Dokumentennummer"""
+    numbers = await reserve_numbers(db, prefix, 1)
+    return numbers[0]
 
 
 async def get_contact_or_404(db: AsyncSession, contact_id: int) -> Contact:
@@ -86,34 +207,121 @@ def contact_to_dict(contact: Contact) -> dict:
     }
 
 
+async def finish_document(
+    db: AsyncSession,
+    doc: Document,
+    render_method: str,
+    render_args: dict,
+    background: bool = False
+):
+    """
+    Rendert das PDF und speichert das Dokument.
+    
+    Mit ``background`` wird das Dokument sofort im Status ``rendering``
+    gespeichert und ein Render-Job eingereiht; die Antwort ist dann
+    ``202 Accepted`` mit dem Job, dessen Status über
+    ``GET /api/documents/jobs/{id}`` abgefragt werden kann.
+    """
+    if background:
+        doc.status = "rendering"
+        db.add(doc)
+        await db.flush()
+        
+        job = new_job("render", doc.id, render_job_payload(render_method, render_args))
+        db.add(job)
+        await db.commit()
+        
+        get_job_queue().enqueue(job.id)
+        response = job_to_response(job, doc)
+        return JSONResponse(status_code=202, content=jsonable_encoder(response))
+    
+    renderer = TypstRenderer()
+    
+    try:
+        pdf_path = await getattr(renderer, render_method)(**render_args)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF-Fehler: {str(e)}")
+    
+    await attach_pdf(doc, pdf_path)
+    db.add(doc)
+    await db.commit()
+    await db.refresh(doc)
+    
+    return doc
+
+
+def job_to_response(job: Job, doc: Optional[Document] = None) -> JobResponse:
+    response = JobResponse.model_validate(job)
+    if doc is not None:
+        response.document = DocumentResponse.model_validate(doc)
+    return response
+
+
+async def get_job_or_404(db: AsyncSession, job_id: str) -> Job:
+    job = await db.get(Job, job_id, populate_existing=True)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return job
+
+
 # =============================================================================
 # LIST / GET
 # =============================================================================
 
-@router.get("/", response_model=list[DocumentResponse])
-async def list_documents(
-    doc_type: str = None,
-    status: str = None,
+def document_list_query(
+    doc_type: Optional[str] = None,
+    status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    after: Optional[tuple[datetime, int]] = None
 ):
-    """Liste aller Dokumente"""
+    """
+    Abfrage für die Dokumentliste, neueste zuerst.
+    
+    Filter und Sortierung passen zu den Indizes ``ix_documents_created_at``,
+    ``ix_documents_doc_type_created_at`` und ``ix_documents_status_created_at``
+    (SQLite hängt die ID als letzte Indexspalte an). ``after`` setzt die
+    Liste hinter dem Schlüssel ``(created_at, id)`` der vorigen Seite fort.
+    """
     query = select(Document)
     if doc_type:
         query = query.where(Document.doc_type == doc_type)
     if status:
         query = query.where(Document.status == status)
-    query = query.order_by(Document.created_at.desc()).offset(skip).limit(limit)
+    if after:
+        query = query.where(tuple_(Document.created_at, Document.id) < tuple_(*after))
+    query = query.order_by(Document.created_at.desc(), Document.id.desc())
+    return query.offset(skip).limit(limit)
+
+
+@router.get("/", response_model=list[DocumentResponse])
+async def list_documents(
+    response: Response,
+    doc_type: str = None,
+    status: str = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Liste aller Dokumente.
     
-    result = await db.execute(query)
-    return result.scalars().all()
+    Ist die Seite voll, enthält der Header ``X-Next-Cursor`` einen Cursor,
+    mit dem ``?cursor=...`` die nächste Seite liefert – unabhängig davon,
+    wie weit geblättert wurde. ``skip`` funktioniert weiterhin.
+    """
+    after = tuple(decode_cursor(cursor, datetime, int)) if cursor else None
+    result = await db.execute(document_list_query(doc_type, status, skip, limit, after))
+    docs = result.scalars().all()
+    set_next_cursor(response, docs, limit, attrgetter("created_at"), attrgetter("id"))
+    return docs
 
 
 @router.get("/{doc_id}", response_model=DocumentResponse)
 async def get_document(
     doc_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Einzelnes Dokument abrufen"""
     result = await db.execute(
@@ -128,9 +336,16 @@ async def get_document(
 @router.get("/{doc_id}/pdf")
 async def get_document_pdf(
     doc_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """PDF eines Dokuments herunterladen"""
+    """
+    PDF eines Dokuments herunterladen.
+    
+    Unterstützt ``If-None-Match`` (ETag = SHA-256 des Inhalts) und
+    ``Range``. Mit ``?v=<pdf_sha256>`` ist die Antwort fertiger Dokumente
+    dauerhaft cachebar (``immutable``).
+    """
     result = await db.execute(
         select(Document).where(Document.id == doc_id)
     )
@@ -142,10 +357,98 @@ async def get_document_pdf(
     if not pdf_path.exists():
         raise HTTPException(status_code=404, detail="PDF-Datei nicht gefunden")
     
-    return FileResponse(
-        pdf_path,
-        media_type="application/pdf",
-        filename=f"{doc.doc_number}.pdf"
+    settings = get_settings()
+    return await pdf_response(request, doc, pdf_path, settings.server, Path(settings.typst.output_dir))
+
+
+@router.get("/{doc_id}/thumbnail")
+async def get_document_thumbnail(
+    doc_id: int,
+    request: Request,
+    width: Optional[int] = Query(default=None, ge=16),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Vorschaubild der ersten Seite (PNG/JPEG, Breite ``width`` in Pixel).
+    
+    Wird beim ersten Abruf erzeugt und unter ``<work_dir>/derivatives``
+    abgelegt. Cache-Verhalten wie beim PDF (ETag, ``?v=<pdf_sha256>``).
+    """
+    settings = get_settings()
+    thumbnails = settings.thumbnails
+    if not thumbnails.enabled:
+        raise HTTPException(status_code=404, detail="Vorschaubilder sind deaktiviert")
+    width = min(width or thumbnails.width, thumbnails.max_width)
+    
+    doc = await db.get(Document, doc_id)
+    if not doc or not doc.pdf_path:
+        raise HTTPException(status_code=404, detail="Dokument nicht gefunden")
+    pdf_path = Path(doc.pdf_path)
+    if not pdf_path.exists():
+        raise HTTPException(status_code=404, detail="PDF-Datei nicht gefunden")
+    
+    sha256 = doc.pdf_sha256 or await asyncio.to_thread(file_sha256, pdf_path)
+    headers = {
+        "ETag": etag_for(f"{sha256}-{width}-{thumbnails.format}"),
+        "Cache-Control": cache_control(doc, request.query_params.get("v")),
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        image = await get_thumbnail(pdf_path, sha256, width)
+    except ThumbnailError as e:
+        raise HTTPException(status_code=503, detail=f"Vorschaubild nicht verfügbar: {e}")
+    
+    return Response(content=image, media_type=MEDIA_TYPES[thumbnails.format], headers=headers)
+
+
+# =============================================================================
+# HINTERGRUND-JOBS
+# =============================================================================
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Status eines Hintergrund-Jobs inkl. Dokument (``pdf_path``)"""
+    job = await get_job_or_404(db, job_id)
+    doc = await db.get(Document, job.document_id, populate_existing=True) if job.document_id else None
+    return job_to_response(job, doc)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Server-Sent Events mit jeder Statusänderung bis zum Abschluss"""
+    await get_job_or_404(db, job_id)
+    poll_interval = get_settings().jobs.poll_interval
+    
+    async def events():
+        # Eigene Session: die Request-Session ist beim Streamen bereits geschlossen
+        async with get_read_sessionmaker()() as stream_db:
+            last_status = None
+            while not await request.is_disconnected():
+                job = await get_job_or_404(stream_db, job_id)
+                if job.status != last_status:
+                    last_status = job.status
+                    doc = await stream_db.get(Document, job.document_id, populate_existing=True) if job.document_id else None
+                    payload = job_to_response(job, doc).model_dump_json()
+                    yield f"event: {job.status}\ndata: {payload}\n\n"
+                if job.status in TERMINAL_STATES:
+                    break
+                # Lesetransaktion beenden, damit neue Commits sichtbar werden
+                await stream_db.rollback()
+                await asyncio.sleep(poll_interval)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -153,72 +456,74 @@ async def get_document_pdf(
 # BRIEF
 # =============================================================================
 
-@router.post("/letter", response_model=DocumentResponse)
-async def create_letter(
+def prepare_letter(
     letter: LetterCreate,
-    db: AsyncSession = Depends(get_db)
-):
-    """Brief erstellen (Geschäfts- oder Privatbrief)"""
+    contact: Contact,
+    doc_number: str
+) -> tuple[Document, dict]:
+    """
+    Baut das Brief-Dokument (noch ohne PDF) und die Parameter für
+    ``TypstRenderer.render_letter``.
+    """
     settings = get_settings()
-    contact = await get_contact_or_404(db, letter.contact_id)
-    
-    # Prefix je nach Brieftyp
-    prefix = "BRF" if letter.letter_type == "business" else "PRV"
-    doc_number = await get_next_number(db, prefix)
     doc_date = to_datetime(letter.doc_date)
     
-    # Absenderdaten je nach Brieftyp
-    sender_data = settings.get_sender(letter.letter_type)
-    
-    renderer = TypstRenderer()
-    
-    try:
-        pdf_path = renderer.render_letter(
-            sender=sender_data,
-            contact=contact_to_dict(contact),
-            subject=letter.subject,
-            content=letter.content,
-            doc_number=doc_number,
-            doc_date=doc_date,
-            letter_type=letter.letter_type
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF-Fehler: {str(e)}")
-    
     # Dokumenttyp speichern (letter_business oder letter_private)
-    doc_type = f"letter_{letter.letter_type}"
-    
     doc = Document(
-        doc_type=doc_type,
+        doc_type=f"letter_{letter.letter_type}",
         doc_number=doc_number,
         contact_id=contact.id,
         subject=letter.subject,
         content=letter.content,
         doc_date=doc_date,
-        status="final",
-        pdf_path=str(pdf_path)
+        status="final"
     )
-    db.add(doc)
-    await db.commit()
-    await db.refresh(doc)
     
-    return doc
+    render_args = {
+        # Absenderdaten je nach Brieftyp
+        "sender": settings.get_sender(letter.letter_type),
+        "contact": contact_to_dict(contact),
+        "subject": letter.subject,
+        "content": letter.content,
+        "doc_number": doc_number,
+        "doc_date": doc_date,
+        "letter_type": letter.letter_type
+    }
+    return doc, render_args
+
+
+@router.post("/letter", response_model=DocumentResponse)
+async def create_letter(
+    letter: LetterCreate,
+    background: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Brief erstellen (Geschäfts- oder Privatbrief)"""
+    contact = await get_contact_or_404(db, letter.contact_id)
+    
+    # Prefix je nach Brieftyp
+    prefix = "BRF" if letter.letter_type == "business" else "PRV"
+    doc_number = await get_next_number(db, prefix)
+    doc, render_args = prepare_letter(letter, contact, doc_number)
+    
+    return await finish_document(db, doc, "render_letter", render_args, background)
 
 
 # =============================================================================
 # RECHNUNG
 # =============================================================================
 
-@router.post("/invoice", response_model=DocumentResponse)
-async def create_invoice(
+def prepare_invoice(
     invoice: InvoiceCreate,
-    db: AsyncSession = Depends(get_db)
-):
-    """Rechnung erstellen"""
+    contact: Contact,
+    doc_number: str
+) -> tuple[Document, dict]:
+    """
+    Baut das Rechnungs-Dokument (noch ohne PDF) und die Parameter für
+    ``TypstRenderer.render_invoice``.
+    """
     settings = get_settings()
-    contact = await get_contact_or_404(db, invoice.contact_id)
     
-    doc_number = await get_next_number(db, "RG")
     doc_date = to_datetime(invoice.doc_date)
     due_date = doc_date + timedelta(days=invoice.due_days)
     
@@ -228,36 +533,8 @@ async def create_invoice(
     # Kleinunternehmer-Flag aus Config
     kleinunternehmer = settings.sender.kleinunternehmer
     
-    # Beträge berechnen
-    net_total = sum(p["quantity"] * p["unit_price"] for p in positions)
-    if kleinunternehmer:
-        vat_total = 0
-        gross_total = net_total
-    else:
-        vat_total = sum(
-            p["quantity"] * p["unit_price"] * (p.get("vat_rate", 19) / 100) 
-            for p in positions
-        )
-        gross_total = net_total + vat_total
-    
-    # Rechnungen immer mit geschäftlichen Absenderdaten
-    sender_data = settings.get_sender("business")
-    
-    renderer = TypstRenderer()
-    
-    try:
-        pdf_path = renderer.render_invoice(
-            sender=sender_data,
-            contact=contact_to_dict(contact),
-            positions=positions,
-            doc_number=doc_number,
-            doc_date=doc_date,
-            due_date=due_date,
-            notes=invoice.notes or "",
-            kleinunternehmer=kleinunternehmer
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF-Fehler: {str(e)}")
+    # Beträge einmal berechnen, für Datenbank und PDF
+    totals = compute_totals(positions, kleinunternehmer)
     
     doc = Document(
         doc_type="invoice",
@@ -265,35 +542,151 @@ async def create_invoice(
         contact_id=contact.id,
         subject=f"Rechnung {doc_number}",
         positions=positions,
-        net_total=net_total,
-        vat_total=vat_total,
-        gross_total=gross_total,
+        **totals.document_fields(),
         doc_date=doc_date,
         due_date=due_date,
-        status="final",
-        pdf_path=str(pdf_path)
+        status="final"
     )
-    db.add(doc)
-    await db.commit()
-    await db.refresh(doc)
     
-    return doc
+    render_args = {
+        # Rechnungen immer mit geschäftlichen Absenderdaten
+        "sender": settings.get_sender("business"),
+        "contact": contact_to_dict(contact),
+        "positions": positions,
+        "doc_number": doc_number,
+        "doc_date": doc_date,
+        "due_date": due_date,
+        "notes": invoice.notes or "",
+        "kleinunternehmer": kleinunternehmer,
+        "totals": totals
+    }
+    return doc, render_args
+
+
+@router.post("/invoice", response_model=DocumentResponse)
+async def create_invoice(
+    invoice: InvoiceCreate,
+    background: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Rechnung erstellen"""
+    contact = await get_contact_or_404(db, invoice.contact_id)
+    
+    doc_number = await get_next_number(db, "RG")
+    doc, render_args = prepare_invoice(invoice, contact, doc_number)
+    
+    return await finish_document(db, doc, "render_invoice", render_args, background)
+
+
+@router.post("/invoice/batch", response_model=InvoiceBatchResponse)
+async def create_invoice_batch(
+    batch: InvoiceBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Mehrere Rechnungen in einem Durchgang erstellen.
+    
+    Kontakte werden gesammelt geladen, die Rechnungsnummern als Block
+    reserviert und die PDFs parallel gerendert. Fehler einzelner
+    Positionen brechen den Batch nicht ab, sondern erscheinen im
+    jeweiligen Ergebnis.
+    
+    Der Nummernkreis bleibt lückenlos: schlägt ein Render fehl, rücken die
+    folgenden Rechnungen auf (und werden mit ihrer neuen Nummer erneut
+    gerendert), die übrigen Nummern am Blockende werden freigegeben.
+    Scheitert das Speichern, werden die PDFs gelöscht und der ganze Block
+    freigegeben.
+    """
+    contact_ids = {item.contact_id for item in batch.items}
+    result = await db.execute(
+        select(Contact).where(Contact.id.in_(contact_ids))
+    )
+    contacts = {c.id: c for c in result.scalars().all()}
+    
+    results: list[BatchItemResult] = [
+        BatchItemResult(index=i, status="failed", error="Kontakt nicht gefunden")
+        for i in range(len(batch.items))
+    ]
+    candidates = [i for i, item in enumerate(batch.items) if item.contact_id in contacts]
+    numbers = await reserve_numbers(db, "RG", len(candidates)) if candidates else []
+    
+    renderer = TypstRenderer()
+    docs: dict[int, Document] = {}
+    paths: dict[int, Path] = {}
+    superseded: list[Path] = []
+    while True:
+        # Nummern in Reihenfolge an die verbliebenen Positionen vergeben;
+        # gerendert wird nur, wessen Nummer sich geändert hat
+        prepared = {
+            i: prepare_invoice(batch.items[i], contacts[batch.items[i].contact_id], number)
+            for i, number in zip(candidates, numbers)
+            if i not in docs or docs[i].doc_number != number
+        }
+        if not prepared:
+            break
+        
+        rendered = await asyncio.gather(
+            *(renderer.render_invoice(**render_args) for _, render_args in prepared.values()),
+            return_exceptions=True
+        )
+        for (i, (doc, _)), outcome in zip(prepared.items(), rendered):
+            if i in paths:
+                superseded.append(paths.pop(i))
+                del docs[i]
+            if isinstance(outcome, Exception):
+                results[i].error = f"PDF-Fehler: {str(outcome)}"
+                candidates.remove(i)
+                continue
+            docs[i] = doc
+            paths[i] = outcome
+    
+    # PDFs mit überholter Nummer entfernen (sofern nicht neu belegt)
+    for path in set(superseded) - set(paths.values()):
+        path.unlink(missing_ok=True)
+    
+    try:
+        for i, doc in docs.items():
+            await attach_pdf(doc, paths[i])
+        db.add_all(docs.values())
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        for path in paths.values():
+            path.unlink(missing_ok=True)
+        await release_numbers(db, numbers, 0)
+        raise
+    
+    await release_numbers(db, numbers, len(candidates))
+    
+    for i, doc in docs.items():
+        results[i] = BatchItemResult(
+            index=i,
+            status="created",
+            document=DocumentResponse.model_validate(doc)
+        )
+    
+    return InvoiceBatchResponse(
+        created=len(docs),
+        failed=len(results) - len(docs),
+        results=results
+    )
 
 
 # =============================================================================
 # ANGEBOT
 # =============================================================================
 
-@router.post("/offer", response_model=DocumentResponse)
-async def create_offer(
+def prepare_offer(
     offer: OfferCreate,
-    db: AsyncSession = Depends(get_db)
-):
-    """Angebot erstellen"""
+    contact: Contact,
+    doc_number: str
+) -> tuple[Document, dict]:
+    """
+    Baut das Angebots-Dokument (noch ohne PDF) und die Parameter für
+    ``TypstRenderer.render_offer``.
+    """
     settings = get_settings()
-    contact = await get_contact_or_404(db, offer.contact_id)
     
-    doc_number = await get_next_number(db, "ANG")
     doc_date = to_datetime(offer.doc_date)
     valid_until = doc_date + timedelta(days=offer.valid_days)
     
@@ -303,38 +696,8 @@ async def create_offer(
     # Kleinunternehmer-Flag aus Config
     kleinunternehmer = settings.sender.kleinunternehmer
     
-    # Beträge berechnen
-    net_total = sum(p["quantity"] * p["unit_price"] for p in positions)
-    if kleinunternehmer:
-        vat_total = 0
-        gross_total = net_total
-    else:
-        vat_total = sum(
-            p["quantity"] * p["unit_price"] * (p.get("vat_rate", 19) / 100) 
-            for p in positions
-        )
-        gross_total = net_total + vat_total
-    
-    # Angebote immer mit geschäftlichen Absenderdaten
-    sender_data = settings.get_sender("business")
-    
-    renderer = TypstRenderer()
-    
-    try:
-        pdf_path = renderer.render_offer(
-            sender=sender_data,
-            contact=contact_to_dict(contact),
-            subject=offer.subject,
-            positions=positions,
-            doc_number=doc_number,
-            doc_date=doc_date,
-            valid_until=valid_until,
-            prepayment_percent=offer.prepayment_percent,
-            notes=offer.notes or "",
-            kleinunternehmer=kleinunternehmer
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF-Fehler: {str(e)}")
+    # Beträge einmal berechnen, für Datenbank und PDF
+    totals = compute_totals(positions, kleinunternehmer)
     
     doc = Document(
         doc_type="offer",
@@ -342,31 +705,237 @@ async def create_offer(
         contact_id=contact.id,
         subject=offer.subject,
         positions=positions,
-        net_total=net_total,
-        vat_total=vat_total,
-        gross_total=gross_total,
+        **totals.document_fields(),
         doc_date=doc_date,
         valid_until=valid_until,
-        status="final",
-        pdf_path=str(pdf_path)
+        status="final"
     )
-    db.add(doc)
-    await db.commit()
-    await db.refresh(doc)
     
-    return doc
+    render_args = {
+        # Angebote immer mit geschäftlichen Absenderdaten
+        "sender": settings.get_sender("business"),
+        "contact": contact_to_dict(contact),
+        "subject": offer.subject,
+        "positions": positions,
+        "doc_number": doc_number,
+        "doc_date": doc_date,
+        "valid_until": valid_until,
+        "prepayment_percent": offer.prepayment_percent,
+        "notes": offer.notes or "",
+        "kleinunternehmer": kleinunternehmer,
+        "totals": totals
+    }
+    return doc, render_args
+
+
+@router.post("/offer", response_model=DocumentResponse)
+async def create_offer(
+    offer: OfferCreate,
+    background: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Angebot erstellen"""
+    contact = await get_contact_or_404(db, offer.contact_id)
+    
+    doc_number = await get_next_number(db, "ANG")
+    doc, render_args = prepare_offer(offer, contact, doc_number)
+    
+    return await finish_document(db, doc, "render_offer", render_args, background)
+
+
+# =============================================================================
+# VORSCHAU
+# =============================================================================
+
+PREVIEW_MEDIA_TYPES = {"png": "image/png", "pdf": "application/pdf"}
+
+PREVIEW_SESSION_HEADER = "X-Preview-Session"
+
+
+async def preview_response(
+    request: Request,
+    method: str,
+    render_args: dict,
+    fmt: PreviewFormat
+) -> Response:
+    """
+    Rendert einen Entwurf; mit ``X-Preview-Session`` wird entprellt.
+    
+    Eine von einer neueren Anfrage derselben Sitzung überholte Anfrage
+    endet mit ``204 No Content``.
+    """
+    settings = get_settings().typst
+    session = request.headers.get(PREVIEW_SESSION_HEADER)
+    
+    async with get_preview_debouncer().turn(session, settings.preview_debounce) as latest:
+        if not latest:
+            return Response(status_code=204)
+        started = time.perf_counter()
+        try:
+            content = await render_preview(method, render_args, fmt)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Vorschau-Fehler: {str(e)}")
+    
+    return Response(
+        content=content,
+        media_type=PREVIEW_MEDIA_TYPES[fmt],
+        headers={
+            "Cache-Control": "no-store",
+            "Server-Timing": f"render;dur={(time.perf_counter() - started) * 1000:.0f}",
+        }
+    )
+
+
+@router.post("/preview/letter")
+async def preview_letter(
+    letter: LetterCreate,
+    request: Request,
+    format: PreviewFormat = "png",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Vorschau eines Briefs (PNG der ersten Seite oder PDF).
+    
+    Es wird keine Nummer vergeben und nichts gespeichert; an Stelle der
+    Nummer steht ``ENTWURF``.
+    """
+    contact = await get_contact_or_404(db, letter.contact_id)
+    _, render_args = prepare_letter(letter, contact, PREVIEW_NUMBER)
+    return await preview_response(request, "render_letter", render_args, format)
+
+
+@router.post("/preview/invoice")
+async def preview_invoice(
+    invoice: InvoiceCreate,
+    request: Request,
+    format: PreviewFormat = "png",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Vorschau einer Rechnung, siehe ``preview_letter``"""
+    contact = await get_contact_or_404(db, invoice.contact_id)
+    _, render_args = prepare_invoice(invoice, contact, PREVIEW_NUMBER)
+    return await preview_response(request, "render_invoice", render_args, format)
+
+
+@router.post("/preview/offer")
+async def preview_offer(
+    offer: OfferCreate,
+    request: Request,
+    format: PreviewFormat = "png",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Vorschau eines Angebots, siehe ``preview_letter``"""
+    contact = await get_contact_or_404(db, offer.contact_id)
+    _, render_args = prepare_offer(offer, contact, PREVIEW_NUMBER)
+    return await preview_response(request, "render_offer", render_args, format)
 
 
 # =============================================================================
 # ARCHIVIERUNG
 # =============================================================================
 
-@router.post("/{doc_id}/archive")
+@router.post("/archive/batch", status_code=202, response_model=ArchiveBatchResponse)
+async def archive_batch(
+    request: ArchiveBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    monitor: HealthMonitor = Depends(get_health_monitor)
+):
+    """
+    Mehrere Dokumente in einem Durchgang zu paperless-ngx archivieren.
+    
+    Die Auswahl erfolgt über Filter (Typ, Status, Zeitraum oder IDs),
+    berücksichtigt werden nur fertige Dokumente (``final``, ``sent``).
+    Jedes Dokument wechselt per bedingtem Update auf ``archiving`` und
+    erhält in derselben Transaktion einen Archiv-Job; die Uploads laufen
+    danach in der Job-Queue (höchstens ``paperless.batch_concurrency``
+    gleichzeitig). So hängt kein Dokument ohne Job in ``archiving``, und
+    parallele Aufrufe laden kein Dokument doppelt hoch.
+    """
+    if not await monitor.is_available("paperless"):
+        raise HTTPException(status_code=503, detail="paperless-ngx nicht erreichbar")
+    
+    query = select(Document).where(Document.status.in_(ARCHIVABLE_STATUSES))
+    if request.doc_type:
+        query = query.where(Document.doc_type == request.doc_type)
+    if request.status:
+        query = query.where(Document.status == request.status)
+    if request.date_from:
+        query = query.where(Document.doc_date >= to_datetime(request.date_from))
+    if request.date_to:
+        query = query.where(Document.doc_date < to_datetime(request.date_to) + timedelta(days=1))
+    if request.document_ids:
+        query = query.where(Document.id.in_(request.document_ids))
+    query = query.order_by(Document.doc_date, Document.id).limit(request.limit)
+    
+    result = await db.execute(query)
+    docs = result.scalars().all()
+    
+    # Kontakte für die Korrespondenten gesammelt laden
+    result = await db.execute(
+        select(Contact).where(Contact.id.in_({doc.contact_id for doc in docs}))
+    )
+    contacts = {c.id: c for c in result.scalars().all()}
+    
+    results: list[ArchiveBatchItem] = []
+    jobs: list[Job] = []
+    for doc in docs:
+        if not doc.pdf_path or not Path(doc.pdf_path).exists():
+            results.append(ArchiveBatchItem(
+                document_id=doc.id,
+                doc_number=doc.doc_number,
+                status="skipped",
+                error="Kein PDF vorhanden"
+            ))
+            continue
+        
+        payload = archive_payload(doc, contacts.get(doc.contact_id))
+        if not await claim_for_archive(db, doc.id, (doc.status,)):
+            results.append(ArchiveBatchItem(
+                document_id=doc.id,
+                doc_number=doc.doc_number,
+                status="skipped",
+                error="Archivierung läuft bereits"
+            ))
+            continue
+        
+        job = new_job("archive", doc.id, payload)
+        jobs.append(job)
+        results.append(ArchiveBatchItem(
+            document_id=doc.id,
+            doc_number=doc.doc_number,
+            status="queued",
+            job_id=job.id
+        ))
+    
+    db.add_all(jobs)
+    await db.commit()
+    
+    queue = get_job_queue()
+    for job in jobs:
+        queue.enqueue(job.id)
+    
+    return ArchiveBatchResponse(
+        queued=len(jobs),
+        skipped=len(results) - len(jobs),
+        results=results
+    )
+
+
+@router.post("/{doc_id}/archive", status_code=202, response_model=JobResponse)
 async def archive_to_paperless(
     doc_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    monitor: HealthMonitor = Depends(get_health_monitor)
 ):
-    """Dokument zu paperless-ngx archivieren"""
+    """
+    Dokument zu paperless-ngx archivieren.
+    
+    Der Upload läuft als Job im Hintergrund: das Dokument wechselt per
+    bedingtem Update in den Status ``archiving`` (nur aus ``final`` oder
+    ``sent``, parallele Anfragen erhalten 409), der Worker lädt hoch,
+    wartet auf den Consume-Task von paperless und setzt danach
+    ``paperless_id`` und ``archived``.
+    """
     result = await db.execute(
         select(Document).where(Document.id == doc_id)
     )
@@ -383,48 +952,30 @@ async def archive_to_paperless(
     
     if doc.status == "archived":
         raise HTTPException(status_code=400, detail="Bereits archiviert")
+    if doc.status == "archiving":
+        raise HTTPException(status_code=409, detail="Archivierung läuft bereits")
+    if doc.status not in ARCHIVABLE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Dokument im Status '{doc.status}' kann nicht archiviert werden")
     
-    # Kontakt laden für Korrespondent
-    result = await db.execute(
-        select(Contact).where(Contact.id == doc.contact_id)
-    )
-    contact = result.scalar_one_or_none()
+    if not await monitor.is_available("paperless"):
+        raise HTTPException(status_code=503, detail="paperless-ngx nicht erreichbar")
     
-    correspondent = None
-    if contact:
-        correspondent = contact.company_name or f"{contact.first_name} {contact.last_name}".strip()
+    # Kontakt laden für Korrespondent
+    contact = await db.get(Contact, doc.contact_id)
+    payload = archive_payload(doc, contact)
     
-    # paperless Client
-    client = PaperlessClient()
-    if not await client.is_available():
-        raise HTTPException(status_code=503, detail="paperless-ngx nicht erreichbar")
+    # Nur übernehmen, wenn der Status seit dem Lesen unverändert ist
+    if not await claim_for_archive(db, doc.id, (doc.status,)):
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Archivierung läuft bereits")
     
-    # Titel zusammenbauen
-    title = doc.doc_number
-    if doc.subject:
-        title = f"{doc.doc_number} - {doc.subject}"
+    job = new_job("archive", doc.id, payload)
+    db.add(job)
+    await db.commit()
+    await db.refresh(doc)
     
-    try:
-        task_id = await client.upload_document(
-            pdf_path=pdf_path,
-            title=title,
-            created_date=doc.doc_date.strftime("%Y-%m-%d") if doc.doc_date else None
-        )
-        
-        doc.status = "archived"
-        await db.commit()
-        
-        return {
-            "message": "Dokument zur Archivierung übergeben",
-            "task_id": task_id,
-            "document_id": doc.id
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Archivierung fehlgeschlagen: {str(e)}"
-        )
+    get_job_queue().enqueue(job.id)
+    return job_to_response(job, doc)
 
 
 # =============================================================================
@@ -450,6 +1001,7 @@ async def delete_document(
         if pdf_path.exists():
             pdf_path.unlink()
     
+    await db.execute(delete(Job).where(Job.document_id == doc.id))
     await db.delete(doc)
     await db.commit()
     
@@ -1,10 +1,16 @@
 """
 Health-Check Endpoints
 """
+import asyncio
+
 from fastapi import APIRouter
 
-from app.services.ollama_client import OllamaClient
-from app.services.paperless_client import PaperlessClient
+from app.services.health_monitor import get_health_monitor
+from app.services.llm_cache import get_llm_cache
+from app.services.ollama_client import get_ollama_scheduler
+from app.services.paperless_client import get_paperless_client
+from app.services.render_cache import get_render_cache
+from app.services.thumbnails import get_derivative_store
 from app.settings import get_settings
 
 
@@ -19,22 +25,36 @@ async def health_check():
 
 @router.get("/health/services")
 async def services_status():
-    """Status aller externen Services"""
+    """Status aller externen Services (aus dem Health-Monitor)"""
     settings = get_settings()
+    monitor = get_health_monitor()
+    render_cache = get_render_cache()
+    thumbnails = get_derivative_store() if settings.thumbnails.enabled else None
+    llm_cache = get_llm_cache()
     
-    ollama = OllamaClient()
-    paperless = PaperlessClient()
+    # Abgelaufene Ergebnisse parallel auffrischen
+    await asyncio.gather(*(monitor.is_available(name) for name in monitor.probes))
+    status = monitor.snapshot()
     
     return {
         "ollama": {
             "configured": settings.ollama.enabled,
             "url": settings.ollama.url,
             "model": settings.ollama.model,
-            "available": await ollama.is_available()
+            **status["ollama"],
+            "cache": llm_cache.stats() if llm_cache else None,
+            "scheduler": get_ollama_scheduler().stats()
         },
         "paperless": {
             "configured": settings.paperless.enabled,
             "url": settings.paperless.url,
-            "available": await paperless.is_available()
+            **status["paperless"],
+            "metadata": get_paperless_client().metadata.stats()
+        },
+        "renderer": {
+            "engine": settings.typst.engine,
+            # stats() durchsucht das Cache-Verzeichnis
+            "cache": await asyncio.to_thread(render_cache.stats) if render_cache else None,
+            "thumbnails": await asyncio.to_thread(thumbnails.stats) if thumbnails else None
         }
     }
@@ -0,0 +1,64 @@
+"""
+Keyset-Pagination mit opaken Cursorn
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, Response
+
+
+# Header, in dem Listen-Endpunkte den Cursor der nächsten Seite liefern
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Kodiert die Sortierschlüssel der letzten Zeile als URL-sicheren Cursor"""
+    raw = [
+        {"dt": v.isoformat()} if isinstance(v, datetime) else v
+        for v in values
+    ]
+    data = json.dumps(raw, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _decode_value(value: Any, expected: type) -> Any:
+    if expected is datetime:
+        if not isinstance(value, dict) or not isinstance(value.get("dt"), str):
+            raise TypeError(value)
+        return datetime.fromisoformat(value["dt"])
+    # bool ist in Python ein int, als Sortierschlüssel aber ungültig
+    if not isinstance(value, expected) or isinstance(value, bool):
+        raise TypeError(value)
+    return value
+
+
+def decode_cursor(cursor: str, *types: type) -> list[Any]:
+    """
+    Gegenstück zu ``encode_cursor``.
+    
+    ``types`` sind die erwarteten Typen der Sortierschlüssel (``datetime``,
+    ``int``, ``str``); ungültige Cursor oder abweichende Typen ergeben 400.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        raw = json.loads(data)
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError(cursor)
+        return [_decode_value(value, expected) for value, expected in zip(raw, types)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+
+
+def set_next_cursor(response: Response, rows: list, limit: int, *key_of) -> None:
+    """
+    Setzt ``X-Next-Cursor``, wenn die Seite voll ist.
+    
+    ``key_of`` sind Funktionen, die aus der letzten Zeile die
+    Sortierschlüssel lesen (in der Reihenfolge der ORDER BY-Klausel).
+    """
+    if rows and len(rows) >= limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(key(last) for key in key_of))
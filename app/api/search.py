@@ -0,0 +1,49 @@
+"""
+Suche API - Volltextsuche über Kontakte und Dokumente
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_read_db
+from app.models.schemas import ContactSearchHit, SearchResponse
+from app.services.search import search_contacts, search_documents, search_supported
+
+
+router = APIRouter()
+
+
+def require_fts(db: AsyncSession) -> None:
+    if not search_supported(db.get_bind().dialect.name):
+        raise HTTPException(status_code=501, detail="Volltextsuche erfordert SQLite oder PostgreSQL")
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Volltextsuche nach Relevanz (bm25).
+    
+    Kontakte werden über Name, Firma, Ort und Kundennummer gefunden,
+    Dokumente über Nummer, Betreff und Inhalt. Jedes Wort der Anfrage
+    muss (als Wortanfang) vorkommen.
+    """
+    require_fts(db)
+    return SearchResponse(
+        query=q,
+        contacts=await search_contacts(db, q, limit),
+        documents=await search_documents(db, q, limit)
+    )
+
+
+@router.get("/contacts", response_model=list[ContactSearchHit])
+async def autocomplete_contacts(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Autovervollständigung für die Kontaktauswahl"""
+    require_fts(db)
+    return await search_contacts(db, q, limit)
@@ -5,11 +5,12 @@ from functools import lru_cache
 from pathlib import Path
 from urllib.parse import urlparse
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 
-from app.settings import get_settings
-from app.models.database import Base
+from app.migrations import upgrade
+from app.settings import SqliteSettings, get_settings
 
 
 def ensure_sqlite_dir(db_url: str) -> None:
@@ -41,17 +42,108 @@ def ensure_sqlite_dir(db_url: str) -> None:
     p.parent.mkdir(parents=True, exist_ok=True)
 
 
-@lru_cache
-def get_engine():
-    settings = get_settings()
-    ensure_sqlite_dir(settings.database.url)
+def normalize_database_url(db_url: str) -> str:
+    """
+    Ergänzt den async-Treiber für PostgreSQL.
 
-    return create_async_engine(
-        settings.database.url,
+    ``postgres://``, ``postgresql://`` und ``postgresql+psycopg2://`` (wie
+    von Docker-Images oder Hostern geliefert) werden zu ``postgresql+asyncpg://``.
+    """
+    scheme, sep, rest = db_url.partition("://")
+    if sep and scheme in ("postgres", "postgresql", "postgresql+psycopg2", "postgresql+psycopg"):
+        return f"postgresql+asyncpg://{rest}"
+    return db_url
+
+
+def is_sqlite_memory(db_url: str) -> bool:
+    return db_url.startswith("sqlite") and (":memory:" in db_url or urlparse(db_url).path in ("", "/"))
+
+
+def sqlite_pragmas(sqlite: SqliteSettings, read_only: bool = False) -> list[str]:
+    """PRAGMA-Anweisungen für jede neue SQLite-Verbindung"""
+    pragmas = [
+        f"PRAGMA journal_mode={sqlite.journal_mode}",
+        f"PRAGMA synchronous={sqlite.synchronous}",
+        f"PRAGMA mmap_size={sqlite.mmap_size}",
+        f"PRAGMA cache_size={sqlite.cache_size}",
+        f"PRAGMA busy_timeout={sqlite.busy_timeout}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _apply_pragmas(engine: AsyncEngine, pragmas: list[str]) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _create_engine(read_only: bool = False) -> AsyncEngine:
+    settings = get_settings()
+    db = settings.database
+    url = normalize_database_url(db.url)
+    
+    if not url.startswith("sqlite"):
+        # PostgreSQL (asyncpg): ein gemeinsamer Pool für Lesen und Schreiben
+        return create_async_engine(
+            url,
+            echo=settings.server.debug,
+            pool_size=db.pool_size,
+            max_overflow=db.max_overflow,
+            pool_timeout=db.pool_timeout,
+            pool_recycle=db.pool_recycle,
+            pool_pre_ping=db.pool_pre_ping,
+        )
+    
+    if is_sqlite_memory(url):
+        # Eine In-Memory-DB existiert nur in ihrer einen Verbindung
+        return create_async_engine(
+            url,
+            echo=settings.server.debug,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+    
+    ensure_sqlite_dir(url)
+    engine = create_async_engine(
+        url,
         echo=settings.server.debug,
-        connect_args={"check_same_thread": False} if settings.database.url.startswith("sqlite") else {},
-        poolclass=StaticPool if settings.database.url.startswith("sqlite") else None,
+        connect_args={"check_same_thread": False},
+        # aiosqlite nutzt sonst NullPool (eine neue Verbindung je Checkout)
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=db.sqlite.read_pool_size if read_only else db.pool_size,
+        max_overflow=0 if read_only else db.max_overflow,
+        pool_timeout=db.pool_timeout,
     )
+    _apply_pragmas(engine, sqlite_pragmas(db.sqlite, read_only))
+    return engine
+
+
+@lru_cache
+def get_engine() -> AsyncEngine:
+    """Engine für Schreibzugriffe (und alles, was lesen und schreiben muss)"""
+    return _create_engine()
+
+
+@lru_cache
+def get_read_engine() -> AsyncEngine:
+    """
+    Engine für reine Lesezugriffe.
+    
+    Bei SQLite-Dateien ein eigener Pool mit ``query_only``-Verbindungen, die
+    dank WAL parallel zu laufenden Schreibvorgängen lesen. Sonst (In-Memory,
+    andere Datenbanken) dieselbe Engine wie für Schreibzugriffe.
+    """
+    url = get_settings().database.url
+    if url.startswith("sqlite") and not is_sqlite_memory(url):
+        return _create_engine(read_only=True)
+    return get_engine()
 
 
 @lru_cache
@@ -59,14 +151,31 @@ def get_sessionmaker():
     return async_sessionmaker(bind=get_engine(), class_=AsyncSession, expire_on_commit=False)
 
 
+@lru_cache
+def get_read_sessionmaker():
+    return async_sessionmaker(bind=get_read_engine(), class_=AsyncSession, expire_on_commit=False)
+
+
+async def dispose_engines() -> None:
+    """Schließt alle Verbindungen beider Pools"""
+    engines = {get_engine(), get_read_engine()}
+    for engine in engines:
+        await engine.dispose()
+
+
 async def get_db() -> AsyncSession:
     async_session = get_sessionmaker()
     async with async_session() as session:
         yield session
 
 
-async def init_db():
-    """Erstellt alle Tabellen"""
-    engine = get_engine()
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+async def get_read_db() -> AsyncSession:
+    """Session für Endpunkte, die nur lesen (Listen, Abrufe, Suche)"""
+    async_session = get_read_sessionmaker()
+    async with async_session() as session:
+        yield session
+
+
+async def init_db() -> list[str]:
+    """Bringt das Schema per Migrationen auf den aktuellen Stand"""
+    return await upgrade(get_engine())
@@ -11,8 +11,15 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
 from app.settings import get_settings
-from app.database import init_db
-from app.api import contacts, documents, ai, health
+from app.database import dispose_engines, init_db
+from app.migrations import pending
+from app.services.health_monitor import get_health_monitor
+from app.services.http_pool import close_clients
+from app.services.job_queue import start_job_queue, stop_job_queue
+from app.services.ollama_client import get_ollama_http
+from app.services.paperless_client import get_paperless_http
+from app.api import contacts, documents, ai, health, search
+from app.api.pagination import NEXT_CURSOR_HEADER
 
 
 # Logging konfigurieren
@@ -28,13 +35,33 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Startup/Shutdown Events"""
     # Startup
-    logger.info("Initialisiere Datenbank...")
-    await init_db()
+    if settings.database.migrate_on_startup:
+        logger.info("Initialisiere Datenbank...")
+        applied = await init_db()
+        if applied:
+            logger.info("Migrationen angewendet: %s", ", ".join(applied))
+    else:
+        missing = await pending()
+        if missing:
+            logger.warning(
+                "%d Migration(en) ausstehend, "
+                "bitte 'python -m app.migrations upgrade' ausführen",
+                len(missing)
+            )
+    # Gepoolte HTTP-Clients für Ollama und paperless anlegen
+    get_ollama_http()
+    get_paperless_http()
+    get_health_monitor().start()
+    await start_job_queue()
     logger.info("Korrespondenz-System gestartet")
     
     yield
     
     # Shutdown
+    await stop_job_queue()
+    await get_health_monitor().stop()
+    await close_clients()
+    await dispose_engines()
     logger.info("Korrespondenz-System beendet")
 
 
@@ -54,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # API Routes
@@ -61,6 +89,7 @@ app.include_router(health.router, prefix="/api", tags=["Health"])
 app.include_router(contacts.router, prefix="/api/contacts", tags=["Kontakte"])
 app.include_router(documents.router, prefix="/api/documents", tags=["Dokumente"])
 app.include_router(ai.router, prefix="/api/ai", tags=["KI"])
+app.include_router(search.router, prefix="/api/search", tags=["Suche"])
 
 # Statische Dateien (generierte PDFs)
 documents_path = Path(settings.typst.output_dir)
@@ -0,0 +1,174 @@
+"""
+Versionierte Schema-Migrationen
+
+Jede Migration ist ein Modul in ``app/migrations/versions`` mit
+``version`` (aufsteigend sortierbar), ``name`` und ``upgrade(conn)``
+(synchrone SQLAlchemy-Connection). Angewendete Versionen stehen in der
+Tabelle ``schema_migrations``.
+
+Ausführen:
+    python -m app.migrations upgrade
+    python -m app.migrations status
+
+Migrationen sind idempotent geschrieben (``IF NOT EXISTS``, ``checkfirst``),
+damit bestehende Datenbanken aus der Zeit vor den Migrationen ohne
+Sonderbehandlung übernommen werden und parallel startende Worker sich
+nicht stören.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+import pkgutil
+from dataclasses import dataclass
+from datetime import datetime
+from types import ModuleType
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.migrations import versions as versions_package
+
+
+logger = logging.getLogger(__name__)
+
+# Eigene MetaData: die Tabelle gehört nicht zum Anwendungsmodell
+schema_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    schema_metadata,
+    Column("version", String(32), primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Schlüssel für pg_advisory_lock, damit nur ein Prozess gleichzeitig migriert
+_PG_LOCK_KEY = 7_301_955
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    module: ModuleType
+    
+    @property
+    def transactional(self) -> bool:
+        """
+        ``False``: läuft auf PostgreSQL außerhalb einer Transaktion (nötig
+        für ``CREATE INDEX CONCURRENTLY``). SQLite kennt keine nebenläufigen
+        Index-Builds, dort bleibt jede Migration in ihrer Transaktion.
+        """
+        return getattr(self.module, "transactional", True)
+    
+    def upgrade(self, sync_conn) -> None:
+        self.module.upgrade(sync_conn)
+
+
+def load_migrations() -> list[Migration]:
+    """Alle Migrationen aus ``app/migrations/versions``, nach Version sortiert"""
+    migrations = []
+    for info in pkgutil.iter_modules(versions_package.__path__):
+        module = importlib.import_module(f"{versions_package.__name__}.{info.name}")
+        migrations.append(Migration(module.version, module.name, module))
+    migrations.sort(key=lambda m: m.version)
+    
+    seen = set()
+    for migration in migrations:
+        if migration.version in seen:
+            raise RuntimeError(f"Migration {migration.version} ist doppelt vorhanden")
+        seen.add(migration.version)
+    return migrations
+
+
+def _engine(engine: Optional[AsyncEngine]) -> AsyncEngine:
+    if engine is not None:
+        return engine
+    from app.database import get_engine
+    return get_engine()
+
+
+async def _applied(conn: AsyncConnection) -> dict[str, datetime]:
+    await conn.run_sync(schema_metadata.create_all)
+    rows = await conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at))
+    return {version: applied_at for version, applied_at in rows}
+
+
+async def applied_versions(engine: Optional[AsyncEngine] = None) -> dict[str, datetime]:
+    """Angewendete Versionen mit Zeitpunkt"""
+    async with _engine(engine).begin() as conn:
+        return await _applied(conn)
+
+
+async def current(engine: Optional[AsyncEngine] = None) -> Optional[str]:
+    """Höchste angewendete Version (``None`` bei leerer Datenbank)"""
+    applied = await applied_versions(engine)
+    return max(applied) if applied else None
+
+
+async def pending(engine: Optional[AsyncEngine] = None) -> list[Migration]:
+    applied = await applied_versions(engine)
+    return [m for m in load_migrations() if m.version not in applied]
+
+
+async def _record(conn: AsyncConnection, migration: Migration) -> None:
+    try:
+        await conn.execute(schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.utcnow()
+        ))
+    except IntegrityError:
+        # SQLite: ein parallel startender Worker war schneller (PostgreSQL
+        # serialisiert über den Advisory-Lock)
+        pass
+
+
+async def _apply(engine: AsyncEngine, migration: Migration) -> None:
+    if migration.transactional or engine.dialect.name != "postgresql":
+        async with engine.begin() as conn:
+            await conn.run_sync(migration.upgrade)
+            await _record(conn, migration)
+        return
+    
+    async with engine.connect() as conn:
+        autocommit = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await autocommit.run_sync(migration.upgrade)
+    async with engine.begin() as conn:
+        await _record(conn, migration)
+
+
+async def upgrade(engine: Optional[AsyncEngine] = None, target: Optional[str] = None) -> list[str]:
+    """
+    Wendet alle ausstehenden Migrationen (bis einschließlich ``target``) an.
+    
+    Returns:
+        Die Versionen der angewendeten Migrationen
+    """
+    engine = _engine(engine)
+    lock = None
+    if engine.dialect.name == "postgresql":
+        lock = await engine.connect()
+        # Sitzungs-Lock ohne offene Transaktion halten
+        lock = await lock.execution_options(isolation_level="AUTOCOMMIT")
+        await lock.exec_driver_sql(f"SELECT pg_advisory_lock({_PG_LOCK_KEY})")
+    
+    try:
+        applied = await applied_versions(engine)
+        done = []
+        for migration in load_migrations():
+            if target is not None and migration.version > target:
+                break
+            if migration.version in applied:
+                continue
+            logger.info("Migration %s (%s)...", migration.version, migration.name)
+            await _apply(engine, migration)
+            done.append(migration.version)
+        return done
+    finally:
+        if lock is not None:
+            await lock.exec_driver_sql(f"SELECT pg_advisory_unlock({_PG_LOCK_KEY})")
+            await lock.close()
@@ -0,0 +1,61 @@
+"""
+Kommandozeile für die Schema-Migrationen
+
+    python -m app.migrations upgrade [--target VERSION]
+    python -m app.migrations status
+
+Die Datenbank kommt aus der config.yaml bzw. ``KORRESPONDENZ_DATABASE_URL``.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.database import dispose_engines
+from app.migrations import applied_versions, load_migrations, upgrade
+
+
+async def _upgrade(target) -> int:
+    try:
+        done = await upgrade(target=target)
+    finally:
+        await dispose_engines()
+    if done:
+        print(f"Angewendet: {', '.join(done)}")
+    else:
+        print("Schema ist aktuell")
+    return 0
+
+
+async def _status() -> int:
+    try:
+        applied = await applied_versions()
+    finally:
+        await dispose_engines()
+    missing = 0
+    for migration in load_migrations():
+        applied_at = applied.get(migration.version)
+        if applied_at is None:
+            missing += 1
+        state = applied_at.isoformat(sep=" ", timespec="seconds") if applied_at else "ausstehend"
+        print(f"{migration.version}  {migration.name:<28} {state}")
+    # Exit-Code 1 bei ausstehenden Migrationen (z.B. für Deploy-Checks)
+    return 1 if missing else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="ausstehende Migrationen anwenden")
+    upgrade_parser.add_argument("--target", help="höchste anzuwendende Version")
+    commands.add_parser("status", help="angewendete und ausstehende Migrationen")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "upgrade":
+        return asyncio.run(_upgrade(args.target))
+    return asyncio.run(_status())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Hilfsfunktionen für Migrationen
+"""
+from collections.abc import Iterable
+
+from sqlalchemy import Column, Index, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+
+def index_names(sync_conn, table_name: str) -> set[str]:
+    # Die SQLite-Reflection überspringt Ausdrucks-Indizes, daher direkt abfragen
+    if sync_conn.dialect.name == "sqlite":
+        rows = sync_conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            (table_name,)
+        )
+        return {row[0] for row in rows}
+    return {index["name"] for index in inspect(sync_conn).get_indexes(table_name)}
+
+
+def add_column(sync_conn, table_name: str, column: Column) -> bool:
+    """
+    ``ALTER TABLE ... ADD COLUMN``, falls die Spalte fehlt.
+    
+    Die Baseline ist eingefroren; neue Spalten kommen auch in neuen
+    Datenbanken über diese Funktion hinzu.
+    """
+    existing = {c["name"] for c in inspect(sync_conn).get_columns(table_name)}
+    if column.name in existing:
+        return False
+    column_type = column.type.compile(dialect=sync_conn.dialect)
+    sync_conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}")
+    return True
+
+
+def create_index_sql(index: Index, dialect) -> str:
+    """
+    ``CREATE INDEX IF NOT EXISTS`` für einen Modell-Index.
+    
+    Auf PostgreSQL zusätzlich ``CONCURRENTLY``: der Build sperrt keine
+    Schreibzugriffe, muss dafür aber außerhalb einer Transaktion laufen
+    (Migration mit ``transactional = False``).
+    """
+    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    if dialect.name == "postgresql":
+        sql = sql.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+    return sql
+
+
+def drop_invalid_index(sync_conn, name: str) -> bool:
+    """
+    Entfernt einen ungültigen Index (PostgreSQL).
+    
+    Bricht ``CREATE INDEX CONCURRENTLY`` ab, bleibt ein als ungültig
+    markierter Index zurück, den ``IF NOT EXISTS`` sonst stehen ließe.
+    """
+    if sync_conn.dialect.name != "postgresql":
+        return False
+    invalid = sync_conn.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        sync_conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    return bool(invalid)
+
+
+def create_missing_indexes(sync_conn, indexes: Iterable[Index]) -> list[str]:
+    """
+    Legt die fehlenden der übergebenen Indizes an.
+    
+    Die Migration listet ihre Indizes selbst auf (eigene ``Table``-Definition
+    mit Stand der Migration), damit spätere Modelländerungen sie nicht
+    nachträglich verändern.
+    """
+    created = []
+    existing: dict[str, set[str]] = {}
+    for index in indexes:
+        table_name = index.table.name
+        if table_name not in existing:
+            existing[table_name] = index_names(sync_conn, table_name)
+        if index.name in existing[table_name] and not drop_invalid_index(sync_conn, index.name):
+            continue
+        sync_conn.exec_driver_sql(create_index_sql(index, sync_conn.dialect))
+        created.append(index.name)
+    return created
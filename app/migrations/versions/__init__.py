@@ -0,0 +1,3 @@
+"""
+Migrationsmodule (``mNNNN_<name>.py``), werden nach ``version`` sortiert angewendet
+"""
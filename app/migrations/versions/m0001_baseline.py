@@ -0,0 +1,95 @@
+"""
+Ausgangsschema: Tabellen beim Einführen der Migrationen
+
+Fest eingefroren statt aus dem aktuellen Modell abgeleitet; spätere
+Änderungen am Modell brauchen eine eigene Migration. Legt nur fehlende
+Tabellen an; Datenbanken, die vor Einführung der Migrationen per
+``create_all`` entstanden sind, bleiben unverändert.
+"""
+from sqlalchemy import (
+    JSON, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text
+)
+
+
+version = "0001"
+name = "baseline"
+
+
+metadata = MetaData()
+
+Table(
+    "contacts", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("contact_type", String(20), nullable=False),
+    Column("company_name", String(255)),
+    Column("salutation", String(20)),
+    Column("first_name", String(100)),
+    Column("last_name", String(100)),
+    Column("gender", String(1)),
+    Column("street", String(255)),
+    Column("zip_code", String(20)),
+    Column("city", String(100)),
+    Column("country", String(100), nullable=False),
+    Column("email", String(255)),
+    Column("phone", String(50)),
+    Column("customer_number", String(50)),
+    Column("notes", Text),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "documents", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("doc_type", String(20), nullable=False),
+    Column("doc_number", String(50), nullable=False, unique=True),
+    Column("contact_id", Integer, ForeignKey("contacts.id"), nullable=False),
+    Column("subject", String(500)),
+    Column("content", Text),
+    Column("positions", JSON),
+    Column("net_total", Float),
+    Column("vat_total", Float),
+    Column("gross_total", Float),
+    Column("doc_date", DateTime, nullable=False),
+    Column("due_date", DateTime),
+    Column("valid_until", DateTime),
+    Column("status", String(20), nullable=False),
+    Column("pdf_path", String(500)),
+    Column("paperless_id", Integer),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "number_sequences", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("prefix", String(20), nullable=False, unique=True),
+    Column("year", Integer, nullable=False),
+    Column("last_number", Integer, nullable=False),
+)
+
+Table(
+    "jobs", metadata,
+    Column("id", String(32), primary_key=True),
+    Column("kind", String(20), nullable=False),
+    Column("document_id", Integer, ForeignKey("documents.id")),
+    Column("status", String(20), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("error", Text),
+    Column("payload", JSON),
+    Column("result", JSON),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "llm_cache", metadata,
+    Column("key", String(64), primary_key=True),
+    Column("model", String(100), nullable=False),
+    Column("response", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False, index=True),
+)
+
+
+def upgrade(conn) -> None:
+    metadata.create_all(conn, checkfirst=True)
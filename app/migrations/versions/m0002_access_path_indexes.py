@@ -0,0 +1,63 @@
+"""
+Indizes für Listen, Filter und Zähler (Dokumente, Jobs, Kontakte)
+
+Auf PostgreSQL mit ``CREATE INDEX CONCURRENTLY``, damit der Build auf
+gefüllten Tabellen keine Schreibzugriffe blockiert.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func
+
+from app.migrations.ops import create_missing_indexes
+
+
+version = "0002"
+name = "access_path_indexes"
+transactional = False
+
+
+# Nur die Spalten, die die Indizes brauchen (Stand dieser Migration)
+metadata = MetaData()
+contacts = Table(
+    "contacts", metadata,
+    Column("id", Integer),
+    Column("company_name", String(255)),
+    Column("first_name", String(100)),
+    Column("last_name", String(100)),
+)
+documents = Table(
+    "documents", metadata,
+    Column("doc_type", String(20)),
+    Column("contact_id", Integer),
+    Column("doc_date", DateTime),
+    Column("status", String(20)),
+    Column("created_at", DateTime),
+)
+jobs = Table(
+    "jobs", metadata,
+    Column("document_id", Integer),
+    Column("status", String(20)),
+    Column("created_at", DateTime),
+)
+
+INDEXES = [
+    Index("ix_documents_created_at", documents.c.created_at),
+    Index("ix_documents_doc_type_created_at", documents.c.doc_type, documents.c.created_at),
+    Index("ix_documents_status_created_at", documents.c.status, documents.c.created_at),
+    Index("ix_documents_contact_id_doc_date", documents.c.contact_id, documents.c.doc_date),
+    Index("ix_documents_status_doc_date", documents.c.status, documents.c.doc_date),
+    Index("ix_jobs_status_created_at", jobs.c.status, jobs.c.created_at),
+    Index("ix_jobs_document_id", jobs.c.document_id),
+    Index(
+        "ix_contacts_sort_name",
+        func.lower(func.coalesce(
+            func.nullif(contacts.c.company_name, ""),
+            func.nullif(contacts.c.last_name, ""),
+            contacts.c.first_name,
+            ""
+        )),
+        contacts.c.id
+    ),
+]
+
+
+def upgrade(conn) -> None:
+    create_missing_indexes(conn, INDEXES)
@@ -0,0 +1,16 @@
+"""
+Volltextsuche: FTS5-Tabellen samt Triggern (SQLite) bzw. GIN-Indizes (PostgreSQL)
+"""
+from app.migrations.ops import drop_invalid_index
+from app.services.search import FTS_TABLES, ensure_search_index, pg_index_name
+
+
+version = "0003"
+name = "search_index"
+transactional = False
+
+
+def upgrade(conn) -> None:
+    for table in FTS_TABLES:
+        drop_invalid_index(conn, pg_index_name(table))
+    ensure_search_index(conn)
@@ -0,0 +1,19 @@
+"""
+Inhalts-Hash der Dokument-PDFs (ETag für die Auslieferung)
+
+Nur die Spalte; vorhandene PDFs werden hier nicht gehasht, um den Start
+nicht mit dem Lesen aller Dateien zu blockieren. Ist die Spalte leer,
+hasht die Auslieferung die Datei bei Bedarf, neu gerenderte PDFs
+erhalten den Hash über ``attach_pdf``.
+"""
+from sqlalchemy import Column, String
+
+from app.migrations.ops import add_column
+
+
+version = "0004"
+name = "document_pdf_sha256"
+
+
+def upgrade(conn) -> None:
+    add_column(conn, "documents", Column("pdf_sha256", String(64)))
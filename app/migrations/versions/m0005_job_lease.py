@@ -0,0 +1,18 @@
+"""
+Lease-Spalten für Jobs (atomare Übernahme, Heartbeat)
+
+Bestehende Jobs im Status ``running`` haben keinen Heartbeat und werden
+beim nächsten Start als verwaist wieder eingereiht.
+"""
+from sqlalchemy import Column, DateTime
+
+from app.migrations.ops import add_column
+
+
+version = "0005"
+name = "job_lease"
+
+
+def upgrade(conn) -> None:
+    add_column(conn, "jobs", Column("started_at", DateTime))
+    add_column(conn, "jobs", Column("heartbeat_at", DateTime))
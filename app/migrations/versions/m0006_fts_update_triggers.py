@@ -0,0 +1,15 @@
+"""
+FTS5-Update-Trigger nur für die indizierten Spalten (SQLite)
+
+Bisher schrieb jedes Update einer Zeile, etwa ein Statuswechsel, den
+Eintrag im Suchindex neu.
+"""
+from app.services.search import scope_update_triggers
+
+
+version = "0006"
+name = "fts_update_triggers"
+
+
+def upgrade(conn) -> None:
+    scope_update_triggers(conn)
@@ -3,7 +3,7 @@ SQLAlchemy Datenbankmodelle
 """
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, Text, Integer, Float, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import String, Text, Integer, Float, Boolean, DateTime, ForeignKey, JSON, Index, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -51,9 +51,30 @@ class Contact(Base):
     documents: Mapped[list["Document"]] = relationship(back_populates="contact")
 
 
+# Sortiername für Kontaktlisten: Firma, sonst Nachname bzw. Vorname
+contact_sort_name = func.lower(func.coalesce(
+    func.nullif(Contact.company_name, ""),
+    func.nullif(Contact.last_name, ""),
+    Contact.first_name,
+    ""
+))
+
+# Ausdrucks-Index für die (Keyset-)Sortierung nach Name und ID
+Index("ix_contacts_sort_name", contact_sort_name, Contact.id)
+
+
 class Document(Base):
     """Erstelltes Dokument"""
     __tablename__ = "documents"
+    __table_args__ = (
+        # Liste: ungefiltert bzw. nach Typ oder Status, neueste zuerst
+        Index("ix_documents_created_at", "created_at"),
+        Index("ix_documents_doc_type_created_at", "doc_type", "created_at"),
+        Index("ix_documents_status_created_at", "status", "created_at"),
+        # Dokumente eines Kontakts (Zählung beim Löschen) und Zeitraum-Filter
+        Index("ix_documents_contact_id_doc_date", "contact_id", "doc_date"),
+        Index("ix_documents_status_doc_date", "status", "doc_date"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     
@@ -81,10 +102,11 @@ class Document(Base):
     valid_until: Mapped[Optional[datetime]] = mapped_column(DateTime)  # Für Angebote
     
     # Status
-    status: Mapped[str] = mapped_column(String(20), default="draft")  # draft, final, sent, archived
+    status: Mapped[str] = mapped_column(String(20), default="draft")  # draft, rendering, final, sent, archiving, archived, failed
     
     # Dateien
     pdf_path: Mapped[Optional[str]] = mapped_column(String(500))
+    pdf_sha256: Mapped[Optional[str]] = mapped_column(String(64))  # ETag der Auslieferung
     paperless_id: Mapped[Optional[int]] = mapped_column(Integer)  # ID in paperless-ngx
     
     # Meta
@@ -100,3 +122,46 @@ class NumberSequence(Base):
     prefix: Mapped[str] = mapped_column(String(20), unique=True)  # INV, OFF, LTR
     year: Mapped[int] = mapped_column(Integer)
     last_number: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class Job(Base):
+    """Hintergrund-Auftrag (z.B. PDF-Rendering)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Offene Jobs beim Start, Jobs eines Dokuments beim Löschen
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+        Index("ix_jobs_document_id", "document_id"),
+    )
+    
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # UUID (hex)
+    kind: Mapped[str] = mapped_column(String(20))  # render
+    
+    # Betroffenes Dokument
+    document_id: Mapped[Optional[int]] = mapped_column(ForeignKey("documents.id"))
+    
+    # Status
+    status: Mapped[str] = mapped_column(String(20), default="queued")  # queued, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    
+    # Lease: der ausführende Worker erneuert heartbeat_at regelmäßig
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    
+    # Auftragsdaten und Ergebnis
+    payload: Mapped[Optional[dict]] = mapped_column(JSON)
+    result: Mapped[Optional[dict]] = mapped_column(JSON)
+    
+    # Meta
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LlmCacheEntry(Base):
+    """Persistenter Cache für LLM-Antworten"""
+    __tablename__ = "llm_cache"
+    
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256 über Modell/Prompts/Temperatur
+    model: Mapped[str] = mapped_column(String(100))
+    response: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
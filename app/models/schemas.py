@@ -119,6 +119,7 @@ class DocumentResponse(BaseModel):
     gross_total: Optional[float]
     doc_date: datetime
     pdf_path: Optional[str]
+    pdf_sha256: Optional[str] = None
     paperless_id: Optional[int]
     created_at: datetime
     
@@ -126,6 +127,100 @@ class DocumentResponse(BaseModel):
         from_attributes = True
 
 
+class InvoiceBatchCreate(BaseModel):
+    """Mehrere Rechnungen auf einmal erstellen"""
+    items: list[InvoiceCreate] = Field(min_length=1, max_length=500)
+
+
+class BatchItemResult(BaseModel):
+    """Ergebnis einer einzelnen Batch-Position"""
+    index: int
+    status: Literal["created", "failed"]
+    document: Optional[DocumentResponse] = None
+    error: Optional[str] = None
+
+
+class InvoiceBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BatchItemResult]
+
+
+class ArchiveBatchRequest(BaseModel):
+    """Filter für die Sammel-Archivierung"""
+    doc_type: Optional[str] = None
+    status: Optional[str] = "final"
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    document_ids: Optional[list[int]] = None
+    limit: int = Field(default=200, ge=1, le=1000)
+
+
+class ArchiveBatchItem(BaseModel):
+    """Ergebnis für ein einzelnes Dokument der Sammel-Archivierung"""
+    document_id: int
+    doc_number: str
+    status: Literal["queued", "skipped"]
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ArchiveBatchResponse(BaseModel):
+    queued: int
+    skipped: int
+    results: list[ArchiveBatchItem]
+
+
+class JobResponse(BaseModel):
+    """Status eines Hintergrund-Jobs"""
+    id: str
+    kind: str
+    status: str  # queued, running, done, failed
+    document_id: Optional[int]
+    attempts: int
+    error: Optional[str]
+    result: Optional[dict]
+    started_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    document: Optional[DocumentResponse] = None
+    
+    class Config:
+        from_attributes = True
+
+
+# === Suche ===
+
+class ContactSearchHit(BaseModel):
+    """Kontakt-Treffer; ``highlight`` ist HTML-escaped mit <mark>-Tags"""
+    id: int
+    label: str
+    highlight: Optional[str] = None
+    city: Optional[str] = None
+    customer_number: Optional[str] = None
+    score: float
+
+
+class DocumentSearchHit(BaseModel):
+    """Dokument-Treffer mit hervorgehobenem Betreff und Textausschnitt"""
+    id: int
+    doc_type: str
+    doc_number: str
+    subject: Optional[str] = None
+    status: str
+    doc_date: Optional[datetime] = None
+    contact_id: int
+    highlight: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    contacts: list[ContactSearchHit]
+    documents: list[DocumentSearchHit]
+
+
 # === AI ===
 
 class DraftRequest(BaseModel):
@@ -135,6 +230,7 @@ class DraftRequest(BaseModel):
     tone: str = "formal"  # formal, friendly
     letter_type: Literal["business", "private"] = "business"
     contact_id: Optional[int] = None  # Für Personalisierung
+    bypass_cache: bool = False  # Neu generieren statt gecachte Antwort
 
 
 class DraftResponse(BaseModel):
@@ -0,0 +1,216 @@
+"""
+Hintergrund-Archivierung von Dokumenten zu paperless-ngx
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Contact, Document, Job
+from app.services.health_monitor import get_health_monitor
+from app.services.paperless_client import PaperlessClient, get_paperless_client
+from app.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Nur Dokumente mit fertigem PDF werden archiviert
+ARCHIVABLE_STATUSES = ("final", "sent")
+
+# Task-Status von paperless-ngx (Celery)
+TASK_SUCCESS = "SUCCESS"
+TASK_FAILED = ("FAILURE", "REVOKED")
+
+
+# Begrenzung paralleler Uploads (pro Event-Loop)
+_upload_slots: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+
+
+class ArchiveError(Exception):
+    """paperless hat das Dokument nicht übernommen"""
+
+
+def _get_upload_slots(limit: int) -> asyncio.Semaphore:
+    global _upload_slots
+    loop = asyncio.get_running_loop()
+    if _upload_slots is None or _upload_slots[0] is not loop:
+        _upload_slots = (loop, asyncio.Semaphore(limit))
+    return _upload_slots[1]
+
+
+async def claim_for_archive(
+    db: AsyncSession,
+    doc_id: int,
+    statuses: tuple[str, ...] = ARCHIVABLE_STATUSES
+) -> bool:
+    """
+    Setzt ein Dokument per bedingtem Update auf ``archiving``.
+    
+    ``False``, wenn es nicht (mehr) in einem der ``statuses`` ist, etwa weil
+    eine parallele Anfrage es bereits übernommen hat. Der Aufrufer legt den
+    Archiv-Job in derselben Transaktion an.
+    """
+    result = await db.execute(
+        update(Document)
+        .where(Document.id == doc_id, Document.status.in_(statuses))
+        .values(status="archiving")
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def archive_payload(doc: Document, contact: Optional[Contact] = None) -> dict:
+    """
+    Payload eines Archiv-Jobs: Titel, Datum, Metadaten-Namen und Status
+    vor der Archivierung. Die Namen werden erst beim Upload in IDs
+    aufgelöst.
+    """
+    settings = get_settings().paperless
+    
+    title = doc.doc_number
+    if doc.subject:
+        title = f"{doc.doc_number} - {doc.subject}"
+    
+    correspondent = None
+    if contact:
+        correspondent = contact.company_name or f"{contact.first_name or ''} {contact.last_name or ''}".strip()
+    
+    return {
+        "title": title,
+        "created_date": doc.doc_date.strftime("%Y-%m-%d") if doc.doc_date else None,
+        "correspondent": correspondent or None,
+        # Briefe heißen "letter_business"/"letter_private"
+        "document_type": settings.document_types.get(
+            doc.doc_type, settings.document_types.get(doc.doc_type.split("_")[0])
+        ),
+        "tags": list(settings.tags),
+        "previous_status": doc.status
+    }
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, Verbindungsfehler und 5xx-Antworten lohnen einen neuen Versuch"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+
+async def upload_with_retry(client: PaperlessClient, pdf_path: Path, payload: dict) -> str:
+    """
+    Lädt das PDF hoch und wiederholt vorübergehende Fehler mit Backoff.
+    
+    Korrespondent, Dokumenttyp und Tags werden über den Metadaten-Cache
+    des Clients aufgelöst, sodass pro Upload keine Abfrage nötig ist.
+    """
+    settings = get_settings().paperless
+    attempt = 0
+    while True:
+        try:
+            metadata = await client.resolve_upload_metadata(
+                correspondent=payload.get("correspondent"),
+                document_type=payload.get("document_type"),
+                tags=payload.get("tags")
+            )
+            return await client.upload_document(
+                pdf_path=pdf_path,
+                title=payload["title"],
+                created_date=payload.get("created_date"),
+                **metadata
+            )
+        except Exception as e:
+            if attempt >= settings.upload_retries or not is_retryable(e):
+                raise
+            delay = settings.retry_backoff * 2 ** attempt
+            attempt += 1
+            logger.info("Upload von %s fehlgeschlagen (%s), Versuch %d in %.1fs",
+                        pdf_path.name, e, attempt + 1, delay)
+            await asyncio.sleep(delay)
+
+
+async def wait_for_task(client: PaperlessClient, task_id: str) -> Optional[int]:
+    """
+    Fragt den Consume-Task ab, bis paperless ihn abgeschlossen hat.
+    
+    Returns:
+        ID des angelegten Dokuments in paperless (falls gemeldet)
+    """
+    settings = get_settings().paperless
+    deadline = time.monotonic() + settings.task_timeout
+    
+    while True:
+        try:
+            tasks = await client.get_task_status(task_id)
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            logger.info("Task %s: Abfrage fehlgeschlagen (%s)", task_id, e)
+            tasks = []
+    
+        # Der Task taucht erst auf, wenn paperless ihn registriert hat
+        task = tasks[0] if tasks else None
+        if task is not None:
+            status = task.get("status")
+            if status == TASK_SUCCESS:
+                related = task.get("related_document")
+                return int(related) if related not in (None, "") else None
+            if status in TASK_FAILED:
+                raise ArchiveError(task.get("result") or f"paperless-Task {status}")
+    
+        if time.monotonic() >= deadline:
+            raise ArchiveError(f"paperless-Task {task_id} nach {settings.task_timeout:.0f}s nicht abgeschlossen")
+        await asyncio.sleep(settings.task_poll_interval)
+
+
+async def run_archive_job(db: AsyncSession, job: Job) -> Optional[dict]:
+    """
+    Archiviert das PDF eines Dokuments und speichert die paperless-ID.
+    
+    Die Task-ID wird nach dem Upload im Payload gesichert, damit ein nach
+    einem Neustart wiederholter Job nur noch den Task abfragt, statt das
+    PDF ein zweites Mal hochzuladen. Schlägt die Archivierung fehl, erhält
+    das Dokument seinen vorherigen Status zurück und kann erneut
+    archiviert werden.
+    """
+    doc = await db.get(Document, job.document_id)
+    if doc is None:
+        raise LookupError(f"Dokument {job.document_id} nicht gefunden")
+    
+    payload = dict(job.payload or {})
+    client = get_paperless_client()
+    
+    try:
+        task_id = payload.get("task_id")
+        if not task_id:
+            if not doc.pdf_path:
+                raise ArchiveError("Kein PDF vorhanden")
+            async with _get_upload_slots(get_settings().paperless.batch_concurrency):
+                task_id = await upload_with_retry(client, Path(doc.pdf_path), payload)
+            payload["task_id"] = task_id
+            job.payload = payload
+            await db.commit()
+    
+        paperless_id = await wait_for_task(client, task_id)
+    except Exception as e:
+        if isinstance(e, httpx.TransportError):
+            get_health_monitor().report_failure("paperless")
+        doc.status = payload.get("previous_status") or "final"
+        await db.commit()
+        raise
+    
+    doc.paperless_id = paperless_id
+    doc.status = "archived"
+    return {"task_id": task_id, "paperless_id": paperless_id}
+
+
+async def abandon_archive_job(db: AsyncSession, job: Job) -> None:
+    """Aufgegebener Archiv-Job: das Dokument erhält seinen vorherigen Status"""
+    doc = await db.get(Document, job.document_id)
+    if doc is not None and doc.status == "archiving":
+        doc.status = (job.payload or {}).get("previous_status") or "final"
@@ -0,0 +1,162 @@
+"""
+Hintergrund-Überwachung der externen Services (Ollama, paperless-ngx)
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+from app.services.ollama_client import get_ollama_client
+from app.services.paperless_client import get_paperless_client
+from app.settings import HealthSettings, get_settings
+
+
+logger = logging.getLogger(__name__)
+
+Probe = Callable[[], Awaitable[bool]]
+
+
+@dataclass
+class ServiceHealth:
+    """Zuletzt ermittelter Zustand eines Services"""
+    available: Optional[bool] = None
+    checked_at: Optional[float] = None  # time.monotonic()
+    last_checked: Optional[datetime] = None
+    latency_ms: Optional[float] = None
+    consecutive_failures: int = 0
+    open_until: float = 0.0  # Circuit offen bis (time.monotonic())
+    
+    def age(self) -> Optional[float]:
+        if self.checked_at is None:
+            return None
+        return time.monotonic() - self.checked_at
+    
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self.open_until
+    
+    def snapshot(self) -> dict:
+        age = self.age()
+        return {
+            "available": self.available,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "last_checked": self.last_checked.isoformat() if self.last_checked else None,
+            "consecutive_failures": self.consecutive_failures,
+            "circuit": "open" if self.circuit_open else "closed"
+        }
+
+
+class HealthMonitor:
+    """
+    Prüft Services periodisch und hält das Ergebnis vor.
+    
+    Request-Pfade fragen ``is_available`` ab und erhalten innerhalb der
+    TTL den gecachten Zustand ohne Netzwerkzugriff. Nach
+    ``failure_threshold`` Fehlschlägen in Folge ist der Circuit für
+    ``cooldown`` Sekunden offen: der Service gilt ohne weitere Probe als
+    nicht verfügbar, bis die Hintergrund-Probe wieder Erfolg meldet.
+    """
+    
+    def __init__(self, probes: dict[str, Probe], settings: HealthSettings):
+        self.probes = probes
+        self.settings = settings
+        self.states = {name: ServiceHealth() for name in probes}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def _lock(self, name: str) -> asyncio.Lock:
+        lock = self._locks.get(name)
+        if lock is None:
+            lock = self._locks[name] = asyncio.Lock()
+        return lock
+    
+    async def probe(self, name: str) -> ServiceHealth:
+        """Prüft einen Service und aktualisiert seinen Zustand"""
+        state = self.states[name]
+        started = time.monotonic()
+        try:
+            available = await self.probes[name]()
+        except Exception as e:
+            logger.warning("Health-Probe %s fehlgeschlagen: %s", name, e)
+            available = False
+        
+        state.latency_ms = (time.monotonic() - started) * 1000
+        state.checked_at = time.monotonic()
+        state.last_checked = datetime.now()
+        self._record(state, available)
+        return state
+    
+    def _record(self, state: ServiceHealth, available: bool) -> None:
+        state.available = available
+        if available:
+            state.consecutive_failures = 0
+            state.open_until = 0.0
+            return
+        
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= self.settings.failure_threshold:
+            state.open_until = time.monotonic() + self.settings.cooldown
+    
+    def report_failure(self, name: str) -> None:
+        """Meldet einen fehlgeschlagenen echten Aufruf (z.B. Timeout)"""
+        state = self.states[name]
+        state.checked_at = time.monotonic()
+        state.last_checked = datetime.now()
+        self._record(state, False)
+    
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self.probe(name) for name in self.probes))
+    
+    async def is_available(self, name: str) -> bool:
+        """Verfügbarkeit aus dem Cache; probt nur bei abgelaufener TTL"""
+        state = self.states[name]
+        if state.circuit_open:
+            return False
+        
+        age = state.age()
+        if age is not None and age < self.settings.ttl:
+            return bool(state.available)
+        
+        # Parallele Anfragen teilen sich eine Probe
+        async with self._lock(name):
+            age = state.age()
+            if age is None or age >= self.settings.ttl:
+                await self.probe(name)
+        return bool(state.available)
+    
+    def snapshot(self) -> dict[str, dict]:
+        return {name: state.snapshot() for name, state in self.states.items()}
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:
+                logger.exception("Health-Monitor: unerwarteter Fehler")
+            await asyncio.sleep(self.settings.interval)
+    
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="health-monitor")
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+@lru_cache
+def get_health_monitor() -> HealthMonitor:
+    """Anwendungsweiter Health-Monitor (FastAPI-Dependency)"""
+    return HealthMonitor(
+        probes={
+            "ollama": get_ollama_client().is_available,
+            "paperless": get_paperless_client().is_available
+        },
+        settings=get_settings().health
+    )
@@ -0,0 +1,65 @@
+"""
+Anwendungsweite HTTP-Clients mit Connection-Pooling
+"""
+import importlib.util
+import logging
+from typing import Callable
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def http2_available() -> bool:
+    """HTTP/2 benötigt das optionale Paket ``h2`` (pip install httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_client(
+    *,
+    timeout: float,
+    connect_timeout: float,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    http2: bool = False,
+    verify: bool = True
+) -> httpx.AsyncClient:
+    """Erzeugt einen AsyncClient mit Keep-Alive-Pool"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+        http2=http2 and http2_available(),
+        verify=verify
+    )
+
+
+def get_client(name: str, factory: Callable[[], httpx.AsyncClient]) -> httpx.AsyncClient:
+    """
+    Liefert den gemeinsamen Client ``name``.
+    
+    Normalerweise im Lifespan angelegt; wird er vorher benötigt (z.B.
+    in Tests), entsteht er beim ersten Zugriff.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = factory()
+    return client
+
+
+async def close_clients() -> None:
+    """Schließt alle gemeinsamen Clients (Lifespan-Shutdown)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("HTTP-Client konnte nicht geschlossen werden: %s", e)
@@ -0,0 +1,269 @@
+"""
+Persistente Warteschlange für Hintergrund-Aufträge
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_sessionmaker
+from app.models.database import Job
+from app.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Handler erhalten Session und Job und liefern ein optionales Ergebnis
+JobHandler = Callable[[AsyncSession, Job], Awaitable[Optional[dict]]]
+# Aufräumen, wenn ein verwaister Job endgültig aufgegeben wird
+JobAbandonHandler = Callable[[AsyncSession, Job], Awaitable[None]]
+
+TERMINAL_STATES = ("done", "failed")
+
+
+def new_job(kind: str, document_id: Optional[int] = None, payload: Optional[dict] = None) -> Job:
+    """Erzeugt einen neuen Job im Status ``queued``"""
+    return Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        document_id=document_id,
+        status="queued",
+        attempts=0,
+        payload=payload
+    )
+
+
+class JobQueue:
+    """
+    Führt Jobs aus der ``jobs``-Tabelle mit einer festen Anzahl Worker aus.
+    
+    Die Datenbank ist die Quelle der Wahrheit: ein Worker übernimmt einen
+    Job nur per bedingtem ``UPDATE ... WHERE status = 'queued'``, sodass
+    auch mehrere Instanzen denselben Job nie doppelt ausführen. Während
+    der Ausführung erneuert der Worker ``heartbeat_at``; laufende Jobs ohne
+    Heartbeat seit ``lease_timeout`` Sekunden gelten als verwaist (Absturz,
+    Neustart) und werden wieder eingereiht, nach ``max_attempts`` Versuchen
+    aber als fehlgeschlagen markiert. Ohne laufende Worker bleiben neue
+    Jobs im Status ``queued`` liegen.
+    """
+    
+    def __init__(self, lease_timeout: float = 300.0, max_attempts: int = 3):
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._handlers: dict[str, JobHandler] = {}
+        self._abandon_handlers: dict[str, JobAbandonHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+    
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        on_abandon: Optional[JobAbandonHandler] = None
+    ) -> None:
+        self._handlers[kind] = handler
+        if on_abandon is not None:
+            self._abandon_handlers[kind] = on_abandon
+    
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+    
+    async def start(self, workers: int) -> None:
+        """Startet die Worker und reiht offene und verwaiste Jobs ein"""
+        if self.running or workers < 1:
+            return
+        
+        self._queue = asyncio.Queue()
+        
+        recovered = await self.recover_stale()
+        if recovered:
+            logger.info("%d verwaiste Jobs wieder eingereiht", len(recovered))
+        
+        async with get_sessionmaker()() as db:
+            result = await db.execute(
+                select(Job.id)
+                .where(Job.status == "queued")
+                .order_by(Job.created_at)
+            )
+            pending = result.scalars().all()
+        
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(workers)
+        ]
+        self._workers.append(asyncio.create_task(self._reaper(), name="job-reaper"))
+    
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+    
+    def enqueue(self, job_id: str) -> None:
+        """Reiht einen bereits gespeicherten Job zur Ausführung ein"""
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+    
+    async def recover_stale(self) -> list[str]:
+        """
+        Behandelt laufende Jobs mit abgelaufener Lease.
+        
+        Jobs mit verbleibenden Versuchen gehen zurück auf ``queued`` (die
+        IDs werden geliefert), die übrigen werden als fehlgeschlagen
+        markiert und der ``on_abandon``-Handler ihres Typs räumt auf.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease_timeout)
+        stale = (Job.status == "running") & or_(
+            Job.heartbeat_at.is_(None), Job.heartbeat_at < cutoff
+        )
+        
+        recovered = []
+        async with get_sessionmaker()() as db:
+            result = await db.execute(select(Job.id, Job.attempts).where(stale))
+            for job_id, attempts in result.all():
+                exhausted = attempts >= self.max_attempts
+                values = {"status": "queued"}
+                if exhausted:
+                    values = {
+                        "status": "failed",
+                        "error": f"Abgebrochen nach {attempts} Versuchen (Lease abgelaufen)"
+                    }
+                # Bedingt ändern: der Job kann inzwischen fertig sein oder
+                # von einer anderen Instanz übernommen worden sein
+                reset = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, stale)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                if not reset.rowcount:
+                    continue
+                if not exhausted:
+                    recovered.append(job_id)
+                    continue
+                
+                logger.warning("Job %s: nach %d Versuchen aufgegeben", job_id, attempts)
+                job = await db.get(Job, job_id, populate_existing=True)
+                on_abandon = self._abandon_handlers.get(job.kind)
+                if on_abandon is not None:
+                    await on_abandon(db, job)
+            await db.commit()
+        return recovered
+    
+    async def _reaper(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_timeout)
+            try:
+                for job_id in await self.recover_stale():
+                    logger.warning("Job %s: Lease abgelaufen, wieder eingereiht", job_id)
+                    self.enqueue(job_id)
+            except Exception:
+                logger.exception("Job-Reaper: unerwarteter Fehler")
+    
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            except Exception:
+                logger.exception("Job %s: unerwarteter Fehler", job_id)
+            finally:
+                self._queue.task_done()
+    
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_timeout / 3)
+            try:
+                async with get_sessionmaker()() as db:
+                    await db.execute(
+                        update(Job)
+                        .where(Job.id == job_id, Job.status == "running")
+                        .values(heartbeat_at=datetime.utcnow())
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning("Job %s: Heartbeat fehlgeschlagen: %s", job_id, e)
+    
+    async def _claim(self, db: AsyncSession, job_id: str) -> bool:
+        """Übernimmt einen wartenden Job; ``False``, wenn ein anderer Worker schneller war"""
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(
+                status="running",
+                started_at=now,
+                heartbeat_at=now,
+                attempts=Job.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount == 1
+    
+    async def run_job(self, job_id: str) -> Optional[Job]:
+        """Führt einen Job aus und speichert Status und Ergebnis"""
+        async with get_sessionmaker()() as db:
+            if not await self._claim(db, job_id):
+                # Unbekannt, abgeschlossen oder bereits von einem Worker übernommen
+                return await db.get(Job, job_id)
+            
+            job = await db.get(Job, job_id, populate_existing=True)
+            handler = self._handlers.get(job.kind)
+            if handler is None:
+                job.status = "failed"
+                job.error = f"Unbekannter Job-Typ: {job.kind}"
+                await db.commit()
+                return job
+            
+            heartbeat = asyncio.create_task(self._heartbeat(job_id), name=f"job-heartbeat-{job_id}")
+            try:
+                result = await handler(db, job)
+            except Exception as e:
+                logger.warning("Job %s (%s) fehlgeschlagen: %s", job_id, job.kind, e)
+                await db.rollback()
+                job = await db.get(Job, job_id, populate_existing=True)
+                job.status = "failed"
+                job.error = str(e)
+            else:
+                job.status = "done"
+                job.error = None
+                job.result = result
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+            
+            await db.commit()
+            return job
+
+
+@lru_cache
+def get_job_queue() -> JobQueue:
+    """Anwendungsweite Job-Queue mit allen bekannten Handlern"""
+    from app.services.archive_jobs import abandon_archive_job, run_archive_job
+    from app.services.render_jobs import abandon_render_job, run_render_job
+    
+    settings = get_settings().jobs
+    queue = JobQueue(lease_timeout=settings.lease_timeout, max_attempts=settings.max_attempts)
+    queue.register("render", run_render_job, abandon_render_job)
+    queue.register("archive", run_archive_job, abandon_archive_job)
+    return queue
+
+
+async def start_job_queue() -> None:
+    await get_job_queue().start(get_settings().jobs.workers)
+
+
+async def stop_job_queue() -> None:
+    await get_job_queue().stop()
@@ -0,0 +1,130 @@
+"""
+Cache für LLM-Antworten (In-Memory + SQLite)
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import delete
+
+from app.database import get_sessionmaker
+from app.models.database import LlmCacheEntry
+from app.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Abgelaufene DB-Einträge höchstens so oft (Sekunden) aufräumen
+PURGE_INTERVAL = 300.0
+
+
+def cache_key(model: str, system: Optional[str], prompt: str, temperature: float) -> str:
+    """Schlüssel über alle Parameter, die die Antwort bestimmen"""
+    raw = json.dumps([model, system or "", prompt, round(temperature, 3)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class LlmCache:
+    """
+    Zweistufiger Antwort-Cache.
+    
+    Die erste Stufe ist ein größenbegrenzter LRU im Prozess, die zweite
+    (optional) die Tabelle ``llm_cache`` - sie überlebt Neustarts und wird
+    von allen Workern geteilt. Einträge verfallen nach ``ttl`` Sekunden;
+    abgelaufene Zeilen werden beim Schreiben gelöscht, aber höchstens
+    alle ``PURGE_INTERVAL`` Sekunden.
+    """
+    
+    def __init__(self, max_entries: int, ttl: int, persistent: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent = persistent
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._next_purge = 0.0
+    
+    def _remember(self, key: str, text: str, created: float) -> None:
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            created, text = entry
+            if time.time() - created < self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return text
+            del self._memory[key]
+        
+        if self.persistent:
+            try:
+                async with get_sessionmaker()() as db:
+                    row = await db.get(LlmCacheEntry, key)
+            except Exception as e:
+                logger.warning("LLM-Cache (DB) nicht lesbar: %s", e)
+                row = None
+            if row is not None:
+                age = (datetime.utcnow() - row.created_at).total_seconds()
+                if age < self.ttl:
+                    self._remember(key, row.response, time.time() - age)
+                    self.persistent_hits += 1
+                    return row.response
+        
+        self.misses += 1
+        return None
+    
+    async def put(self, key: str, model: str, text: str) -> None:
+        self._remember(key, text, time.time())
+        if not self.persistent:
+            return
+        
+        try:
+            async with get_sessionmaker()() as db:
+                now = time.monotonic()
+                if now >= self._next_purge:
+                    self._next_purge = now + PURGE_INTERVAL
+                    cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+                    await db.execute(delete(LlmCacheEntry).where(LlmCacheEntry.created_at < cutoff))
+                await db.merge(LlmCacheEntry(
+                    key=key,
+                    model=model,
+                    response=text,
+                    created_at=datetime.utcnow()
+                ))
+                await db.commit()
+        except Exception as e:
+            logger.warning("LLM-Cache (DB) nicht beschreibbar: %s", e)
+    
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.persistent_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 3) if total else None
+        }
+
+
+@lru_cache
+def _llm_cache(max_entries: int, ttl: int, persistent: bool) -> LlmCache:
+    return LlmCache(max_entries, ttl, persistent)
+
+
+def get_llm_cache() -> Optional[LlmCache]:
+    """LLM-Cache gemäß Konfiguration, ``None`` wenn deaktiviert"""
+    settings = get_settings().ollama
+    if not settings.cache_enabled:
+        return None
+    return _llm_cache(settings.cache_max_entries, settings.cache_ttl, settings.cache_persistent)
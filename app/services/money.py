@@ -0,0 +1,155 @@
+"""
+Beträge von Rechnungen und Angeboten (Decimal, kaufmännisch gerundet)
+
+Die Summen werden je Dokument einmal berechnet und sowohl gespeichert als
+auch an die Templates übergeben, damit PDF und Datenbank übereinstimmen.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Iterable
+
+
+CENT = Decimal("0.01")
+DEFAULT_VAT_RATE = Decimal("19")
+
+
+def to_decimal(value: Any) -> Decimal:
+    """Float/str/int ohne Binärartefakte nach Decimal (0.1 → Decimal("0.1"))"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def round_money(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def format_euro(value: Decimal) -> str:
+    """``1234.5`` → ``"1234,50 €"``"""
+    return f"{round_money(value):.2f}".replace(".", ",") + " €"
+
+
+def format_rate(rate: Decimal) -> str:
+    """``19`` → ``"19"``, ``5.5`` → ``"5,5"``"""
+    return f"{rate.normalize():f}".replace(".", ",")
+
+
+@dataclass(frozen=True)
+class VatLine:
+    """Umsatzsteuer eines Steuersatzes"""
+    rate: Decimal
+    net: Decimal
+    vat: Decimal
+
+
+@dataclass(frozen=True)
+class DocumentTotals:
+    """
+    Positions- und Dokumentsummen.
+    
+    Jede Zeile wird auf Cent gerundet; die Umsatzsteuer wird je Steuersatz
+    aus der Summe der Zeilen berechnet und gerundet (nicht je Position).
+    """
+    lines: tuple[Decimal, ...]
+    vat_breakdown: tuple[VatLine, ...]
+    net_total: Decimal
+    vat_total: Decimal
+    gross_total: Decimal
+    
+    def document_fields(self) -> dict[str, float]:
+        """Werte für die Spalten von ``Document``"""
+        return {
+            "net_total": float(self.net_total),
+            "vat_total": float(self.vat_total),
+            "gross_total": float(self.gross_total),
+        }
+    
+    def template_data(self) -> dict[str, Any]:
+        """Formatierte Summen und Steueraufstellung für die Templates"""
+        return {
+            **self.document_fields(),
+            "net_total_fmt": format_euro(self.net_total),
+            "vat_total_fmt": format_euro(self.vat_total),
+            "gross_total_fmt": format_euro(self.gross_total),
+            "vat_breakdown": [
+                {
+                    "rate": format_rate(line.rate),
+                    "net": format_euro(line.net),
+                    "vat": format_euro(line.vat),
+                }
+                for line in self.vat_breakdown
+            ],
+        }
+    
+    def position_rows(self, positions: list[dict]) -> list[dict]:
+        """Positionen mit formatiertem Einzelpreis und Zeilensumme"""
+        return [
+            {
+                **position,
+                "unit_price_fmt": format_euro(to_decimal(position["unit_price"])),
+                "total_fmt": format_euro(line),
+            }
+            for position, line in zip(positions, self.lines)
+        ]
+    
+    def to_payload(self) -> dict[str, Any]:
+        """JSON-Form (Strings, verlustfrei) für Job-Payloads"""
+        return {
+            "lines": [str(line) for line in self.lines],
+            "vat_breakdown": [[str(l.rate), str(l.net), str(l.vat)] for l in self.vat_breakdown],
+            "net_total": str(self.net_total),
+            "vat_total": str(self.vat_total),
+            "gross_total": str(self.gross_total),
+        }
+    
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "DocumentTotals":
+        return cls(
+            lines=tuple(Decimal(line) for line in payload["lines"]),
+            vat_breakdown=tuple(
+                VatLine(Decimal(rate), Decimal(net), Decimal(vat))
+                for rate, net, vat in payload["vat_breakdown"]
+            ),
+            net_total=Decimal(payload["net_total"]),
+            vat_total=Decimal(payload["vat_total"]),
+            gross_total=Decimal(payload["gross_total"]),
+        )
+
+
+def compute_totals(positions: Iterable[dict], kleinunternehmer: bool = False) -> DocumentTotals:
+    """
+    Berechnet alle Beträge in einem Durchlauf über die Positionen.
+    
+    Kleinunternehmer (§ 19 UStG) weisen keine Umsatzsteuer aus.
+    """
+    lines = []
+    net_by_rate: dict[Decimal, Decimal] = {}
+    for position in positions:
+        line = round_money(to_decimal(position["quantity"]) * to_decimal(position["unit_price"]))
+        lines.append(line)
+        rate = to_decimal(position.get("vat_rate", DEFAULT_VAT_RATE))
+        net_by_rate[rate] = net_by_rate.get(rate, Decimal(0)) + line
+    
+    net_total = sum(lines, Decimal("0.00"))
+    breakdown: tuple[VatLine, ...] = ()
+    if not kleinunternehmer:
+        breakdown = tuple(
+            VatLine(rate, net, round_money(net * rate / 100))
+            for rate, net in sorted(net_by_rate.items(), reverse=True)
+        )
+    vat_total = sum((line.vat for line in breakdown), Decimal("0.00"))
+    
+    return DocumentTotals(
+        lines=tuple(lines),
+        vat_breakdown=breakdown,
+        net_total=net_total,
+        vat_total=vat_total,
+        gross_total=net_total + vat_total,
+    )
+
+
+def prepayment_amount(totals: DocumentTotals, percent: Any) -> Decimal:
+    """Anzahlung auf den Bruttobetrag (bei Kleinunternehmern = Netto)"""
+    return round_money(totals.gross_total * to_decimal(percent) / 100)
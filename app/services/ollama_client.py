@@ -1,29 +1,281 @@
 """
 Ollama LLM Client für Textgenerierung
 """
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, Optional
+
 import httpx
-from typing import Optional
 
+from app.services.http_pool import build_client, get_client
+from app.services.llm_cache import LlmCache, cache_key, get_llm_cache
 from app.settings import get_settings
 
 
+def get_ollama_http() -> httpx.AsyncClient:
+    """Gemeinsamer, gepoolter HTTP-Client für Ollama"""
+    def factory() -> httpx.AsyncClient:
+        settings = get_settings().ollama
+        return build_client(
+            timeout=settings.timeout,
+            connect_timeout=settings.connect_timeout,
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+            http2=settings.http2
+        )
+    return get_client("ollama", factory)
+
+
+class OllamaBusyError(Exception):
+    """Warteschlange vor Ollama ist voll"""
+    
+    def __init__(self, queue_position: int, retry_after: int):
+        super().__init__(f"Ollama ausgelastet (Warteposition {queue_position})")
+        self.queue_position = queue_position
+        self.retry_after = retry_after
+
+
+class OllamaScheduler:
+    """
+    Begrenzt gleichzeitige Anfragen an Ollama.
+    
+    Höchstens ``max_in_flight`` Generierungen laufen parallel, weitere
+    warten in einer FIFO-Warteschlange. Ist diese mit ``max_queue``
+    Einträgen voll, wird sofort ``OllamaBusyError`` ausgelöst. Identische
+    laufende Anfragen (gleicher Cache-Schlüssel) teilen sich ein Ergebnis.
+    """
+    
+    def __init__(self, max_in_flight: int, max_queue: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._pending: dict[str, asyncio.Future] = {}
+        self._avg_seconds = 5.0  # gleitender Mittelwert der Laufzeit
+        self.coalesced = 0
+        self.rejected = 0
+    
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+    
+    def _retry_after(self) -> int:
+        waves = (len(self._waiters) + 1) / self.max_in_flight
+        return max(1, math.ceil(self._avg_seconds * waves))
+    
+    async def acquire(self) -> None:
+        """Belegt einen Slot; wartet in FIFO-Reihenfolge"""
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+        
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OllamaBusyError(len(self._waiters) + 1, self._retry_after())
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() übergibt den Slot direkt an den Wartenden
+            await waiter
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+    
+    def check_capacity(self) -> None:
+        """Löst ``OllamaBusyError`` aus, wenn eine neue Anfrage abgewiesen würde"""
+        if self._in_flight >= self.max_in_flight and len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OllamaBusyError(len(self._waiters) + 1, self._retry_after())
+    
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+    
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+            self.release()
+    
+    async def run(self, key: Optional[str], factory: Callable[[], Awaitable[str]]) -> str:
+        """Führt ``factory`` in einem Slot aus, identische Keys nur einmal"""
+        if key is not None:
+            existing = self._pending.get(key)
+            if existing is not None:
+                self.coalesced += 1
+                try:
+                    return await asyncio.shield(existing)
+                except asyncio.CancelledError:
+                    # Nur weiter abbrechen, wenn wir selbst gemeint sind
+                    if not existing.cancelled():
+                        raise
+        
+        future = asyncio.get_running_loop().create_future()
+        # Fehler ohne Mitwartende nicht als "never retrieved" melden
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if key is not None:
+            self._pending[key] = future
+        try:
+            async with self.slot():
+                result = await factory()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if key is not None and self._pending.get(key) is future:
+                del self._pending[key]
+    
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected
+        }
+
+
+@lru_cache
+def _ollama_scheduler(max_in_flight: int, max_queue: int) -> OllamaScheduler:
+    return OllamaScheduler(max_in_flight, max_queue)
+
+
+def get_ollama_scheduler() -> OllamaScheduler:
+    """Anwendungsweiter Scheduler gemäß Konfiguration"""
+    settings = get_settings().ollama
+    return _ollama_scheduler(settings.max_in_flight, settings.max_queue)
+
+
+class LlmPrompt(NamedTuple):
+    """Prompt inkl. System-Prompt und Temperatur für ``generate``"""
+    prompt: str
+    system: Optional[str] = None
+    temperature: float = 0.7
+
+
+def letter_draft_prompt(
+    context: str,
+    tone: str = "formal",
+    contact_name: Optional[str] = None
+) -> LlmPrompt:
+    """Prompt für einen Briefentwurf"""
+    
+    system = """Du bist ein Assistent für deutsche Geschäftskorrespondenz.
+Du schreibst professionelle, klare und höfliche Brieftexte.
+Antworte NUR mit dem Brieftext selbst - OHNE Anrede und OHNE Grußformel.
+Diese werden automatisch vom System ergänzt.
+Halte dich kurz und präzise. Verwende keine Floskeln."""
+
+    prompt = f"""Schreibe einen {tone}en Brieftext für folgendes Anliegen:
+
+{context}
+
+{"Empfänger: " + contact_name if contact_name else ""}
+
+Brieftext (ohne Anrede/Gruß):"""
+
+    return LlmPrompt(prompt, system, temperature=0.5)
+
+
+def offer_intro_prompt(
+    context: str,
+    contact_name: Optional[str] = None
+) -> LlmPrompt:
+    """Prompt für den Einleitungstext eines Angebots"""
+    
+    system = """Du bist ein Assistent für deutsche Geschäftskorrespondenz.
+Du schreibst professionelle Angebotstexte.
+Der Text soll das Angebot einleiten und den Kunden überzeugen.
+Antworte NUR mit dem Einleitungstext - kurz und überzeugend."""
+
+    prompt = f"""Schreibe einen Einleitungstext für ein Angebot zu:
+
+{context}
+
+{"Kunde: " + contact_name if contact_name else ""}
+
+Einleitungstext:"""
+
+    return LlmPrompt(prompt, system, temperature=0.6)
+
+
+def improve_text_prompt(text: str) -> LlmPrompt:
+    """Prompt zum Verbessern/Korrigieren eines Textes"""
+    
+    system = """Du bist ein Lektor für deutsche Geschäftskorrespondenz.
+Korrigiere Rechtschreibung, Grammatik und Stil.
+Behalte den ursprünglichen Inhalt und Ton bei.
+Antworte NUR mit dem korrigierten Text."""
+
+    prompt = f"""Korrigiere und verbessere folgenden Text:
+
+{text}
+
+Korrigierter Text:"""
+
+    return LlmPrompt(prompt, system, temperature=0.3)
+
+
 class OllamaClient:
     """Client für lokale Ollama-Instanz"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        http: Optional[httpx.AsyncClient] = None,
+        cache: Optional[LlmCache] = None,
+        scheduler: Optional[OllamaScheduler] = None
+    ):
         self.settings = get_settings().ollama
         self.base_url = self.settings.url.rstrip("/")
         self.model = self.settings.model
         self.timeout = self.settings.timeout
+        self._http = http
+        self._cache = cache
+        self._scheduler = scheduler
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or get_ollama_http()
+    
+    @property
+    def cache(self) -> Optional[LlmCache]:
+        return self._cache or get_llm_cache()
+    
+    @property
+    def scheduler(self) -> OllamaScheduler:
+        return self._scheduler or get_ollama_scheduler()
     
     async def is_available(self) -> bool:
         """Prüft ob Ollama erreichbar ist"""
         if not self.settings.enabled:
             return False
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
+            response = await self.http.get(f"{self.base_url}/api/tags", timeout=5)
+            return response.status_code == 200
         except Exception:
             return False
     
@@ -31,7 +283,8 @@ class OllamaClient:
         self,
         prompt: str,
         system: Optional[str] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        bypass_cache: bool = False
     ) -> str:
         """
         Generiert Text mit Ollama.
@@ -40,10 +293,18 @@ class OllamaClient:
             prompt: User-Prompt
             system: System-Prompt (optional)
             temperature: Kreativität (0.0-1.0)
+            bypass_cache: Cache nicht lesen (die neue Antwort wird gespeichert)
             
         Returns:
             Generierter Text
         """
+        cache = self.cache
+        key = cache_key(self.model, system, prompt, temperature)
+        if cache and not bypass_cache:
+            cached = await cache.get(key)
+            if cached is not None:
+                return cached
+        
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -56,72 +317,117 @@ class OllamaClient:
         if system:
             payload["system"] = system
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        leader = False
+        
+        async def request() -> str:
+            nonlocal leader
+            leader = True
+            response = await self.http.post(
                 f"{self.base_url}/api/generate",
-                json=payload
+                json=payload,
+                timeout=self.timeout
             )
             response.raise_for_status()
             return response.json()["response"]
+        
+        # Identische laufende Anfragen teilen sich die Antwort (außer bei Bypass);
+        # gespeichert wird sie nur von der Anfrage, die Ollama gefragt hat
+        text = await self.scheduler.run(None if bypass_cache else key, request)
+        
+        if cache and leader:
+            await cache.put(key, self.model, text)
+        return text
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.7,
+        bypass_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Generiert Text mit Ollama und liefert die Tokens sobald sie eintreffen.
+        
+        Wird der Iterator vorzeitig geschlossen (z.B. Client-Abbruch),
+        schließt das auch die Verbindung zu Ollama und beendet damit die
+        Generierung upstream. Ein Cache-Treffer kommt als ein einziges
+        Token; vollständig gestreamte Antworten werden gecacht. Der
+        Stream belegt für seine gesamte Dauer einen Scheduler-Slot.
+        """
+        cache = self.cache
+        key = cache_key(self.model, system, prompt, temperature)
+        if cache and not bypass_cache:
+            cached = await cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "options": {
+                "temperature": temperature
+            }
+        }
+        
+        if system:
+            payload["system"] = system
+        
+        async with self.scheduler.slot():
+            async with self.http.stream(
+                "POST",
+                f"{self.base_url}/api/generate",
+                json=payload,
+                timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                parts = []
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if chunk.get("response"):
+                        parts.append(chunk["response"])
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        if cache:
+                            await cache.put(key, self.model, "".join(parts))
+                        break
     
     async def generate_letter_draft(
         self,
         context: str,
         tone: str = "formal",
-        contact_name: Optional[str] = None
+        contact_name: Optional[str] = None,
+        bypass_cache: bool = False
     ) -> str:
         """Generiert einen Briefentwurf"""
-        
-        system = """Du bist ein Assistent für deutsche Geschäftskorrespondenz.
-Du schreibst professionelle, klare und höfliche Brieftexte.
-Antworte NUR mit dem Brieftext selbst - OHNE Anrede und OHNE Grußformel.
-Diese werden automatisch vom System ergänzt.
-Halte dich kurz und präzise. Verwende keine Floskeln."""
-
-        prompt = f"""Schreibe einen {tone}en Brieftext für folgendes Anliegen:
-
-{context}
-
-{"Empfänger: " + contact_name if contact_name else ""}
-
-Brieftext (ohne Anrede/Gruß):"""
-
-        return await self.generate(prompt, system, temperature=0.5)
+        return await self.generate(
+            *letter_draft_prompt(context, tone, contact_name),
+            bypass_cache=bypass_cache
+        )
     
     async def generate_offer_intro(
         self,
         context: str,
-        contact_name: Optional[str] = None
+        contact_name: Optional[str] = None,
+        bypass_cache: bool = False
     ) -> str:
         """Generiert Einleitungstext für ein Angebot"""
-        
-        system = """Du bist ein Assistent für deutsche Geschäftskorrespondenz.
-Du schreibst professionelle Angebotstexte.
-Der Text soll das Angebot einleiten und den Kunden überzeugen.
-Antworte NUR mit dem Einleitungstext - kurz und überzeugend."""
-
-        prompt = f"""Schreibe einen Einleitungstext für ein Angebot zu:
-
-{context}
-
-{"Kunde: " + contact_name if contact_name else ""}
-
-Einleitungstext:"""
-
-        return await self.generate(prompt, system, temperature=0.6)
+        return await self.generate(
+            *offer_intro_prompt(context, contact_name),
+            bypass_cache=bypass_cache
+        )
     
-    async def improve_text(self, text: str) -> str:
+    async def improve_text(self, text: str, bypass_cache: bool = False) -> str:
         """Verbessert/korrigiert einen Text"""
-        
-        system = """Du bist ein Lektor für deutsche Geschäftskorrespondenz.
-Korrigiere Rechtschreibung, Grammatik und Stil.
-Behalte den ursprünglichen Inhalt und Ton bei.
-Antworte NUR mit dem korrigierten Text."""
+        return await self.generate(*improve_text_prompt(text), bypass_cache=bypass_cache)
 
-        prompt = f"""Korrigiere und verbessere folgenden Text:
-
-{text}
-
-Korrigierter Text:"""
 
-        return await self.generate(prompt, system, temperature=0.3)
+@lru_cache
+def get_ollama_client() -> OllamaClient:
+    """Anwendungsweite Client-Instanz (FastAPI-Dependency)"""
+    return OllamaClient()
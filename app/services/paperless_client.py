@@ -2,20 +2,49 @@
 paperless-ngx API Client (korrigiert für Upload)
 """
 import httpx
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
+from app.services.http_pool import build_client, get_client
+from app.services.paperless_metadata import MetadataKind, PaperlessMetadataCache
 from app.settings import get_settings
 
 
+def get_paperless_http() -> httpx.AsyncClient:
+    """Gemeinsamer, gepoolter HTTP-Client für paperless-ngx"""
+    def factory() -> httpx.AsyncClient:
+        settings = get_settings().paperless
+        return build_client(
+            timeout=settings.timeout,
+            connect_timeout=settings.connect_timeout,
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+            http2=settings.http2,
+            verify=settings.verify_ssl
+        )
+    return get_client("paperless", factory)
+
+
 class PaperlessClient:
     """Client für paperless-ngx Archivierung"""
     
-    def __init__(self):
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         self.settings = get_settings().paperless
         self.base_url = self.settings.url.rstrip("/")
         self.token = self.settings.api_token
         self.verify_ssl = self.settings.verify_ssl
+        self._http = http
+        self.metadata = PaperlessMetadataCache(
+            self,
+            ttl=self.settings.metadata_ttl,
+            create_missing=self.settings.create_missing_metadata
+        )
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or get_paperless_http()
     
     @property
     def headers(self) -> dict:
@@ -36,16 +65,13 @@ class PaperlessClient:
         if not self.settings.enabled or not self.token:
             return False
         try:
-            async with httpx.AsyncClient(
-                timeout=10,
-                verify=self.verify_ssl
-            ) as client:
-                response = await client.get(
-                    f"{self.base_url}/api/documents/",
-                    headers=self.headers,
-                    params={"page_size": 1}
-                )
-                return response.status_code in (200, 401, 403)
+            response = await self.http.get(
+                f"{self.base_url}/api/documents/",
+                headers=self.headers,
+                params={"page_size": 1},
+                timeout=10
+            )
+            return response.status_code in (200, 401, 403)
         except Exception:
             return False
     
@@ -53,9 +79,9 @@ class PaperlessClient:
         self,
         pdf_path: Path,
         title: str,
-        correspondent: Optional[str] = None,
-        document_type: Optional[str] = None,
-        tags: Optional[list[str]] = None,
+        correspondent: Optional[int] = None,
+        document_type: Optional[int] = None,
+        tags: Optional[list[int]] = None,
         created_date: Optional[str] = None
     ) -> str:
         """
@@ -64,110 +90,120 @@ class PaperlessClient:
         Args:
             pdf_path: Pfad zur PDF-Datei
             title: Dokumententitel
-            correspondent: Name des Korrespondenten (wird ggf. angelegt)
-            document_type: Dokumententyp (wird ggf. angelegt)
-            tags: Liste von Tags (werden ggf. angelegt)
+            correspondent: ID des Korrespondenten
+            document_type: ID des Dokumenttyps
+            tags: IDs der Tags
             created_date: Erstellungsdatum (YYYY-MM-DD)
             
         Returns:
             Task-ID als String
+        
+        Namen lassen sich über ``self.metadata`` bzw. ``resolve_upload_metadata``
+        in IDs auflösen.
         """
         if not pdf_path.exists():
             raise FileNotFoundError(f"PDF nicht gefunden: {pdf_path}")
         
-        async with httpx.AsyncClient(
-            timeout=60,
-            verify=self.verify_ssl
-        ) as client:
-            # Datei öffnen und als multipart senden
-            with open(pdf_path, "rb") as f:
-                # Files als tuple: (filename, file_object, content_type)
-                files = {
-                    "document": (pdf_path.name, f, "application/pdf")
-                }
-                
-                # Form-Daten separat
-                data = {"title": title}
-                
-                if correspondent:
-                    data["correspondent"] = correspondent
-                if document_type:
-                    data["document_type"] = document_type
-                if tags:
-                    # Tags als komma-separierte Liste ODER mehrere Felder
-                    for tag in tags:
-                        # paperless erwartet tags als wiederholte Felder
-                        pass
-                    data["tags"] = ",".join(tags)
-                if created_date:
-                    data["created"] = created_date
-                
-                response = await client.post(
-                    f"{self.base_url}/api/documents/post_document/",
-                    headers=self.upload_headers,  # Ohne Content-Type!
-                    files=files,
-                    data=data
+        # Datei öffnen und als multipart senden
+        with open(pdf_path, "rb") as f:
+            # Files als tuple: (filename, file_object, content_type)
+            files = {
+                "document": (pdf_path.name, f, "application/pdf")
+            }
+            
+            # Form-Daten separat
+            data: dict = {"title": title}
+            
+            if correspondent is not None:
+                data["correspondent"] = str(correspondent)
+            if document_type is not None:
+                data["document_type"] = str(document_type)
+            if tags:
+                # paperless erwartet tags als wiederholte Felder
+                data["tags"] = [str(tag) for tag in tags]
+            if created_date:
+                data["created"] = created_date
+            
+            response = await self.http.post(
+                f"{self.base_url}/api/documents/post_document/",
+                headers=self.upload_headers,  # Ohne Content-Type!
+                files=files,
+                data=data
+            )
+            
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(
+                    f"Upload fehlgeschlagen: {response.status_code} - {response.text}",
+                    request=response.request,
+                    response=response
                 )
-                
-                if response.status_code != 200:
-                    raise httpx.HTTPStatusError(
-                        f"Upload fehlgeschlagen: {response.status_code} - {response.text}",
-                        request=response.request,
-                        response=response
-                    )
-                
-                # Response ist die Task-ID als JSON-String
-                return response.json()
+            
+            # Response ist die Task-ID als JSON-String
+            return response.json()
+    
+    async def resolve_upload_metadata(
+        self,
+        correspondent: Optional[str] = None,
+        document_type: Optional[str] = None,
+        tags: Optional[list[str]] = None
+    ) -> dict:
+        """Löst Namen in die IDs für ``upload_document`` auf"""
+        return {
+            "correspondent": await self.metadata.resolve("correspondents", correspondent) if correspondent else None,
+            "document_type": await self.metadata.resolve("document_types", document_type) if document_type else None,
+            "tags": await self.metadata.resolve_many("tags", tags) if tags else None
+        }
     
     async def get_task_status(self, task_id: str) -> dict:
         """Prüft den Status eines Upload-Tasks"""
-        async with httpx.AsyncClient(
-            timeout=10,
-            verify=self.verify_ssl
-        ) as client:
-            response = await client.get(
-                f"{self.base_url}/api/tasks/",
-                headers=self.headers,
-                params={"task_id": task_id}
-            )
+        response = await self.http.get(
+            f"{self.base_url}/api/tasks/",
+            headers=self.headers,
+            params={"task_id": task_id},
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    async def list_all(self, kind: MetadataKind) -> list[dict]:
+        """Holt alle Einträge einer Metadaten-Liste über sämtliche Seiten"""
+        results = []
+        url: Optional[str] = f"{self.base_url}/api/{kind}/"
+        params: Optional[dict] = {"page_size": 100}
+        while url:
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            page = response.json()
+            results.extend(page.get("results", []))
+            # "next" enthält bereits alle Query-Parameter
+            url, params = page.get("next"), None
+        return results
+    
+    async def create_metadata(self, kind: MetadataKind, name: str) -> dict:
+        """Legt einen Korrespondenten, Dokumenttyp oder Tag an"""
+        response = await self.http.post(
+            f"{self.base_url}/api/{kind}/",
+            headers=self.headers,
+            json={"name": name},
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
     
     async def get_correspondents(self) -> list[dict]:
         """Holt alle Korrespondenten"""
-        async with httpx.AsyncClient(
-            timeout=10,
-            verify=self.verify_ssl
-        ) as client:
-            response = await client.get(
-                f"{self.base_url}/api/correspondents/",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json().get("results", [])
+        return await self.list_all("correspondents")
     
     async def get_document_types(self) -> list[dict]:
         """Holt alle Dokumententypen"""
-        async with httpx.AsyncClient(
-            timeout=10,
-            verify=self.verify_ssl
-        ) as client:
-            response = await client.get(
-                f"{self.base_url}/api/document_types/",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json().get("results", [])
+        return await self.list_all("document_types")
     
     async def get_tags(self) -> list[dict]:
         """Holt alle Tags"""
-        async with httpx.AsyncClient(
-            timeout=10,
-            verify=self.verify_ssl
-        ) as client:
-            response = await client.get(
-                f"{self.base_url}/api/tags/",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json().get("results", [])
+        return await self.list_all("tags")
+
+
+@lru_cache
+def get_paperless_client() -> PaperlessClient:
+    """Anwendungsweite Client-Instanz (FastAPI-Dependency)"""
+    return PaperlessClient()
@@ -0,0 +1,96 @@
+"""
+Cache für paperless-ngx Metadaten (Korrespondenten, Dokumenttypen, Tags)
+"""
+import asyncio
+import time
+from typing import TYPE_CHECKING, Literal, Optional
+
+if TYPE_CHECKING:
+    from app.services.paperless_client import PaperlessClient
+
+
+MetadataKind = Literal["correspondents", "document_types", "tags"]
+
+KINDS: tuple[MetadataKind, ...] = ("correspondents", "document_types", "tags")
+
+
+def _normalize(name: str) -> str:
+    # paperless vergleicht Namen ohne Beachtung der Groß-/Kleinschreibung
+    return name.strip().casefold()
+
+
+class PaperlessMetadataCache:
+    """
+    Name→ID-Index der paperless-Metadaten.
+    
+    Jede Liste wird einmal vollständig (über alle Seiten) geladen und nach
+    ``ttl`` Sekunden oder bei einem unbekannten Namen neu geladen. Fehlt ein
+    Eintrag auch danach, wird er mit ``create_missing`` angelegt. Ein Lock
+    je Art verhindert, dass parallele Uploads denselben Eintrag doppelt
+    anlegen.
+    """
+    
+    def __init__(self, client: "PaperlessClient", ttl: float, create_missing: bool = True):
+        self.client = client
+        self.ttl = ttl
+        self.create_missing = create_missing
+        self._index: dict[str, dict[str, int]] = {kind: {} for kind in KINDS}
+        self._loaded_at: dict[str, float] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+    
+    def _lock(self, kind: MetadataKind) -> asyncio.Lock:
+        # Lazy, damit der Cache nicht an eine Event-Loop gebunden ist
+        lock = self._locks.get(kind)
+        if lock is None:
+            lock = self._locks[kind] = asyncio.Lock()
+        return lock
+    
+    def _is_fresh(self, kind: MetadataKind) -> bool:
+        loaded_at = self._loaded_at.get(kind)
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+    
+    async def refresh(self, kind: MetadataKind) -> None:
+        """Lädt alle Einträge einer Art neu"""
+        items = await self.client.list_all(kind)
+        self._index[kind] = {_normalize(item["name"]): item["id"] for item in items}
+        self._loaded_at[kind] = time.monotonic()
+    
+    def invalidate(self, kind: Optional[MetadataKind] = None) -> None:
+        for k in ((kind,) if kind else KINDS):
+            self._loaded_at.pop(k, None)
+    
+    async def resolve(self, kind: MetadataKind, name: str) -> Optional[int]:
+        """ID zu einem Namen; lädt bei Bedarf neu und legt fehlende Einträge an"""
+        key = _normalize(name)
+        if not key:
+            return None
+        if self._is_fresh(kind) and key in self._index[kind]:
+            return self._index[kind][key]
+        
+        async with self._lock(kind):
+            # Ein paralleler Aufruf hat den Eintrag evtl. schon geladen/angelegt
+            if key in self._index[kind] and self._is_fresh(kind):
+                return self._index[kind][key]
+            
+            await self.refresh(kind)
+            if key in self._index[kind]:
+                return self._index[kind][key]
+            
+            if not self.create_missing:
+                return None
+            created = await self.client.create_metadata(kind, name.strip())
+            self._index[kind][key] = created["id"]
+            return created["id"]
+    
+    async def resolve_many(self, kind: MetadataKind, names: list[str]) -> list[int]:
+        ids = [await self.resolve(kind, name) for name in names]
+        return [i for i in dict.fromkeys(ids) if i is not None]
+    
+    def stats(self) -> dict:
+        return {
+            kind: {
+                "entries": len(self._index[kind]),
+                "fresh": self._is_fresh(kind)
+            }
+            for kind in KINDS
+        }
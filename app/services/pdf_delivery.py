@@ -0,0 +1,141 @@
+"""
+Auslieferung der Dokument-PDFs mit Cache-Validatoren und optionalem Offload
+"""
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from app.models.database import Document
+from app.settings import ServerSettings
+
+
+# Ab diesem Status wird das PDF nicht mehr neu erzeugt
+IMMUTABLE_STATUSES = {"final", "sent", "archiving", "archived"}
+
+# Versionierte URL (``?v=<sha256>``) eines fertigen Dokuments
+CACHE_IMMUTABLE = "private, max-age=31536000, immutable"
+# Sonst bei jeder Verwendung per If-None-Match nachfragen (meist 304)
+CACHE_REVALIDATE = "private, no-cache"
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+async def attach_pdf(doc: Document, pdf_path: Path) -> None:
+    """Setzt Pfad und Inhalts-Hash eines frisch gerenderten PDFs"""
+    doc.pdf_path = str(pdf_path)
+    doc.pdf_sha256 = await asyncio.to_thread(file_sha256, Path(pdf_path))
+
+
+def etag_for(sha256: str) -> str:
+    return f'"{sha256}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match (schwacher Vergleich, Liste oder ``*``)"""
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def cache_control(doc: Document, version: Optional[str]) -> str:
+    if doc.status in IMMUTABLE_STATUSES and version and version == doc.pdf_sha256:
+        return CACHE_IMMUTABLE
+    return CACHE_REVALIDATE
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def offload_target(pdf_path: Path, server: ServerSettings, output_dir: Path) -> Optional[str]:
+    """
+    Header-Wert für ``X-Accel-Redirect`` bzw. ``X-Sendfile``.
+    
+    nginx erhält einen internen URI unter ``accel_redirect_prefix``, der
+    auf ``output_dir`` zeigt; liegt das PDF außerhalb, liefert Python selbst.
+    """
+    if server.file_delivery == "x-sendfile":
+        return str(pdf_path.resolve())
+    try:
+        relative = pdf_path.resolve().relative_to(output_dir.resolve())
+    except ValueError:
+        return None
+    return server.accel_redirect_prefix.rstrip("/") + "/" + quote(relative.as_posix())
+
+
+def apply_if_range(request: Request, etag: str) -> None:
+    """
+    Wertet ``If-Range`` gegen den Inhalts-ETag aus.
+    
+    Passt er, bleibt nur ``Range`` übrig (Teilantwort); sonst entfällt
+    ``Range`` und die ganze Datei wird geliefert. Die FileResponse sieht
+    danach kein ``If-Range`` mehr und muss ihn nicht selbst prüfen.
+    """
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return
+    drop = b"if-range" if if_range == etag else b"range"
+    request.scope["headers"] = [
+        (name, value) for name, value in request.scope["headers"]
+        if name.lower() not in (drop, b"if-range")
+    ]
+
+
+async def pdf_response(
+    request: Request,
+    doc: Document,
+    pdf_path: Path,
+    server: ServerSettings,
+    output_dir: Path
+) -> Response:
+    """
+    Antwort für ``GET /documents/{id}/pdf``.
+    
+    ETag ist der SHA-256 des Inhalts; passt ``If-None-Match``, folgt ein 304
+    ohne Dateizugriff. Range-Anfragen bedient die FileResponse bzw. nginx,
+    ``If-Range`` wird vorher gegen den ETag geprüft.
+    Im Offload-Modus prüft der Worker nur und überlässt die Bytes nginx.
+    """
+    sha256 = doc.pdf_sha256 or await asyncio.to_thread(file_sha256, pdf_path)
+    etag = etag_for(sha256)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control(doc, request.query_params.get("v")),
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    filename = f"{doc.doc_number}.pdf"
+    if server.file_delivery != "direct":
+        target = offload_target(pdf_path, server, output_dir)
+        if target is not None:
+            header = "X-Accel-Redirect" if server.file_delivery == "x-accel-redirect" else "X-Sendfile"
+            headers.update({
+                header: target,
+                "Content-Disposition": content_disposition(filename),
+            })
+            return Response(media_type="application/pdf", headers=headers)
+    
+    apply_if_range(request, etag)
+    return FileResponse(
+        pdf_path,
+        media_type="application/pdf",
+        filename=filename,
+        headers=headers
+    )
@@ -0,0 +1,76 @@
+"""
+Live-Vorschau von Entwürfen (ohne Nummernvergabe und ohne gespeichertes PDF)
+"""
+import asyncio
+import itertools
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, Literal, Optional
+
+from app.services.typst_renderer import RenderOutput, TypstRenderer
+from app.settings import get_settings
+
+
+# Platzhalter statt einer reservierten Dokumentnummer
+PREVIEW_NUMBER = "ENTWURF"
+
+PreviewFormat = Literal["png", "pdf"]
+
+
+class PreviewDebouncer:
+    """
+    Pro Sitzung gewinnt die jüngste Anfrage.
+    
+    Jede Anfrage wartet kurz; kommt in dieser Zeit eine neuere aus
+    derselben Sitzung (z.B. beim Tippen), wird die ältere nicht gerendert.
+    """
+    
+    def __init__(self):
+        self._latest: dict[str, int] = {}
+        self._tokens = itertools.count(1)
+    
+    @asynccontextmanager
+    async def turn(self, session: Optional[str], delay: float) -> AsyncIterator[bool]:
+        """Liefert ``True``, wenn diese Anfrage noch die jüngste ist"""
+        if not session:
+            yield True
+            return
+        
+        token = next(self._tokens)
+        self._latest[session] = token
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield self._latest.get(session) == token
+        finally:
+            if self._latest.get(session) == token:
+                del self._latest[session]
+    
+    def stats(self) -> dict:
+        return {"active_sessions": len(self._latest)}
+
+
+@lru_cache
+def get_preview_debouncer() -> PreviewDebouncer:
+    return PreviewDebouncer()
+
+
+async def render_preview(method: str, render_args: dict, fmt: PreviewFormat) -> bytes:
+    """
+    Rendert einen Entwurf und liefert die Bytes.
+    
+    Läuft über denselben Weg wie fertige Dokumente (warmer Compiler,
+    Render-Cache), aber in ein eigenes Arbeitsverzeichnis, das danach
+    wieder entfernt wird. Unveränderte Entwürfe kommen aus dem Cache.
+    """
+    settings = get_settings().typst
+    directory = Path(settings.work_dir) / "preview" / uuid.uuid4().hex
+    output = RenderOutput(format=fmt, ppi=settings.preview_ppi, directory=directory)
+    try:
+        path = await getattr(TypstRenderer(), method)(**render_args, output=output)
+        return await asyncio.to_thread(path.read_bytes)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,268 @@
+"""
+Inhaltsadressierter Cache für gerenderte Dokumente
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+from app.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _file_stats(path: Path) -> tuple | None:
+    """Name, Größe und mtime einer Datei (``None``, wenn sie fehlt)"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (str(path), st.st_size, st.st_mtime_ns)
+
+
+def _resolve_binary(binary: str) -> Path:
+    """Tatsächlich aufgerufenes Binary (auch bei Angabe ohne Pfad über ``PATH``)"""
+    resolved = shutil.which(binary)
+    return Path(resolved).resolve() if resolved else Path(binary)
+
+
+def _compiler_version(binary: Path) -> bytes:
+    """Ausgabe von ``typst --version`` (leer, wenn der Aufruf scheitert)"""
+    try:
+        result = subprocess.run(
+            [str(binary), "--version"], capture_output=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return b""
+    return result.stdout.strip() if result.returncode == 0 else b""
+
+
+class RenderCache:
+    """
+    Ablage gerenderter Dateien unter ihrem Inhalts-Hash.
+    
+    Der Schlüssel umfasst die Template-Quellen, die Schriftverzeichnisse,
+    das Typst-Binary und die kanonisch serialisierten Template-Daten.
+    Treffer aktualisieren die mtime; bei Überschreiten von ``max_bytes``
+    werden die am längsten nicht benutzten Einträge entfernt.
+    
+    Die Dateizugriffe laufen in einem Worker-Thread, damit der Event-Loop
+    nicht auf das Dateisystem wartet.
+    
+    Systemschriften außerhalb von ``font_paths`` gehen nicht in den
+    Schlüssel ein; wer sie austauscht, muss den Cache leeren.
+    """
+    
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: int | None = None
+        # Fingerprints von Templates und Schriften mit ihrer Stat-Signatur
+        self._fingerprints: dict[Any, tuple[tuple, bytes]] = {}
+        # Größenbuchhaltung und Verdrängung aus mehreren Threads
+        self._lock = threading.Lock()
+    
+    async def key(
+        self,
+        template_path: Path,
+        data: dict[str, Any],
+        fmt: str = "pdf"
+    ) -> str:
+        """Berechnet den Cache-Schlüssel für einen Render-Job"""
+        return await asyncio.to_thread(self._key, template_path, data, fmt)
+    
+    def _key(self, template_path: Path, data: dict[str, Any], fmt: str) -> str:
+        h = hashlib.sha256()
+        h.update(fmt.encode() + b"\0")
+        h.update(template_path.name.encode() + b"\0")
+        h.update(self._template_fingerprint(template_path.parent))
+        h.update(self._font_fingerprint())
+        
+        h.update(json.dumps(
+            data,
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+            separators=(",", ":")
+        ).encode())
+        return h.hexdigest()
+    
+    def _memoized(self, name: Any, signature: tuple, compute: Callable[[], bytes]) -> bytes:
+        cached = self._fingerprints.get(name)
+        if cached is None or cached[0] != signature:
+            cached = (signature, compute())
+            self._fingerprints[name] = cached
+        return cached[1]
+    
+    def _template_fingerprint(self, directory: Path) -> bytes:
+        """
+        Hash aller Templates (inkl. Importe) eines Verzeichnisses.
+        
+        Die Inhalte werden nur neu gelesen, wenn sich Name, Größe oder
+        mtime einer Datei geändert hat; sonst genügt ein ``stat`` je Datei.
+        """
+        paths = sorted(directory.glob("*.typ"))
+        signature = tuple(_file_stats(path) for path in paths)
+        
+        def compute() -> bytes:
+            h = hashlib.sha256()
+            for path in paths:
+                h.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+            return h.digest()
+        
+        return self._memoized(("templates", directory), signature, compute)
+    
+    def _font_fingerprint(self) -> bytes:
+        """
+        Hash über Schriften und Compiler-Version.
+        
+        Das Binary wird wie beim Aufruf über ``PATH`` aufgelöst. Die
+        Schriftverzeichnisse werden nur neu durchsucht und ``--version``
+        nur neu abgefragt, wenn sich die mtime eines Verzeichnisses oder
+        das Binary geändert hat.
+        """
+        settings = get_settings().typst
+        font_dirs = [Path(font_dir) for font_dir in settings.font_paths]
+        binary = _resolve_binary(settings.binary)
+        signature = tuple(_file_stats(path) for path in (*font_dirs, binary))
+        
+        def compute() -> bytes:
+            h = hashlib.sha256()
+            for font_dir in font_dirs:
+                for path in sorted(font_dir.rglob("*")):
+                    if path.is_file():
+                        h.update(repr(_file_stats(path)).encode() + b"\n")
+            h.update(repr(_file_stats(binary)).encode() + b"\n")
+            h.update(_compiler_version(binary))
+            return h.digest()
+        
+        return self._memoized("fonts", signature, compute)
+    
+    def _entry_path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+    
+    def _entries(self) -> list[Path]:
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.glob("*/*") if p.is_file() and not p.name.startswith(".")]
+    
+    async def get(self, key: str, target: Path) -> bool:
+        """Stellt einen Treffer unter ``target`` bereit"""
+        found = await asyncio.to_thread(self._get, key, target)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+    
+    def _get(self, key: str, target: Path) -> bool:
+        entry = self._entry_path(key, target.suffix)
+        if not entry.exists():
+            return False
+        
+        # Immer kopieren: ein Hardlink teilte sich den Inode mit dem Eintrag,
+        # ein späterer Render an dieselbe Stelle überschriebe dann den Cache
+        tmp = target.parent / f".{uuid.uuid4().hex}.tmp"
+        try:
+            os.utime(entry)
+            shutil.copyfile(entry, tmp)
+            os.replace(tmp, target)
+        except OSError as e:
+            logger.warning("Render-Cache-Eintrag %s nicht lesbar: %s", entry, e)
+            tmp.unlink(missing_ok=True)
+            return False
+        return True
+    
+    async def lookup(self, key: str, suffix: str) -> Path | None:
+        """Pfad eines Eintrags zum direkten Ausliefern (zählt als Benutzung)"""
+        entry = self._entry_path(key, suffix)
+        try:
+            await asyncio.to_thread(os.utime, entry)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+    
+    async def put(self, key: str, source: Path) -> None:
+        """Legt eine gerenderte Datei im Cache ab"""
+        await asyncio.to_thread(self._put, key, source)
+    
+    def _put(self, key: str, source: Path) -> None:
+        entry = self._entry_path(key, source.suffix)
+        if entry.exists():
+            return
+        
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.parent / f".{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.warning("Render-Cache konnte %s nicht speichern: %s", source, e)
+            tmp.unlink(missing_ok=True)
+            return
+        
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._size += entry.stat().st_size
+            
+            if self._size > self.max_bytes:
+                self._evict()
+    
+    def _evict(self) -> None:
+        """Entfernt die ältesten Einträge bis 90% des Limits erreicht sind"""
+        entries = []
+        for path in self._entries():
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                continue
+        entries.sort(key=lambda e: e[0].st_mtime)
+        size = sum(st.st_size for st, _ in entries)
+        limit = self.max_bytes * 0.9
+        for st, path in entries:
+            if size <= limit:
+                break
+            path.unlink(missing_ok=True)
+            size -= st.st_size
+        self._size = size
+    
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(p.stat().st_size for p in entries),
+            "max_bytes": self.max_bytes
+        }
+
+
+@lru_cache
+def _render_cache(root: Path, max_bytes: int) -> RenderCache:
+    return RenderCache(root, max_bytes)
+
+
+def get_render_cache() -> RenderCache | None:
+    """Render-Cache gemäß Konfiguration, ``None`` wenn deaktiviert"""
+    settings = get_settings().typst
+    if not settings.render_cache:
+        return None
+    return _render_cache(
+        Path(settings.work_dir) / "render",
+        settings.render_cache_max_mb * 1024 * 1024
+    )
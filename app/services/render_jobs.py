@@ -0,0 +1,71 @@
+"""
+Hintergrund-Rendering von Dokumenten
+"""
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Document, Job
+from app.services.money import DocumentTotals
+from app.services.pdf_delivery import attach_pdf
+from app.services.typst_renderer import TypstRenderer
+
+
+# Render-Methoden, die als Job ausgeführt werden dürfen
+RENDER_METHODS = ("render_letter", "render_invoice", "render_offer")
+
+# Datumsparameter, die im JSON-Payload als ISO-String liegen
+_DATE_ARGS = ("doc_date", "due_date", "valid_until")
+
+
+def render_job_payload(method: str, render_args: dict[str, Any]) -> dict:
+    """Serialisiert einen Render-Aufruf für die ``jobs``-Tabelle"""
+    if method not in RENDER_METHODS:
+        raise ValueError(f"Unbekannte Render-Methode: {method}")
+    args = dict(render_args)
+    if isinstance(args.get("totals"), DocumentTotals):
+        # Beträge als Strings, damit sie nicht über float laufen
+        args["totals"] = args["totals"].to_payload()
+    return {"method": method, "args": jsonable_encoder(args)}
+
+
+def _render_args_from_payload(payload: dict) -> dict[str, Any]:
+    args = dict(payload["args"])
+    for key in _DATE_ARGS:
+        if args.get(key):
+            args[key] = datetime.fromisoformat(args[key])
+    if args.get("totals"):
+        args["totals"] = DocumentTotals.from_payload(args["totals"])
+    return args
+
+
+async def run_render_job(db: AsyncSession, job: Job) -> Optional[dict]:
+    """Rendert das PDF eines Dokuments und schließt es ab"""
+    doc = await db.get(Document, job.document_id)
+    if doc is None:
+        raise LookupError(f"Dokument {job.document_id} nicht gefunden")
+    
+    method = job.payload["method"]
+    if method not in RENDER_METHODS:
+        raise ValueError(f"Unbekannte Render-Methode: {method}")
+    
+    renderer = TypstRenderer()
+    try:
+        pdf_path = await getattr(renderer, method)(**_render_args_from_payload(job.payload))
+    except Exception:
+        doc.status = "failed"
+        await db.commit()
+        raise
+    
+    await attach_pdf(doc, pdf_path)
+    doc.status = "final"
+    return {"pdf_path": doc.pdf_path}
+
+
+async def abandon_render_job(db: AsyncSession, job: Job) -> None:
+    """Aufgegebener Render-Job: das Dokument bleibt ohne PDF"""
+    doc = await db.get(Document, job.document_id)
+    if doc is not None and doc.status == "rendering":
+        doc.status = "failed"
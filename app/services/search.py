@@ -0,0 +1,291 @@
+"""
+Volltextsuche über Kontakte und Dokumente (SQLite FTS5 bzw. PostgreSQL tsvector)
+"""
+import html
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Markierungen aus dem Private-Use-Bereich: werden erst nach dem
+# HTML-Escaping durch <mark> ersetzt, damit Inhalte nicht als HTML wirken
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+# Indizierte Spalten je Tabelle (Namen wie in der Inhaltstabelle) und
+# Gewichtung für bm25()
+FTS_TABLES: dict[str, dict[str, float]] = {
+    "contacts": {
+        "company_name": 10.0,
+        "last_name": 8.0,
+        "first_name": 5.0,
+        "city": 2.0,
+        "customer_number": 10.0,
+    },
+    "documents": {
+        "doc_number": 10.0,
+        "subject": 5.0,
+        "content": 1.0,
+    },
+}
+
+
+def _fts_update_trigger(table: str, columns: list[str]) -> str:
+    """
+    Update-Trigger nur für die indizierten Spalten: Status-, Pfad- oder
+    Zeitstempel-Updates lassen den FTS-Index unberührt
+    """
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return (
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+    )
+
+
+def _fts_ddl(table: str, columns: list[str]) -> list[str]:
+    """Virtuelle Tabelle (external content) plus Trigger zur Synchronisation"""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        _fts_update_trigger(table, columns),
+        # Bestehende Zeilen einmalig übernehmen
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _pg_vector(table: str) -> str:
+    """Gewichteter tsvector-Ausdruck (identisch in Index und Abfrage)"""
+    parts = []
+    for column, weight in FTS_TABLES[table].items():
+        label = "A" if weight >= 10 else "B" if weight >= 5 else "C" if weight >= 2 else "D"
+        parts.append(f"setweight(to_tsvector('simple', coalesce({column}, '')), '{label}')")
+    return " || ".join(parts)
+
+
+def pg_index_name(table: str) -> str:
+    return f"ix_{table}_search"
+
+
+def _pg_ddl() -> list[str]:
+    # CONCURRENTLY: läuft außerhalb einer Transaktion (siehe Migration 0003)
+    return [
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {pg_index_name(table)} "
+        f"ON {table} USING gin (({_pg_vector(table)}))"
+        for table in FTS_TABLES
+    ]
+
+
+def ensure_search_index(sync_conn) -> list[str]:
+    """
+    Legt den Suchindex an.
+    
+    SQLite: fehlende FTS5-Tabellen samt Triggern, einmalig befüllt.
+    PostgreSQL: GIN-Indizes über gewichtete tsvector-Ausdrücke, die
+    ohne Trigger aktuell bleiben. Andere Datenbanken werden übersprungen.
+    """
+    if sync_conn.dialect.name == "postgresql":
+        for statement in _pg_ddl():
+            sync_conn.exec_driver_sql(statement)
+        return []
+    if sync_conn.dialect.name != "sqlite":
+        return []
+    
+    created = []
+    for table, weights in FTS_TABLES.items():
+        fts = f"{table}_fts"
+        exists = sync_conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).first()
+        if exists:
+            continue
+        for statement in _fts_ddl(table, list(weights)):
+            sync_conn.exec_driver_sql(statement)
+        created.append(fts)
+    return created
+
+
+def scope_update_triggers(sync_conn) -> list[str]:
+    """
+    Ersetzt die Update-Trigger bestehender FTS5-Tabellen (SQLite) durch
+    die auf die indizierten Spalten beschränkte Fassung.
+    """
+    if sync_conn.dialect.name != "sqlite":
+        return []
+    
+    replaced = []
+    for table, weights in FTS_TABLES.items():
+        fts = f"{table}_fts"
+        exists = sync_conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).first()
+        if not exists:
+            continue
+        sync_conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {fts}_au")
+        sync_conn.exec_driver_sql(_fts_update_trigger(table, list(weights)))
+        replaced.append(f"{fts}_au")
+    return replaced
+
+
+def fts_query(q: str) -> Optional[str]:
+    """
+    Baut aus einer Benutzereingabe eine FTS5-Abfrage.
+    
+    Jedes Wort wird als Phrase mit Präfix-Suche gesucht, alle Wörter
+    müssen vorkommen. Operatoren der FTS5-Syntax werden so neutralisiert.
+    """
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def pg_tsquery(q: str) -> Optional[str]:
+    """Gegenstück zu ``fts_query`` für ``to_tsquery`` (PostgreSQL)"""
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def search_supported(dialect: str) -> bool:
+    return dialect in ("sqlite", "postgresql")
+
+
+def render_highlight(value: Optional[str]) -> Optional[str]:
+    """Escaped den Text und ersetzt die Treffer-Markierungen durch <mark>"""
+    if value is None:
+        return None
+    return (
+        html.escape(value)
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_END, "</mark>")
+    )
+
+
+def _bm25(table: str) -> str:
+    weights = ", ".join(str(w) for w in FTS_TABLES[table].values())
+    return f"bm25({table}_fts, {weights})"
+
+
+# Optionen für ts_headline: gleiche Markierungen wie bei FTS5
+_PG_HIGHLIGHT = f"StartSel={_MARK_START}, StopSel={_MARK_END}, HighlightAll=true"
+_PG_SNIPPET = f"StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=16, MinWords=8"
+
+
+def _contacts_sql(dialect: str) -> str:
+    if dialect == "postgresql":
+        return f"""
+            SELECT c.id, c.company_name, c.first_name, c.last_name, c.city,
+                   c.customer_number,
+                   ts_headline('simple', c.company_name, query, :highlight) AS company_hl,
+                   ts_headline('simple', c.last_name, query, :highlight) AS last_hl,
+                   ts_headline('simple', c.first_name, query, :highlight) AS first_hl,
+                   -ts_rank({_pg_vector("contacts")}, query) AS score
+            FROM contacts AS c, to_tsquery('simple', :match) AS query
+            WHERE ({_pg_vector("contacts")}) @@ query
+            ORDER BY score
+            LIMIT :limit
+        """
+    return f"""
+        SELECT c.id, c.company_name, c.first_name, c.last_name, c.city,
+               c.customer_number,
+               highlight(contacts_fts, 0, :start, :end) AS company_hl,
+               highlight(contacts_fts, 1, :start, :end) AS last_hl,
+               highlight(contacts_fts, 2, :start, :end) AS first_hl,
+               {_bm25("contacts")} AS score
+        FROM contacts_fts
+        JOIN contacts AS c ON c.id = contacts_fts.rowid
+        WHERE contacts_fts MATCH :match
+        ORDER BY score
+        LIMIT :limit
+    """
+
+
+def _documents_sql(dialect: str) -> str:
+    if dialect == "postgresql":
+        return f"""
+            SELECT d.id, d.doc_type, d.doc_number, d.subject, d.status,
+                   d.doc_date, d.contact_id,
+                   ts_headline('simple', d.subject, query, :highlight) AS subject_hl,
+                   ts_headline('simple', d.content, query, :snippet) AS snippet,
+                   -ts_rank({_pg_vector("documents")}, query) AS score
+            FROM documents AS d, to_tsquery('simple', :match) AS query
+            WHERE ({_pg_vector("documents")}) @@ query
+            ORDER BY score
+            LIMIT :limit
+        """
+    return f"""
+        SELECT d.id, d.doc_type, d.doc_number, d.subject, d.status,
+               d.doc_date, d.contact_id,
+               highlight(documents_fts, 1, :start, :end) AS subject_hl,
+               snippet(documents_fts, 2, :start, :end, '…', 16) AS snippet,
+               {_bm25("documents")} AS score
+        FROM documents_fts
+        JOIN documents AS d ON d.id = documents_fts.rowid
+        WHERE documents_fts MATCH :match
+        ORDER BY score
+        LIMIT :limit
+    """
+
+
+async def _search(db: AsyncSession, sql_for, q: str, limit: int):
+    dialect = db.get_bind().dialect.name
+    match = pg_tsquery(q) if dialect == "postgresql" else fts_query(q)
+    if match is None:
+        return []
+    params = {"match": match, "limit": limit}
+    if dialect == "postgresql":
+        params.update(highlight=_PG_HIGHLIGHT, snippet=_PG_SNIPPET)
+    else:
+        params.update(start=_MARK_START, end=_MARK_END)
+    result = await db.execute(text(sql_for(dialect)), params)
+    return result.mappings().all()
+
+
+async def search_contacts(db: AsyncSession, q: str, limit: int = 10) -> list[dict]:
+    """Kontakte nach Relevanz (kleinerer Score = besser), mit hervorgehobenem Namen"""
+    hits = []
+    for row in await _search(db, _contacts_sql, q, limit):
+        person = " ".join(filter(None, (row["first_hl"], row["last_hl"])))
+        hits.append({
+            "id": row["id"],
+            "label": row["company_name"] or " ".join(filter(None, (row["first_name"], row["last_name"]))),
+            "highlight": render_highlight(row["company_hl"] or person),
+            "city": row["city"],
+            "customer_number": row["customer_number"],
+            "score": row["score"],
+        })
+    return hits
+
+
+async def search_documents(db: AsyncSession, q: str, limit: int = 20) -> list[dict]:
+    """Dokumente nach Relevanz, mit Textausschnitt um die Treffer"""
+    return [
+        {
+            "id": row["id"],
+            "doc_type": row["doc_type"],
+            "doc_number": row["doc_number"],
+            "subject": row["subject"],
+            "status": row["status"],
+            "doc_date": row["doc_date"],
+            "contact_id": row["contact_id"],
+            "highlight": render_highlight(row["subject_hl"]),
+            "snippet": render_highlight(row["snippet"]) if _MARK_START in (row["snippet"] or "") else None,
+            "score": row["score"],
+        }
+        for row in await _search(db, _documents_sql, q, limit)
+    ]
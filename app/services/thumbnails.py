@@ -0,0 +1,145 @@
+"""
+Vorschaubilder der ersten PDF-Seite (Derivate, inhaltsadressiert abgelegt)
+"""
+import asyncio
+import hashlib
+import logging
+import shutil
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+from app.services.render_cache import RenderCache
+from app.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+# Begrenzung paralleler pdftoppm-Aufrufe (pro Event-Loop)
+_slots: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+# Ein Aufruf je Bild, parallele Anfragen warten auf dessen Ergebnis
+_pending: dict[str, asyncio.Future] = {}
+
+
+class ThumbnailError(RuntimeError):
+    pass
+
+
+def _get_slots(limit: int) -> asyncio.Semaphore:
+    global _slots
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots[0] is not loop:
+        _slots = (loop, asyncio.Semaphore(limit))
+    return _slots[1]
+
+
+@lru_cache
+def _derivative_store(root: Path, max_bytes: int) -> RenderCache:
+    return RenderCache(root, max_bytes)
+
+
+def get_derivative_store() -> RenderCache:
+    """Größenbegrenzte Ablage unter ``<work_dir>/derivatives``"""
+    settings = get_settings()
+    return _derivative_store(
+        Path(settings.typst.work_dir) / "derivatives",
+        settings.thumbnails.max_mb * 1024 * 1024
+    )
+
+
+def thumbnail_key(pdf_sha256: str, width: int, fmt: str) -> str:
+    # Gleicher PDF-Inhalt ergibt dasselbe Bild, unabhängig vom Dokument
+    return hashlib.sha256(f"thumbnail|{pdf_sha256}|{width}|{fmt}".encode()).hexdigest()
+
+
+def suffix_for(fmt: str) -> str:
+    return ".jpg" if fmt == "jpeg" else ".png"
+
+
+async def rasterize(pdf_path: Path, output_base: Path, width: int, fmt: str) -> Path:
+    """
+    Rendert Seite 1 per ``pdftoppm`` auf ``width`` Pixel Breite.
+    
+    pdftoppm hängt die Endung selbst an ``output_base`` an.
+    """
+    settings = get_settings().thumbnails
+    if not shutil.which(settings.binary):
+        raise ThumbnailError(f"pdftoppm nicht gefunden: {settings.binary}")
+    
+    process = await asyncio.create_subprocess_exec(
+        settings.binary,
+        "-f", "1", "-l", "1", "-singlefile",
+        f"-{fmt}",
+        "-scale-to-x", str(width), "-scale-to-y", "-1",
+        str(pdf_path),
+        str(output_base),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=settings.timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        raise ThumbnailError(f"pdftoppm-Timeout nach {settings.timeout}s")
+    
+    output = output_base.with_name(output_base.name + suffix_for(fmt))
+    if process.returncode != 0 or not output.exists():
+        raise ThumbnailError(f"pdftoppm-Fehler: {stderr.decode(errors='replace').strip()}")
+    return output
+
+
+async def _create(store: RenderCache, key: str, pdf_path: Path, width: int, fmt: str) -> bytes:
+    settings = get_settings().thumbnails
+    store.root.mkdir(parents=True, exist_ok=True)
+    output_base = store.root / f".{uuid.uuid4().hex}"
+    async with _get_slots(settings.max_concurrent):
+        output = await rasterize(pdf_path, output_base, width, fmt)
+    try:
+        # Aus der eigenen Datei lesen: der Store-Eintrag kann sofort
+        # wieder verdrängt werden
+        image = await asyncio.to_thread(output.read_bytes)
+        await store.put(key, output)
+    finally:
+        output.unlink(missing_ok=True)
+    return image
+
+
+async def _read_entry(store: RenderCache, key: str, fmt: str) -> bytes | None:
+    entry = await store.lookup(key, suffix_for(fmt))
+    if entry is None:
+        return None
+    try:
+        return await asyncio.to_thread(entry.read_bytes)
+    except FileNotFoundError:
+        # Zwischen lookup und Lesen verdrängt: wie ein Fehltreffer behandeln
+        return None
+
+
+async def get_thumbnail(pdf_path: Path, pdf_sha256: str, width: int) -> bytes:
+    """
+    Inhalt des Vorschaubilds; fehlt es, wird es einmalig erzeugt.
+    
+    Gleichzeitige Anfragen nach demselben Bild teilen sich einen
+    pdftoppm-Aufruf. Geliefert werden die Bytes statt eines Pfads, damit
+    eine parallele Verdrängung aus dem Store die Antwort nicht abbricht.
+    """
+    fmt = get_settings().thumbnails.format
+    store = get_derivative_store()
+    key = thumbnail_key(pdf_sha256, width, fmt)
+    
+    image = await _read_entry(store, key, fmt)
+    if image is not None:
+        return image
+    
+    future = _pending.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_create(store, key, pdf_path, width, fmt))
+        _pending[key] = future
+        future.add_done_callback(lambda _: _pending.pop(key, None))
+    return await asyncio.shield(future)
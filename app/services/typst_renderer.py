@@ -1,15 +1,153 @@
 """
 Typst PDF-Rendering Service
 """
+import asyncio
 import json
-import subprocess
+import logging
 import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal
 
+from app.services.money import DocumentTotals, compute_totals, format_euro, prepayment_amount
+from app.services.render_cache import get_render_cache
 from app.settings import get_settings
 
+try:
+    # Optional: In-Process-Compiler (pip install typst)
+    import typst as typst_py
+except ImportError:  # pragma: no cover - abhängig von der Installation
+    typst_py = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# Begrenzung paralleler Kompilierungen (pro Event-Loop)
+_render_slots: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+
+# Arbeitsverzeichnis für Render-Jobs, relativ zum Template-Root
+JOBS_DIRNAME = ".jobs"
+
+
+@dataclass(frozen=True)
+class RenderOutput:
+    """Ausgabeformat eines Renders (Standard: PDF ins ``output_dir``)"""
+    format: Literal["pdf", "png"] = "pdf"
+    ppi: int = 144  # nur PNG, es wird nur die erste Seite gerendert
+    directory: Path | None = None  # abweichendes Zielverzeichnis
+    
+    @property
+    def suffix(self) -> str:
+        return f".{self.format}"
+    
+    @property
+    def cache_format(self) -> str:
+        return self.format if self.format == "pdf" else f"{self.format}@{self.ppi}"
+    
+    def cli_args(self) -> list[str]:
+        if self.format == "pdf":
+            return []
+        return ["--format", "png", "--pages", "1", "--ppi", str(self.ppi)]
+
+
+def _get_render_slots(limit: int) -> asyncio.Semaphore:
+    """Liefert den Semaphor für parallele Kompilierungen des laufenden Loops"""
+    global _render_slots
+    loop = asyncio.get_running_loop()
+    if _render_slots is None or _render_slots[0] is not loop:
+        _render_slots = (loop, asyncio.Semaphore(limit))
+    return _render_slots[1]
+
+
+def _write_job_data(data_file_path: Path, data: dict[str, Any]) -> None:
+    with open(data_file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str, indent=2)
+
+
+class WarmTypstCompiler:
+    """
+    Resident Typst-Compiler über die Python-Bindings.
+    
+    Hält pro Slot und Template eine ``typst.Compiler``-Instanz, sodass
+    Schriften, Pakete und geparste Templates zwischen Dokumenten im
+    Speicher bleiben. Jeder Slot hat ein festes Datenverzeichnis und wird
+    exklusiv von einem Job benutzt; die Anzahl Slots entspricht
+    ``typst.max_concurrent_renders``.
+    """
+    
+    def __init__(self, templates_dir: Path, font_paths: tuple[str, ...], slots: int):
+        self.templates_dir = templates_dir
+        self.font_paths = list(font_paths)
+        self._free_slots = list(range(slots))
+        self._compilers: dict[tuple[int, Path], Any] = {}
+    
+    def _slot_data_path(self, slot: int) -> Path:
+        return self.templates_dir / JOBS_DIRNAME / f"warm-{slot}" / "data.json"
+    
+    def _get_compiler(self, slot: int, template_path: Path):
+        key = (slot, template_path)
+        compiler = self._compilers.get(key)
+        if compiler is None:
+            data_input = "/" + self._slot_data_path(slot).relative_to(self.templates_dir).as_posix()
+            compiler = typst_py.Compiler(
+                str(template_path),
+                root=str(self.templates_dir),
+                font_paths=self.font_paths,
+                sys_inputs={"data": data_input},
+            )
+            self._compilers[key] = compiler
+        return compiler
+    
+    async def compile(
+        self,
+        template_path: Path,
+        data: dict[str, Any],
+        output_path: Path,
+        output: RenderOutput | None = None
+    ) -> None:
+        """
+        Kompiliert ein Template. Muss innerhalb eines Render-Slots
+        (siehe ``_get_render_slots``) aufgerufen werden.
+        """
+        slot = self._free_slots.pop()
+        try:
+            data_file_path = self._slot_data_path(slot)
+            data_file_path.parent.mkdir(parents=True, exist_ok=True)
+            _write_job_data(data_file_path, data)
+            
+            compiler = self._get_compiler(slot, template_path)
+            if output is None or output.format == "pdf":
+                result = await asyncio.to_thread(compiler.compile)
+            else:
+                result = await asyncio.to_thread(compiler.compile, format="png", ppi=output.ppi)
+                # PNG: eine Datei je Seite, die Vorschau zeigt die erste
+                if isinstance(result, list):
+                    result = result[0]
+            output_path.write_bytes(result)
+        finally:
+            self._free_slots.append(slot)
+
+
+@lru_cache
+def get_warm_compiler(
+    templates_dir: Path,
+    font_paths: tuple[str, ...],
+    slots: int
+) -> WarmTypstCompiler | None:
+    """Cached warmer Compiler, ``None`` wenn die Typst-Bindings fehlen"""
+    if typst_py is None:
+        logger.warning(
+            "typst.engine=inprocess, aber das Python-Paket 'typst' ist nicht "
+            "installiert - verwende typst CLI"
+        )
+        return None
+    return WarmTypstCompiler(templates_dir, font_paths, slots)
+
 
 class TypstRenderer:
     """Rendert Typst-Templates zu PDF"""
@@ -24,68 +162,176 @@ class TypstRenderer:
         # Output-Verzeichnis sicherstellen
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
-    def render(
+    async def render(
         self,
         template_name: str,
         data: dict[str, Any],
-        output_filename: str
+        output_filename: str,
+        output: RenderOutput | None = None
     ) -> Path:
         """
         Rendert ein Template mit den gegebenen Daten zu PDF.
         
+        Mit ``typst.engine: inprocess`` läuft die Kompilierung über den
+        warmen Compiler, sonst (oder bei dessen Fehlschlag) als ``typst
+        compile``-Subprozess. Beides blockiert den Event-Loop nicht; die
+        Anzahl gleichzeitiger Kompilierungen ist über
+        ``typst.max_concurrent_renders`` begrenzt. Die Daten liegen pro
+        Job in einem eigenen Verzeichnis, parallele Renders desselben
+        Templates sind daher unabhängig voneinander. Bereits gerenderte
+        Kombinationen aus Template und Daten kommen aus dem Render-Cache.
+        
         Args:
             template_name: Name des Templates (z.B. "letter/default.typ")
             data: Daten für das Template
-            output_filename: Name der Ausgabedatei (ohne .pdf)
+            output_filename: Name der Ausgabedatei (ohne Endung)
+            output: Format und Ziel (Standard: PDF ins ``output_dir``)
             
         Returns:
-            Pfad zur generierten PDF-Datei
+            Pfad zur generierten Datei
         """
+        output = output or RenderOutput()
         template_path = self.templates_dir / template_name
         if not template_path.exists():
             raise FileNotFoundError(f"Template nicht gefunden: {template_path}")
         
-        output_path = self.output_dir / f"{output_filename}.pdf"
+        output_dir = output.directory or self.output_dir
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / f"{output_filename}{output.suffix}"
         
-        # Daten als JSON - im selben Verzeichnis wie das Template
-        template_dir = template_path.parent
-        data_file_path = template_dir / "_data.json"
+        # Identische Renders (Retries, Neu-Generierung) aus dem Cache bedienen
+        cache = get_render_cache()
+        cache_key = await cache.key(template_path, data, output.cache_format) if cache else None
+        if cache and await cache.get(cache_key, output_path):
+            return output_path
         
+        # In eine temporäre Datei rendern und ersetzen: Leser sehen nie eine
+        # halb geschriebene Datei und das Ziel bekommt einen eigenen Inode
+        tmp_path = output_dir / f".{uuid.uuid4().hex}{output.suffix}"
         try:
-            # JSON-Daten schreiben
-            with open(data_file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, default=str, indent=2)
+            async with _get_render_slots(self.settings.typst.max_concurrent_renders):
+                await self._render_uncached(template_path, data, tmp_path, output)
+            os.replace(tmp_path, output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        
+        if cache:
+            await cache.put(cache_key, output_path)
+        return output_path
+    
+    async def _render_uncached(
+        self,
+        template_path: Path,
+        data: dict[str, Any],
+        output_path: Path,
+        output: RenderOutput
+    ) -> None:
+        warm = self._get_warm_compiler()
+        if warm is not None:
+            try:
+                await warm.compile(template_path, data, output_path, output)
+                return
+            except Exception as e:
+                logger.warning(
+                    "Warmer Typst-Compiler fehlgeschlagen (%s), Fallback auf CLI", e
+                )
+        
+        await self._render_cli(template_path, data, output_path, output)
+    
+    def _get_warm_compiler(self) -> WarmTypstCompiler | None:
+        if self.settings.typst.engine != "inprocess":
+            return None
+        return get_warm_compiler(
+            self.templates_dir,
+            tuple(self.settings.typst.font_paths),
+            self.settings.typst.max_concurrent_renders
+        )
+    
+    async def _render_cli(
+        self,
+        template_path: Path,
+        data: dict[str, Any],
+        output_path: Path,
+        output: RenderOutput
+    ) -> None:
+        """Einmaliger ``typst compile``-Aufruf mit eigenem Job-Workspace"""
+        # Jeder Render-Job bekommt einen eigenen Workspace unterhalb des
+        # Template-Roots; das Template liest die Daten über sys.inputs.data.
+        job_dir = self.templates_dir / JOBS_DIRNAME / uuid.uuid4().hex
+        job_dir.mkdir(parents=True)
+        
+        try:
+            _write_job_data(job_dir / "data.json", data)
             
-            # Umgebungsvariablen
-            env = os.environ.copy()
-            env["TYPST_CACHE_DIR"] = self.cache_dir
+            # Pfad relativ zum Root (in Typst absolut = ab --root)
+            data_input = "/" + (job_dir / "data.json").relative_to(self.templates_dir).as_posix()
             
-            # Typst kompilieren
-            result = subprocess.run(
-                [
-                    self.typst_bin,
-                    "compile",
-                    "--root", str(self.templates_dir),
-                    str(template_path),
-                    str(output_path)
-                ],
-                capture_output=True,
-                text=True,
-                env=env,
-                cwd=str(template_dir)
+            await self._compile(
+                template_path,
+                output_path,
+                inputs={"data": data_input},
+                cwd=template_path.parent,
+                extra_args=output.cli_args()
             )
             
-            if result.returncode != 0:
-                raise RuntimeError(f"Typst-Fehler: {result.stderr}")
-            
-            return output_path
-            
         finally:
-            # Temp-Datei aufräumen
-            if data_file_path.exists():
-                data_file_path.unlink()
+            # Workspace aufräumen
+            shutil.rmtree(job_dir, ignore_errors=True)
+    
+    async def _compile(
+        self,
+        template_path: Path,
+        output_path: Path,
+        inputs: dict[str, str],
+        cwd: Path,
+        extra_args: list[str] | None = None
+    ) -> None:
+        """Führt ``typst compile`` als asynchronen Subprozess aus"""
+        # Umgebungsvariablen
+        env = os.environ.copy()
+        env["TYPST_CACHE_DIR"] = self.cache_dir
+        
+        extra_args = list(extra_args or [])
+        for key, value in inputs.items():
+            extra_args += ["--input", f"{key}={value}"]
+        for font_path in self.settings.typst.font_paths:
+            extra_args += ["--font-path", font_path]
+        
+        process = await asyncio.create_subprocess_exec(
+            self.typst_bin,
+            "compile",
+            "--root", str(self.templates_dir),
+            *extra_args,
+            str(template_path),
+            str(output_path),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=str(cwd)
+        )
+        
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(),
+                timeout=self.settings.typst.render_timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise RuntimeError(
+                f"Typst-Timeout nach {self.settings.typst.render_timeout}s"
+            )
+        except asyncio.CancelledError:
+            # Anfrage abgebrochen: Kompilierung nicht verwaist weiterlaufen lassen
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        
+        if process.returncode != 0:
+            raise RuntimeError(f"Typst-Fehler: {stderr.decode(errors='replace')}")
     
-    def render_letter(
+    async def render_letter(
         self,
         sender: dict,
         contact: dict,
@@ -93,7 +339,8 @@ class TypstRenderer:
         content: str,
         doc_number: str,
         doc_date: datetime,
-        letter_type: str = "business"
+        letter_type: str = "business",
+        output: RenderOutput | None = None
     ) -> Path:
         """Rendert einen Geschäfts- oder Privatbrief"""
         data = {
@@ -108,9 +355,9 @@ class TypstRenderer:
         
         prefix = "brief" if letter_type == "business" else "privat"
         filename = f"{prefix}_{doc_number}_{doc_date.strftime('%Y%m%d')}"
-        return self.render("letter/default.typ", data, filename)
+        return await self.render("letter/default.typ", data, filename, output)
     
-    def render_invoice(
+    async def render_invoice(
         self,
         sender: dict,
         contact: dict,
@@ -119,23 +366,12 @@ class TypstRenderer:
         doc_date: datetime,
         due_date: datetime,
         notes: str = "",
-        kleinunternehmer: bool = False
+        kleinunternehmer: bool = False,
+        totals: DocumentTotals | None = None,
+        output: RenderOutput | None = None
     ) -> Path:
-        """Rendert eine Rechnung"""
-        # Beträge berechnen
-        net_total = sum(p["quantity"] * p["unit_price"] for p in positions)
-        
-        if kleinunternehmer:
-            vat_total = 0
-            gross_total = net_total
-        else:
-            vat_amounts = {}
-            for p in positions:
-                rate = p.get("vat_rate", 19)
-                amount = p["quantity"] * p["unit_price"] * (rate / 100)
-                vat_amounts[rate] = vat_amounts.get(rate, 0) + amount
-            vat_total = sum(vat_amounts.values())
-            gross_total = net_total + vat_total
+        """Rendert eine Rechnung (``totals`` wie gespeichert, sonst berechnet)"""
+        totals = totals or compute_totals(positions, kleinunternehmer)
         
         # Kleinunternehmer-Flag in Sender-Daten einbetten
         sender_with_flag = {**sender, "kleinunternehmer": kleinunternehmer}
@@ -143,20 +379,18 @@ class TypstRenderer:
         data = {
             "sender": sender_with_flag,
             "contact": contact,
-            "positions": positions,
+            "positions": totals.position_rows(positions),
             "doc_number": doc_number,
             "doc_date": doc_date.strftime("%d.%m.%Y"),
             "due_date": due_date.strftime("%d.%m.%Y"),
-            "net_total": net_total,
-            "vat_total": vat_total,
-            "gross_total": gross_total,
+            **totals.template_data(),
             "notes": notes
         }
         
         filename = f"rechnung_{doc_number}_{doc_date.strftime('%Y%m%d')}"
-        return self.render("invoice/default.typ", data, filename)
+        return await self.render("invoice/default.typ", data, filename, output)
     
-    def render_offer(
+    async def render_offer(
         self,
         sender: dict,
         contact: dict,
@@ -167,20 +401,12 @@ class TypstRenderer:
         valid_until: datetime,
         prepayment_percent: float = None,
         notes: str = "",
-        kleinunternehmer: bool = False
+        kleinunternehmer: bool = False,
+        totals: DocumentTotals | None = None,
+        output: RenderOutput | None = None
     ) -> Path:
-        """Rendert ein Angebot"""
-        net_total = sum(p["quantity"] * p["unit_price"] for p in positions)
-        
-        if kleinunternehmer:
-            vat_total = 0
-            gross_total = net_total
-        else:
-            vat_total = sum(
-                p["quantity"] * p["unit_price"] * (p.get("vat_rate", 19) / 100)
-                for p in positions
-            )
-            gross_total = net_total + vat_total
+        """Rendert ein Angebot (``totals`` wie gespeichert, sonst berechnet)"""
+        totals = totals or compute_totals(positions, kleinunternehmer)
         
         # Kleinunternehmer-Flag in Sender-Daten einbetten
         sender_with_flag = {**sender, "kleinunternehmer": kleinunternehmer}
@@ -189,16 +415,18 @@ class TypstRenderer:
             "sender": sender_with_flag,
             "contact": contact,
             "subject": subject,
-            "positions": positions,
+            "positions": totals.position_rows(positions),
             "doc_number": doc_number,
             "doc_date": doc_date.strftime("%d.%m.%Y"),
             "valid_until": valid_until.strftime("%d.%m.%Y"),
-            "net_total": net_total,
-            "vat_total": vat_total,
-            "gross_total": gross_total,
+            **totals.template_data(),
             "prepayment_percent": prepayment_percent,
+            "prepayment_fmt": (
+                format_euro(prepayment_amount(totals, prepayment_percent))
+                if prepayment_percent is not None else None
+            ),
             "notes": notes
         }
         
         filename = f"angebot_{doc_number}_{doc_date.strftime('%Y%m%d')}"
-        return self.render("offer/default.typ", data, filename)
+        return await self.render("offer/default.typ", data, filename, output)
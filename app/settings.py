@@ -10,6 +10,7 @@ Configuration design:
 """
 from pathlib import Path
 from functools import lru_cache
+from typing import Literal
 
 from pydantic import BaseModel, Field, AliasChoices, ConfigDict
 from pydantic_settings import BaseSettings, SettingsConfigDict 
@@ -24,6 +25,25 @@ class ServerSettings(BaseModel):
     port: int = 8080
     debug: bool = False
     log_level: str = "info"
+    # PDF-Auslieferung: "direct" (uvicorn streamt) oder Offload an den
+    # Reverse-Proxy, der Worker prüft dann nur noch Zugriff und ETag
+    file_delivery: Literal["direct", "x-accel-redirect", "x-sendfile"] = "direct"
+    # Interne nginx-Location (internal; alias auf typst.output_dir)
+    accel_redirect_prefix: str = "/_protected/documents/"
+
+
+class SqliteSettings(BaseModel):
+    """Performance-Profil für SQLite-Dateien (wird je Verbindung gesetzt)"""
+    # WAL: Leser blockieren nicht hinter einem schreibenden Commit
+    journal_mode: Literal["wal", "delete", "truncate", "persist", "memory"] = "wal"
+    # NORMAL ist mit WAL absturzsicher, spart aber das fsync je Commit
+    synchronous: Literal["off", "normal", "full", "extra"] = "normal"
+    mmap_size: int = 256 * 1024 * 1024  # Bytes
+    cache_size: int = -64000  # negativ = KiB, also ca. 64 MB je Verbindung
+    busy_timeout: int = 5000  # ms Wartezeit auf Sperren
+    # Eigener Pool mit schreibgeschützten Verbindungen für Listen/Abrufe
+    read_pool_size: int = Field(default=5, ge=1)
+    model_config = ConfigDict(extra="forbid")
 
 
 class DatabaseSettings(BaseModel):
@@ -33,6 +53,18 @@ class DatabaseSettings(BaseModel):
     #    validation_alias="KORRESPONDENZ_DATABASE_URL",
     #)
     url: str = "sqlite+aiosqlite:///data/korrespondenz.sqlite"
+    # Connection-Pool (bei SQLite für Schreib-Verbindungen). Bei PostgreSQL
+    # gilt er je Worker-Prozess: Worker × (pool_size + max_overflow) muss
+    # unter max_connections des Servers bleiben.
+    pool_size: int = Field(default=5, ge=1)
+    max_overflow: int = Field(default=10, ge=0)
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800  # Sekunden; vor Server-/Proxy-Timeouts erneuern
+    pool_pre_ping: bool = True  # tote Verbindungen vor Benutzung erkennen
+    # Ausstehende Migrationen beim Start anwenden. Aus: nur per
+    # ``python -m app.migrations upgrade`` (z.B. als Deploy-Schritt)
+    migrate_on_startup: bool = True
+    sqlite: SqliteSettings = Field(default_factory=SqliteSettings)
     model_config = ConfigDict(extra="forbid")
 
 
@@ -41,20 +73,109 @@ class TypstSettings(BaseModel):
     cache_dir: str = "/opt/korrespondenz/.typst-cache"
     templates_dir: str = "/opt/korrespondenz/templates"
     output_dir: str = "/opt/korrespondenz/data/documents"
-
-
-class PaperlessSettings(BaseModel):
+    # Interne Ablage für Render-Cache, Vorschaubilder und Live-Vorschau;
+    # bewusst außerhalb von output_dir, das unter /files öffentlich ist
+    work_dir: str = "/opt/korrespondenz/data/cache"
+    # Zusätzliche Schriftverzeichnisse (z.B. für "Inter")
+    font_paths: list[str] = Field(default_factory=list)
+    # "cli": typst compile pro Dokument
+    # "inprocess": warmer Compiler über das Python-Paket "typst", Fallback auf CLI
+    engine: Literal["cli", "inprocess"] = "cli"
+    # Inhaltsadressierter Cache unter <work_dir>/render
+    render_cache: bool = True
+    render_cache_max_mb: int = 256
+    # Maximale Anzahl parallel laufender Typst-Kompilierungen
+    max_concurrent_renders: int = Field(default=4, ge=1)
+    # Timeout pro Kompilierung in Sekunden
+    render_timeout: int = 60
+    # Live-Vorschau: Auflösung der PNG-Seite und Wartezeit, in der eine
+    # neuere Anfrage derselben Sitzung die ältere ersetzt
+    preview_ppi: int = Field(default=72, ge=18, le=300)
+    preview_debounce: float = Field(default=0.15, ge=0)
+
+
+class ThumbnailSettings(BaseModel):
+    """Vorschaubilder der ersten PDF-Seite (poppler ``pdftoppm``)"""
+    enabled: bool = True
+    binary: str = "/usr/bin/pdftoppm"
+    format: Literal["png", "jpeg"] = "png"
+    width: int = Field(default=320, ge=16)  # Standardbreite in Pixel
+    max_width: int = Field(default=1200, ge=16)
+    # Ablage unter <typst.work_dir>/derivatives, älteste Bilder fliegen zuerst
+    max_mb: int = 128
+    max_concurrent: int = Field(default=2, ge=1)
+    timeout: int = 30
+
+
+class JobSettings(BaseModel):
+    # Anzahl Worker für Hintergrund-Aufträge (0 = nur einreihen)
+    workers: int = Field(default=2, ge=0)
+    # Abfrageintervall für Status-Streams (SSE) in Sekunden
+    poll_interval: float = 0.5
+    # Sekunden ohne Heartbeat, nach denen ein laufender Job als verwaist gilt
+    lease_timeout: float = Field(default=300.0, gt=0)
+    # Versuche, nach denen ein verwaister Job als fehlgeschlagen gilt
+    max_attempts: int = Field(default=3, ge=1)
+
+
+class HealthSettings(BaseModel):
+    """Hintergrund-Prüfung von Ollama und paperless"""
+    interval: float = 30.0  # Sekunden zwischen Proben
+    ttl: float = 60.0  # so lange gilt ein Ergebnis für Request-Pfade
+    failure_threshold: int = 3  # Fehlschläge bis der Circuit öffnet
+    cooldown: float = 30.0  # Sekunden, die der Circuit offen bleibt
+
+
+class HttpPoolSettings(BaseModel):
+    """Connection-Pool der gemeinsamen HTTP-Clients"""
+    connect_timeout: float = 5.0
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    # Nur wirksam, wenn das Paket "h2" installiert ist
+    http2: bool = True
+
+
+class PaperlessSettings(HttpPoolSettings):
     enabled: bool = True
     url: str = "http://paperless-ngx.lan.internal:8000"
     api_token: str = ""   # value injected in from_yaml()
     verify_ssl: bool = False
-
-
-class OllamaSettings(BaseModel):
+    timeout: int = 60
+    # Archiv-Worker: Wiederholungen bei 5xx/Timeouts mit exponentiellem Backoff
+    upload_retries: int = Field(default=3, ge=0)
+    retry_backoff: float = 2.0  # Sekunden, verdoppelt sich je Versuch
+    # Abfrage des Consume-Tasks bis paperless das Dokument angelegt hat
+    task_poll_interval: float = 2.0
+    task_timeout: float = 300.0
+    # Parallele Uploads über alle Archiv-Jobs (z.B. Sammel-Archivierung)
+    batch_concurrency: int = Field(default=4, ge=1)
+    # Metadaten (Korrespondenten, Dokumenttypen, Tags): Cache-Dauer in Sekunden
+    metadata_ttl: float = 600.0
+    # Fehlende Einträge beim Upload in paperless anlegen
+    create_missing_metadata: bool = True
+    # Dokumenttyp in paperless je Dokumentart und Tags für jeden Upload
+    document_types: dict[str, str] = Field(default_factory=lambda: {
+        "letter": "Brief",
+        "invoice": "Rechnung",
+        "offer": "Angebot"
+    })
+    tags: list[str] = Field(default_factory=list)
+
+
+class OllamaSettings(HttpPoolSettings):
     enabled: bool = True
     url: str = "http://ollama.lan.internal:11434"
     model: str = "gemma2-small-ctx:latest"
     timeout: int = 120
+    # Antwort-Cache: In-Memory (LRU) plus optional persistent in der Datenbank
+    cache_enabled: bool = True
+    cache_ttl: int = 7 * 24 * 3600  # Sekunden
+    cache_max_entries: int = 256
+    cache_persistent: bool = True
+    # Scheduler: parallele Generierungen und Länge der Warteschlange (danach 429)
+    max_in_flight: int = Field(default=1, ge=1)
+    max_queue: int = Field(default=8, ge=0)
 
 
 class SenderAddress(BaseModel):
@@ -109,8 +230,11 @@ class Settings(BaseSettings):
     server: ServerSettings = Field(default_factory=ServerSettings)
     database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     typst: TypstSettings = Field(default_factory=TypstSettings)
+    thumbnails: ThumbnailSettings = Field(default_factory=ThumbnailSettings)
+    jobs: JobSettings = Field(default_factory=JobSettings)
     paperless: PaperlessSettings = Field(default_factory=PaperlessSettings)
     ollama: OllamaSettings = Field(default_factory=OllamaSettings)
+    health: HealthSettings = Field(default_factory=HealthSettings)
     sender: SenderSettings = Field(default_factory=SenderSettings)
     sender_private: SenderPrivateSettings = Field(default_factory=SenderPrivateSettings)
    
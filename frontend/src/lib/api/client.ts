@@ -114,10 +114,27 @@ export interface Document {
   gross_total: number | null;
   doc_date: string;
   pdf_path: string | null;
+  pdf_sha256: string | null;
   paperless_id: number | null;
   created_at: string;
 }
 
+export type JobStatus = 'queued' | 'running' | 'done' | 'failed';
+
+export interface Job {
+  id: string;
+  kind: string;
+  status: JobStatus;
+  document_id: number | null;
+  attempts: number;
+  error: string | null;
+  result: Record<string, unknown> | null;
+  started_at: string | null;
+  created_at: string;
+  updated_at: string;
+  document: Document | null;
+}
+
 export interface DraftResponse {
   text: string;
   model: string;
@@ -138,6 +155,34 @@ export interface HealthStatus {
   };
 }
 
+export interface ContactSearchHit {
+  id: number;
+  label: string;
+  highlight: string | null;  // HTML-escaped, Treffer in <mark>
+  city: string | null;
+  customer_number: string | null;
+  score: number;
+}
+
+export interface DocumentSearchHit {
+  id: number;
+  doc_type: string;
+  doc_number: string;
+  subject: string | null;
+  status: string;
+  doc_date: string | null;
+  contact_id: number;
+  highlight: string | null;
+  snippet: string | null;
+  score: number;
+}
+
+export interface SearchResponse {
+  query: string;
+  contacts: ContactSearchHit[];
+  documents: DocumentSearchHit[];
+}
+
 export type LetterType = 'business' | 'private';
 
 // Contacts API
@@ -208,17 +253,76 @@ export const documents = {
     body: JSON.stringify(data),
   }),
   
+  // Startet einen Archiv-Job (202); Ergebnis über getJob/waitForJob
   archive: (id: number) =>
-    request<{ message: string; task_id: string }>(`/documents/${id}/archive`, {
+    request<Job>(`/documents/${id}/archive`, {
       method: 'POST',
     }),
   
+  getJob: (jobId: string) => request<Job>(`/documents/jobs/${jobId}`),
+  
+  // Folgt dem SSE-Stream des Jobs bis "done" oder "failed"; bricht der
+  // Stream ab, wird der Status stattdessen abgefragt
+  waitForJob: (jobId: string, pollMs = 1000): Promise<Job> =>
+    new Promise((resolve, reject) => {
+      const source = new EventSource(`${BASE_URL}/documents/jobs/${jobId}/events`);
+      const finish = (event: MessageEvent) => {
+        source.close();
+        resolve(JSON.parse(event.data) as Job);
+      };
+      source.addEventListener('done', finish);
+      source.addEventListener('failed', finish);
+      source.onerror = () => {
+        source.close();
+        const poll = async () => {
+          try {
+            const job = await documents.getJob(jobId);
+            if (job.status === 'done' || job.status === 'failed') resolve(job);
+            else setTimeout(poll, pollMs);
+          } catch (e) {
+            reject(e);
+          }
+        };
+        poll();
+      };
+    }),
+  
   delete: (id: number) =>
     request<{ message: string }>(`/documents/${id}`, {
       method: 'DELETE',
     }),
   
-  getPdfUrl: (id: number) => `${BASE_URL}/documents/${id}/pdf`,
+  // Mit Inhalts-Hash ist die URL versioniert und darf dauerhaft gecacht werden
+  getPdfUrl: (id: number, sha256?: string | null) =>
+    `${BASE_URL}/documents/${id}/pdf${sha256 ? `?v=${sha256}` : ''}`,
+  
+  getThumbnailUrl: (id: number, sha256?: string | null, width = 64) =>
+    `${BASE_URL}/documents/${id}/thumbnail?width=${width}${sha256 ? `&v=${sha256}` : ''}`,
+  
+  // Live-Vorschau ohne Nummernvergabe. Liefert null, wenn eine neuere
+  // Anfrage derselben Sitzung die Vorschau überholt hat (204).
+  preview: async (
+    docType: 'letter' | 'invoice' | 'offer',
+    data: object,
+    session: string,
+    format: 'png' | 'pdf' = 'png'
+  ): Promise<Blob | null> => {
+    const res = await fetch(`${BASE_URL}/documents/preview/${docType}?format=${format}`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-Preview-Session': session,
+      },
+      body: JSON.stringify(data),
+    });
+    if (res.status === 204) return null;
+    if (!res.ok) {
+      let detail: string | undefined;
+      try { detail = (await res.json()).detail; } catch { /* ignore */ }
+      throw new ApiError(res.status, detail || `HTTP ${res.status}`, detail);
+    }
+    return res.blob();
+  },
 };
 
 // AI API
@@ -241,6 +345,16 @@ export const ai = {
     }),
 };
 
+// Search API
+export const search = {
+  all: (q: string, limit = 20) =>
+    request<SearchResponse>(`/search?${new URLSearchParams({ q, limit: String(limit) })}`),
+  
+  // Autovervollständigung für die Kontaktauswahl
+  contacts: (q: string, limit = 10) =>
+    request<ContactSearchHit[]>(`/search/contacts?${new URLSearchParams({ q, limit: String(limit) })}`),
+};
+
 // Health API
 export const health = {
   check: () => request<{ status: string }>('/health'),
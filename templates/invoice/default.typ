@@ -2,21 +2,14 @@
 // Mit Falzmarken, Lochmarke und Kleinunternehmer-Unterstützung
 // =============================================================
 
-#let data = json("_data.json")
+// Daten pro Render-Job über --input data=<pfad>, Fallback für manuelles Kompilieren
+#let data = json(sys.inputs.at("data", default: "_data.json"))
 
 // Kleinunternehmer-Flag aus Sender-Daten
 #let is_kleinunternehmer = if "kleinunternehmer" in data.sender { data.sender.kleinunternehmer } else { false }
 
-// Euro-Formatierung
-#let euro(amount) = {
-  let rounded = calc.round(amount, digits: 2)
-  let str_amount = str(rounded)
-  let parts = str_amount.split(".")
-  let euros = parts.at(0)
-  let cents = if parts.len() > 1 { parts.at(1) } else { "00" }
-  if cents.len() == 1 { cents = cents + "0" }
-  euros + "," + cents + " €"
-}
+// Beträge kommen fertig gerundet und formatiert aus app/services/money.py
+// (*_fmt), damit PDF und Datenbank übereinstimmen
 
 // Seiteneinrichtung
 #set page(
@@ -154,8 +147,8 @@
     pos.description,
     str(pos.quantity),
     pos.unit,
-    euro(pos.unit_price),
-    euro(pos.quantity * pos.unit_price)
+    pos.unit_price_fmt,
+    pos.total_fmt
   )).flatten()
 )
 
@@ -173,7 +166,7 @@
         align: (left, right),
         inset: 4pt,
         table.hline(stroke: 1pt),
-        [*Rechnungsbetrag:*], [*#euro(data.net_total)*],
+        [*Rechnungsbetrag:*], [*#data.net_total_fmt*],
       )
     } else {
       // Regelbesteuerung: Mit MwSt.
@@ -182,10 +175,14 @@
         stroke: none,
         align: (left, right),
         inset: 4pt,
-        [Nettobetrag:], [#euro(data.net_total)],
-        [zzgl. 19% MwSt.:], [#euro(data.vat_total)],
+        [Nettobetrag:], [#data.net_total_fmt],
+        // Ein Eintrag je Steuersatz, bei mehreren Sätzen mit Bemessungsgrundlage
+        ..data.vat_breakdown.map(line => (
+          if data.vat_breakdown.len() > 1 [zzgl. #line.rate% MwSt. auf #line.net:] else [zzgl. #line.rate% MwSt.:],
+          [#line.vat],
+        )).flatten(),
         table.hline(stroke: 1pt),
-        [*Rechnungsbetrag:*], [*#euro(data.gross_total)*],
+        [*Rechnungsbetrag:*], [*#data.gross_total_fmt*],
       )
     }
   ]
@@ -2,7 +2,8 @@
 // Mit Falzmarken und Lochmarke
 // =====================================
 
-#let data = json("_data.json")
+// Daten pro Render-Job über --input data=<pfad>, Fallback für manuelles Kompilieren
+#let data = json(sys.inputs.at("data", default: "_data.json"))
 
 // Brieftyp: "business" oder "private"
 #let is_business = data.letter_type == "business"
@@ -0,0 +1,260 @@
+# tests/test_archive.py
+import asyncio
+import inspect
+import json
+
+import httpx
+import pytest
+
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+class AlwaysUp:
+    async def is_available(self, name):
+        return True
+
+    def report_failure(self, name):
+        pass
+
+
+@pytest.fixture
+async def paperless(app, monkeypatch):
+    """Leitet den paperless-Client auf einen MockTransport um"""
+    from app.services import archive_jobs
+    from app.services.health_monitor import get_health_monitor
+    from app.services.paperless_client import PaperlessClient, get_paperless_client
+    from app.settings import get_settings
+
+    settings = get_settings().paperless
+    monkeypatch.setattr(settings, "retry_backoff", 0)
+    monkeypatch.setattr(settings, "task_poll_interval", 0)
+
+    routes = {}
+    seen = []
+    metadata = {"correspondents": [], "document_types": [{"id": 1, "name": "brief"}], "tags": []}
+
+    def metadata_route(kind):
+        def route(request: httpx.Request) -> httpx.Response:
+            items = metadata[kind]
+            if request.method == "POST":
+                item = {"id": len(items) + 100, "name": json.loads(request.content)["name"]}
+                items.append(item)
+                return httpx.Response(201, json=item)
+            # Zwei Einträge pro Seite, damit das Blättern mitgetestet wird
+            page = int(request.url.params.get("page", 1))
+            next_url = f"{request.url.copy_with(params={'page': page + 1})}" if len(items) > page * 2 else None
+            return httpx.Response(200, json={
+                "count": len(items), "next": next_url, "results": items[(page - 1) * 2:page * 2]
+            })
+        return route
+
+    for kind in metadata:
+        routes[f"/api/{kind}/"] = metadata_route(kind)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.path)
+        response = routes[request.url.path](request)
+        return await response if inspect.isawaitable(response) else response
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = PaperlessClient(http=http)
+    monkeypatch.setattr(archive_jobs, "get_paperless_client", lambda: client)
+    app.dependency_overrides[get_paperless_client] = lambda: client
+    app.dependency_overrides[get_health_monitor] = lambda: AlwaysUp()
+    yield routes, seen, metadata
+    app.dependency_overrides.clear()
+    await http.aclose()
+
+
+async def _create_letter(client: AsyncClient, subject: str = "Archivtest") -> dict:
+    r = await client.post("/api/contacts/", json={
+        "contact_type": "company",
+        "company_name": "ArchivCo",
+        "street": "Main St 1",
+        "zip_code": "12345",
+        "city": "Testville",
+    })
+    assert r.status_code == 200, r.text
+    r = await client.post("/api/documents/letter", json={
+        "contact_id": r.json()["id"],
+        "subject": subject,
+        "content": "Hallo",
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+async def test_archive_job_retries_upload_and_stores_paperless_id(client, typst_env, paperless):
+    from app.services.job_queue import get_job_queue
+
+    routes, seen, _ = paperless
+    uploads = iter([httpx.Response(503), httpx.Response(200, json="task-1")])
+    tasks = iter([[], [{"status": "STARTED"}], [{"status": "SUCCESS", "related_document": "42"}]])
+    routes["/api/documents/post_document/"] = lambda request: next(uploads)
+    routes["/api/tasks/"] = lambda request: httpx.Response(200, json=next(tasks))
+
+    doc = await _create_letter(client)
+    r = await client.post(f"/api/documents/{doc['id']}/archive")
+    assert r.status_code == 202, r.text
+    job = r.json()
+    assert job["kind"] == "archive"
+    assert job["document"]["status"] == "archiving"
+
+    r = await client.post(f"/api/documents/{doc['id']}/archive")
+    assert r.status_code == 409
+
+    await get_job_queue().run_job(job["id"])
+
+    job = (await client.get(f"/api/documents/jobs/{job['id']}")).json()
+    assert job["status"] == "done", job
+    assert job["result"] == {"task_id": "task-1", "paperless_id": 42}
+    assert job["document"]["status"] == "archived"
+    assert job["document"]["paperless_id"] == 42
+    assert seen.count("/api/documents/post_document/") == 2
+
+
+async def test_failed_archive_job_restores_document_status(client, typst_env, paperless):
+    from app.services.job_queue import get_job_queue
+
+    routes, _, _ = paperless
+    routes["/api/documents/post_document/"] = lambda request: httpx.Response(200, json="task-2")
+    routes["/api/tasks/"] = lambda request: httpx.Response(200, json=[
+        {"status": "FAILURE", "result": "Dokument ist ein Duplikat"}
+    ])
+
+    doc = await _create_letter(client)
+    r = await client.post(f"/api/documents/{doc['id']}/archive")
+    assert r.status_code == 202, r.text
+
+    await get_job_queue().run_job(r.json()["id"])
+
+    job = (await client.get(f"/api/documents/jobs/{r.json()['id']}")).json()
+    assert job["status"] == "failed"
+    assert job["error"] == "Dokument ist ein Duplikat"
+    assert job["document"]["status"] == doc["status"]
+    assert job["document"]["paperless_id"] is None
+
+
+async def test_client_errors_are_not_retried(client, typst_env, paperless):
+    from app.services.job_queue import get_job_queue
+
+    routes, seen, _ = paperless
+    routes["/api/documents/post_document/"] = lambda request: httpx.Response(400, text="kaputt")
+
+    doc = await _create_letter(client)
+    r = await client.post(f"/api/documents/{doc['id']}/archive")
+    job = await get_job_queue().run_job(r.json()["id"])
+
+    assert job.status == "failed"
+    assert seen.count("/api/documents/post_document/") == 1
+
+
+async def test_concurrent_single_archive_requests_claim_once(client, typst_env, paperless):
+    doc = await _create_letter(client)
+    url = f"/api/documents/{doc['id']}/archive"
+
+    responses = await asyncio.gather(*(client.post(url) for _ in range(3)))
+
+    assert sorted(r.status_code for r in responses) == [202, 409, 409]
+    r = await client.get(f"/api/documents/{doc['id']}")
+    assert r.json()["status"] == "archiving"
+
+
+async def test_archive_batch_queues_jobs_that_upload_concurrently(
+    client, typst_env, paperless, monkeypatch
+):
+    from pathlib import Path
+    from app.services.job_queue import get_job_queue
+    from app.settings import get_settings
+
+    routes, _, _ = paperless
+    monkeypatch.setattr(get_settings().paperless, "batch_concurrency", 2)
+    running = peak = 0
+
+    async def upload(request: httpx.Request) -> httpx.Response:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if b"Ablehnen" in request.content:
+            return httpx.Response(400, text="abgelehnt")
+        return httpx.Response(200, json="task-batch")
+
+    routes["/api/documents/post_document/"] = upload
+    routes["/api/tasks/"] = lambda request: httpx.Response(200, json=[
+        {"status": "SUCCESS", "related_document": 7}
+    ])
+
+    docs = [await _create_letter(client) for _ in range(3)]
+    docs.append(await _create_letter(client, subject="Ablehnen"))
+    docs.append(await _create_letter(client))
+    Path(docs[4]["pdf_path"]).unlink()
+
+    r = await client.post("/api/documents/archive/batch", json={
+        "document_ids": [d["id"] for d in docs]
+    })
+    assert r.status_code == 202, r.text
+    body = r.json()
+    assert (body["queued"], body["skipped"]) == (4, 1)
+    assert [res["status"] for res in body["results"]] == ["queued"] * 4 + ["skipped"]
+
+    # Übernommen samt Job, bevor irgendetwas hochgeladen wurde
+    for d in docs[:4]:
+        assert (await client.get(f"/api/documents/{d['id']}")).json()["status"] == "archiving"
+    r = await client.post(f"/api/documents/{docs[0]['id']}/archive")
+    assert r.status_code == 409
+
+    job_ids = [res["job_id"] for res in body["results"][:4]]
+    jobs = await asyncio.gather(*(get_job_queue().run_job(job_id) for job_id in job_ids))
+    assert [job.status for job in jobs] == ["done", "done", "done", "failed"]
+    assert peak == 2
+
+    statuses = [(await client.get(f"/api/documents/{d['id']}")).json() for d in docs[:4]]
+    assert [d["status"] for d in statuses] == ["archived", "archived", "archived", "final"]
+    assert statuses[0]["paperless_id"] == 7
+
+    # Bereits archivierte Dokumente werden nicht erneut ausgewählt
+    r = await client.post("/api/documents/archive/batch", json={
+        "document_ids": [d["id"] for d in docs[:3]]
+    })
+    assert r.json()["results"] == []
+
+
+async def test_upload_sends_resolved_metadata_ids(client, typst_env, paperless, monkeypatch):
+    from app.services.job_queue import get_job_queue
+    from app.settings import get_settings
+
+    routes, seen, metadata = paperless
+    monkeypatch.setattr(get_settings().paperless, "tags", ["korrespondenz", "ausgang"])
+    metadata["tags"] += [{"id": 11, "name": "Korrespondenz"}, {"id": 12, "name": "privat"},
+                         {"id": 13, "name": "steuer"}]
+    forms = []
+
+    def upload(request: httpx.Request) -> httpx.Response:
+        forms.append(request.content)
+        return httpx.Response(200, json="task-meta")
+
+    routes["/api/documents/post_document/"] = upload
+    routes["/api/tasks/"] = lambda request: httpx.Response(200, json=[{"status": "SUCCESS"}])
+
+    lookups = []
+    for _ in range(2):
+        doc = await _create_letter(client)
+        r = await client.post(f"/api/documents/{doc['id']}/archive")
+        job = await get_job_queue().run_job(r.json()["id"])
+        assert job.status == "done", job.error
+        lookups.append(len([p for p in seen if p.strip("/").split("/")[-1] in metadata]))
+
+    # Korrespondent und fehlender Tag wurden einmal angelegt, Typ und Tag gefunden
+    assert [c["name"] for c in metadata["correspondents"]] == ["ArchivCo"]
+    assert [t["name"] for t in metadata["tags"]][-1] == "ausgang"
+    body = forms[-1].decode()
+    assert 'name="correspondent"\r\n\r\n100\r\n' in body
+    assert 'name="document_type"\r\n\r\n1\r\n' in body
+    assert 'name="tags"\r\n\r\n11\r\n' in body
+    assert 'name="tags"\r\n\r\n103\r\n' in body
+    # Zweiter Upload kommt ohne erneutes Laden der Listen aus
+    assert lookups[0] == lookups[1]
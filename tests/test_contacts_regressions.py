@@ -69,3 +69,41 @@ async def test_contact_update_rejects_empty_email(client):
         "email": ""
     })
     assert u.status_code == 422, u.text
+
+
+async def test_contact_list_cursor_pages_match_full_listing(client):
+    for name in ("zeta GmbH", "Alpha AG", "mittel KG", "Alpha AG"):
+        r = await client.post("/api/contacts/", json={"contact_type": "company", "company_name": name})
+        assert r.status_code == 200, r.text
+
+    full = (await client.get("/api/contacts/", params={"limit": 10000})).json()
+    names = [(c["company_name"] or c["last_name"] or c["first_name"] or "").lower() for c in full]
+    assert names == sorted(names)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        r = await client.get("/api/contacts/", params=params)
+        assert r.status_code == 200, r.text
+        seen += [c["id"] for c in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert seen == [c["id"] for c in full]
+    # skip bleibt kompatibel
+    r = await client.get("/api/contacts/", params={"skip": 1, "limit": 2})
+    assert [c["id"] for c in r.json()] == seen[1:3]
+
+
+async def test_contact_list_rejects_invalid_cursor(client):
+    r = await client.get("/api/contacts/", params={"cursor": "kaputt"})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("values", [["a", "1"], [1, 2], ["a", True], ["a", None]])
+async def test_contact_list_rejects_cursor_with_wrong_types(client, values):
+    from app.api.pagination import encode_cursor
+
+    r = await client.get("/api/contacts/", params={"cursor": encode_cursor(*values)})
+    assert r.status_code == 400
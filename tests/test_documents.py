@@ -0,0 +1,487 @@
+# tests/test_documents.py
+import pytest
+
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _create_contact(client: AsyncClient, name: str = "BatchCo") -> int:
+    r = await client.post("/api/contacts/", json={
+        "contact_type": "company",
+        "company_name": name,
+        "street": "Main St 1",
+        "zip_code": "12345",
+        "city": "Testville",
+    })
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _invoice(contact_id: int, price: float = 100.0) -> dict:
+    return {
+        "contact_id": contact_id,
+        "positions": [{"description": "Beratung", "quantity": 2, "unit_price": price}],
+    }
+
+
+async def test_invoice_batch_reserves_contiguous_numbers(client, typst_env):
+    cid = await _create_contact(client)
+
+    r = await client.post("/api/documents/invoice/batch", json={
+        "items": [_invoice(cid, price) for price in (10, 20, 30)]
+    })
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["created"], body["failed"]) == (3, 0)
+
+    numbers = [int(res["document"]["doc_number"].rsplit("-", 1)[1]) for res in body["results"]]
+    assert numbers == list(range(numbers[0], numbers[0] + 3))
+    assert [res["document"]["gross_total"] for res in body["results"]] == [23.8, 47.6, 71.4]
+
+
+async def test_invoice_batch_reports_per_item_failures(client, typst_env):
+    cid = await _create_contact(client)
+
+    r = await client.post("/api/documents/invoice/batch", json={
+        "items": [_invoice(cid), _invoice(999999)]
+    })
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["created"], body["failed"]) == (1, 1)
+    assert body["results"][0]["status"] == "created"
+    assert body["results"][1] == {
+        "index": 1, "status": "failed", "document": None, "error": "Kontakt nicht gefunden"
+    }
+
+
+async def test_invoice_batch_keeps_numbers_gapless_on_render_failure(client, typst_env, monkeypatch):
+    from app.services.typst_renderer import TypstRenderer
+
+    render_invoice = TypstRenderer.render_invoice
+
+    async def flaky(self, **kwargs):
+        if kwargs["positions"][0]["unit_price"] == 666:
+            raise RuntimeError("kaputt")
+        return await render_invoice(self, **kwargs)
+
+    monkeypatch.setattr(TypstRenderer, "render_invoice", flaky)
+    cid = await _create_contact(client)
+
+    r = await client.post("/api/documents/invoice/batch", json={
+        "items": [_invoice(cid, price) for price in (10, 666, 30, 40)]
+    })
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["created"], body["failed"]) == (3, 1)
+    assert body["results"][1]["error"] == "PDF-Fehler: kaputt"
+
+    created = [res["document"] for res in body["results"] if res["document"]]
+    numbers = [int(doc["doc_number"].rsplit("-", 1)[1]) for doc in created]
+    assert numbers == list(range(numbers[0], numbers[0] + 3))
+    # Aufgerückte Rechnungen tragen ihre neue Nummer auch im PDF
+    for doc in created:
+        assert doc["doc_number"] in open(doc["pdf_path"], encoding="utf-8").read()
+    assert len(list((typst_env / "out").glob("*.pdf"))) == 3
+
+    # Die freigegebene Nummer wird als nächste vergeben
+    single = (await client.post("/api/documents/invoice", json=_invoice(cid))).json()
+    assert int(single["doc_number"].rsplit("-", 1)[1]) == numbers[-1] + 1
+
+
+async def test_background_invoice_is_rendered_by_job_queue(client, typst_env):
+    from app.services.job_queue import get_job_queue
+
+    cid = await _create_contact(client)
+
+    r = await client.post("/api/documents/invoice?background=true", json=_invoice(cid))
+    assert r.status_code == 202, r.text
+    job = r.json()
+    assert job["status"] == "queued"
+    assert job["document"]["status"] == "rendering"
+    assert job["document"]["pdf_path"] is None
+
+    await get_job_queue().run_job(job["id"])
+
+    r = await client.get(f"/api/documents/jobs/{job['id']}")
+    assert r.status_code == 200, r.text
+    done = r.json()
+    assert (done["status"], done["attempts"]) == ("done", 1)
+    assert done["document"]["status"] == "final"
+    assert done["document"]["pdf_path"] == done["result"]["pdf_path"]
+
+    events = await client.get(f"/api/documents/jobs/{job['id']}/events")
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert events.text.startswith("event: done\n")
+
+
+async def test_failed_background_render_marks_document(client, typst_env, monkeypatch):
+    from app.services.job_queue import get_job_queue
+
+    monkeypatch.setenv("FAKE_TYPST_FAIL", "1")
+    cid = await _create_contact(client)
+
+    r = await client.post("/api/documents/letter?background=true", json={
+        "contact_id": cid, "subject": "Hallo", "content": "Text",
+    })
+    assert r.status_code == 202, r.text
+    job_id = r.json()["id"]
+
+    await get_job_queue().run_job(job_id)
+
+    job = (await client.get(f"/api/documents/jobs/{job_id}")).json()
+    assert job["status"] == "failed"
+    assert "fake typst failure" in job["error"]
+    assert job["document"]["status"] == "failed"
+
+
+async def test_two_queues_claim_a_job_only_once(app):
+    import asyncio
+    from app.database import get_sessionmaker
+    from app.models.database import Job
+    from app.services.job_queue import JobQueue, new_job
+
+    calls = []
+
+    async def handler(db, job):
+        calls.append(job.id)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    queues = [JobQueue(), JobQueue()]
+    for queue in queues:
+        queue.register("noop", handler)
+
+    async with get_sessionmaker()() as db:
+        job = new_job("noop")
+        db.add(job)
+        await db.commit()
+        job_id = job.id
+
+    results = await asyncio.gather(*(queue.run_job(job_id) for queue in queues))
+
+    assert calls == [job_id]
+    async with get_sessionmaker()() as db:
+        job = await db.get(Job, job_id)
+        assert (job.status, job.attempts) == ("done", 1)
+        assert job.started_at is not None
+    assert sorted(r.status for r in results) == ["done", "running"]
+
+
+async def test_only_jobs_with_expired_lease_are_recovered(app):
+    from datetime import datetime, timedelta
+    from app.database import get_sessionmaker
+    from app.models.database import Job
+    from app.services.job_queue import JobQueue, new_job
+
+    now = datetime.utcnow()
+    async with get_sessionmaker()() as db:
+        stale, alive = new_job("noop"), new_job("noop")
+        stale.status = alive.status = "running"
+        stale.heartbeat_at = now - timedelta(seconds=120)
+        alive.heartbeat_at = now
+        db.add_all([stale, alive])
+        await db.commit()
+        ids = stale.id, alive.id
+
+    assert await JobQueue(lease_timeout=60).recover_stale() == [ids[0]]
+
+    async with get_sessionmaker()() as db:
+        assert [(await db.get(Job, job_id)).status for job_id in ids] == ["queued", "running"]
+
+
+async def test_stale_job_is_failed_after_max_attempts(client, typst_env):
+    from datetime import datetime, timedelta
+    from app.database import get_sessionmaker
+    from app.models.database import Document, Job
+    from app.services.archive_jobs import abandon_archive_job
+    from app.services.job_queue import JobQueue, new_job
+
+    cid = await _create_contact(client, "LeaseCo")
+    doc = (await client.post("/api/documents/invoice", json=_invoice(cid))).json()
+
+    old = datetime.utcnow() - timedelta(seconds=120)
+    async with get_sessionmaker()() as db:
+        (await db.get(Document, doc["id"])).status = "archiving"
+        retry = new_job("archive", doc["id"], {"previous_status": "sent"})
+        exhausted = new_job("archive", doc["id"], {"previous_status": "sent"})
+        retry.status = exhausted.status = "running"
+        retry.heartbeat_at = exhausted.heartbeat_at = old
+        retry.attempts, exhausted.attempts = 1, 2
+        db.add_all([retry, exhausted])
+        await db.commit()
+        ids = retry.id, exhausted.id
+
+    queue = JobQueue(lease_timeout=60, max_attempts=2)
+    queue.register("archive", None, abandon_archive_job)
+    assert await queue.recover_stale() == [ids[0]]
+
+    async with get_sessionmaker()() as db:
+        jobs = [await db.get(Job, job_id) for job_id in ids]
+        assert [j.status for j in jobs] == ["queued", "failed"]
+        assert "2 Versuchen" in jobs[1].error
+        assert (await db.get(Document, doc["id"])).status == "sent"
+
+
+async def test_unknown_job_is_404(client):
+    r = await client.get("/api/documents/jobs/doesnotexist")
+    assert r.status_code == 404, r.text
+
+
+async def test_number_allocation_is_unique_under_concurrency(app):
+    import asyncio
+    from app.api.documents import get_next_number
+    from app.database import get_sessionmaker
+
+    async def allocate():
+        async with get_sessionmaker()() as db:
+            return await get_next_number(db, "TST")
+
+    numbers = await asyncio.gather(*(allocate() for _ in range(20)))
+    assert len(set(numbers)) == 20
+
+
+async def test_number_block_reservation_restarts_each_year(db_session):
+    from datetime import datetime
+    from app.api.documents import reserve_numbers
+    from app.models.database import NumberSequence
+
+    year = datetime.now().year
+    db_session.add(NumberSequence(prefix="OLD", year=year - 1, last_number=41))
+    await db_session.commit()
+
+    assert await reserve_numbers(db_session, "OLD", 3) == [
+        f"OLD-{year}-0001", f"OLD-{year}-0002", f"OLD-{year}-0003"
+    ]
+    assert await reserve_numbers(db_session, "OLD", 1) == [f"OLD-{year}-0004"]
+
+
+async def test_document_list_cursor_pages_match_full_listing(client, typst_env):
+    cid = await _create_contact(client, "CursorCo")
+    r = await client.post("/api/documents/invoice/batch", json={
+        "items": [_invoice(cid, price) for price in (1, 2, 3, 4, 5)]
+    })
+    assert r.status_code == 200, r.text
+
+    full = (await client.get("/api/documents/", params={"limit": 10000, "doc_type": "invoice"})).json()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "doc_type": "invoice", **({"cursor": cursor} if cursor else {})}
+        r = await client.get("/api/documents/", params=params)
+        assert r.status_code == 200, r.text
+        seen += [d["id"] for d in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert seen == [d["id"] for d in full]
+    assert len(seen) == len(set(seen)) >= 5
+
+
+async def test_document_list_rejects_cursor_with_wrong_types(client):
+    from app.api.pagination import encode_cursor
+
+    for values in (["gestern", 1], [{"dt": "kein Datum"}, 1], [{"dt": "2024-01-01T00:00:00"}, "1"]):
+        r = await client.get("/api/documents/", params={"cursor": encode_cursor(*values)})
+        assert r.status_code == 400, values
+
+
+async def test_pdf_download_uses_content_etag_and_range(client, typst_env):
+    import hashlib
+
+    cid = await _create_contact(client, "PdfCo")
+    r = await client.post("/api/documents/invoice", json=_invoice(cid))
+    assert r.status_code == 200, r.text
+    doc = r.json()
+    url = f"/api/documents/{doc['id']}/pdf"
+
+    r = await client.get(url)
+    assert r.status_code == 200
+    sha = hashlib.sha256(r.content).hexdigest()
+    assert doc["pdf_sha256"] == sha
+    assert r.headers["etag"] == f'"{sha}"'
+    assert r.headers["cache-control"] == "private, no-cache"
+
+    r = await client.get(url, params={"v": sha})
+    assert r.headers["cache-control"] == "private, max-age=31536000, immutable"
+
+    r = await client.get(url, headers={"If-None-Match": f'W/"{sha}", "other"'})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    full = (await client.get(url)).content
+    r = await client.get(url, headers={"Range": "bytes=0-9", "If-Range": f'"{sha}"'})
+    assert r.status_code == 206
+    assert r.content == full[:10]
+
+    # Veralteter Validator: ganze Datei statt Teilantwort
+    r = await client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"veraltet"'})
+    assert r.status_code == 200
+    assert r.content == full
+
+
+async def test_pdf_download_can_be_offloaded_to_nginx(client, typst_env, monkeypatch):
+    from app.settings import get_settings
+
+    cid = await _create_contact(client, "AccelCo")
+    doc = (await client.post("/api/documents/invoice", json=_invoice(cid))).json()
+
+    server = get_settings().server
+    monkeypatch.setattr(server, "file_delivery", "x-accel-redirect")
+
+    r = await client.get(f"/api/documents/{doc['id']}/pdf")
+    assert r.status_code == 200
+    assert r.content == b""
+    assert r.headers["x-accel-redirect"] == "/_protected/documents/" + doc["pdf_path"].rsplit("/", 1)[1]
+    assert r.headers["etag"] == f'"{doc["pdf_sha256"]}"'
+    assert r.headers["content-disposition"] == f'attachment; filename="{doc["doc_number"]}.pdf"'
+
+
+async def test_thumbnail_is_rendered_once_and_cached(client, pdftoppm_env):
+    import asyncio
+
+    cid = await _create_contact(client, "ThumbCo")
+    doc = (await client.post("/api/documents/invoice", json=_invoice(cid))).json()
+    url = f"/api/documents/{doc['id']}/thumbnail"
+
+    responses = await asyncio.gather(*(client.get(url, params={"width": 100}) for _ in range(3)))
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    r = responses[0]
+    assert r.headers["content-type"] == "image/png"
+    assert r.content.startswith(b"png:100:")
+    assert r.headers["etag"] == f'"{doc["pdf_sha256"]}-100-png"'
+
+    r = await client.get(url, params={"width": 100}, headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    # Breite wird auf max_width begrenzt
+    r = await client.get(url, params={"width": 100000, "v": doc["pdf_sha256"]})
+    assert r.content.startswith(b"png:1200:")
+    assert "immutable" in r.headers["cache-control"]
+
+    calls = pdftoppm_env.read_text().splitlines()
+    assert len(calls) == 2
+
+
+async def test_thumbnail_survives_eviction_after_lookup(client, pdftoppm_env, monkeypatch):
+    from app.services.thumbnails import get_derivative_store
+
+    cid = await _create_contact(client, "EvictCo")
+    doc = (await client.post("/api/documents/invoice", json=_invoice(cid))).json()
+    url = f"/api/documents/{doc['id']}/thumbnail"
+    assert (await client.get(url, params={"width": 80})).status_code == 200
+
+    # Ein paralleles put verdrängt den Eintrag direkt nach dem lookup
+    store = get_derivative_store()
+    lookup = store.lookup
+
+    async def evicting_lookup(key, suffix):
+        entry = await lookup(key, suffix)
+        if entry is not None:
+            entry.unlink()
+        return entry
+
+    monkeypatch.setattr(store, "lookup", evicting_lookup)
+    r = await client.get(url, params={"width": 80})
+    assert r.status_code == 200
+    assert r.content.startswith(b"png:80:")
+    assert len(pdftoppm_env.read_text().splitlines()) == 2
+
+
+async def test_thumbnail_without_pdftoppm_is_503(client, typst_env, monkeypatch):
+    from app.settings import get_settings
+
+    monkeypatch.setattr(get_settings().thumbnails, "binary", str(typst_env / "missing"))
+    cid = await _create_contact(client, "NoThumbCo")
+    doc = (await client.post("/api/documents/invoice", json=_invoice(cid))).json()
+
+    r = await client.get(f"/api/documents/{doc['id']}/thumbnail")
+    assert r.status_code == 503
+
+
+async def test_preview_renders_without_number_or_document(client, typst_env, db_session):
+    import json
+    from sqlalchemy import func, select
+    from app.models.database import Document, NumberSequence
+
+    cid = await _create_contact(client, "PreviewCo")
+    before = (
+        await db_session.scalar(select(func.count()).select_from(Document)),
+        await db_session.scalar(select(func.coalesce(func.sum(NumberSequence.last_number), 0))),
+    )
+
+    letter = {"contact_id": cid, "subject": "Entwurf", "content": "Hallo"}
+    r = await client.post("/api/documents/preview/letter", json=letter)
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"] == "image/png"
+    assert r.headers["cache-control"] == "no-store"
+    assert json.loads(r.content)["doc_number"] == "ENTWURF"
+
+    r = await client.post("/api/documents/preview/invoice", params={"format": "pdf"}, json=_invoice(cid))
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"] == "application/pdf"
+
+    after = (
+        await db_session.scalar(select(func.count()).select_from(Document)),
+        await db_session.scalar(select(func.coalesce(func.sum(NumberSequence.last_number), 0))),
+    )
+    assert after == before
+    # Keine Dateien im Dokumentenverzeichnis
+    assert not any((typst_env / "out").iterdir())
+    assert not any((typst_env / "work" / "preview").iterdir())
+
+
+async def test_preview_session_drops_superseded_requests(client, typst_env, monkeypatch):
+    import asyncio
+    from app.settings import get_settings
+
+    monkeypatch.setattr(get_settings().typst, "preview_debounce", 0.2)
+    cid = await _create_contact(client, "DebounceCo")
+    headers = {"X-Preview-Session": "tab-1"}
+
+    async def preview(subject, delay):
+        await asyncio.sleep(delay)
+        return await client.post("/api/documents/preview/offer", headers=headers, json={
+            **_invoice(cid), "subject": subject
+        })
+
+    first, second = await asyncio.gather(preview("Alt", 0), preview("Neu", 0.05))
+
+    assert first.status_code == 204
+    assert second.status_code == 200, second.text
+    assert b"Neu" in second.content
+
+    r = await client.post("/api/documents/preview/letter", json={
+        "contact_id": 999999, "subject": "x", "content": "y"
+    })
+    assert r.status_code == 404
+
+
+@pytest.mark.parametrize("background", [False, True])
+async def test_invoice_totals_match_between_database_and_pdf(client, typst_env, background):
+    import json
+    from pathlib import Path
+    from app.services.job_queue import get_job_queue
+
+    cid = await _create_contact(client, "MoneyCo")
+    invoice = {"contact_id": cid, "positions": [
+        {"description": "Kleinteil", "quantity": 3, "unit_price": 0.1},
+        {"description": "Buch", "quantity": 3, "unit_price": 1.05, "vat_rate": 7},
+    ]}
+
+    r = await client.post("/api/documents/invoice", params={"background": background}, json=invoice)
+    assert r.status_code in (200, 202), r.text
+    if background:
+        job = r.json()
+        await get_job_queue().run_job(job["id"])
+        doc = (await client.get(f"/api/documents/jobs/{job['id']}")).json()["document"]
+    else:
+        doc = r.json()
+
+    data = json.loads(Path(doc["pdf_path"]).read_text())
+    assert (doc["net_total"], doc["gross_total"]) == (data["net_total"], data["gross_total"]) == (3.45, 3.73)
+    assert data["gross_total_fmt"] == "3,73 €"
+    assert data["vat_breakdown"] == [
+        {"rate": "19", "net": "0,30 €", "vat": "0,06 €"},
+        {"rate": "7", "net": "3,15 €", "vat": "0,22 €"},
+    ]
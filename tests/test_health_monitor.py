@@ -0,0 +1,62 @@
+# tests/test_health_monitor.py
+import pytest
+
+from app.services.health_monitor import HealthMonitor
+from app.settings import HealthSettings
+
+pytestmark = pytest.mark.asyncio
+
+
+def _monitor(results: list[bool], **settings) -> tuple[HealthMonitor, list]:
+    calls = []
+
+    async def probe():
+        calls.append(1)
+        return results[min(len(calls), len(results)) - 1]
+
+    return HealthMonitor({"svc": probe}, HealthSettings(**settings)), calls
+
+
+async def test_is_available_serves_cached_state_within_ttl():
+    monitor, calls = _monitor([True], ttl=60)
+
+    assert await monitor.is_available("svc")
+    assert await monitor.is_available("svc")
+    assert len(calls) == 1
+
+    snapshot = monitor.snapshot()["svc"]
+    assert snapshot["available"] is True
+    assert snapshot["latency_ms"] is not None
+    assert snapshot["circuit"] == "closed"
+
+
+async def test_circuit_opens_after_consecutive_failures():
+    monitor, calls = _monitor([False], ttl=0, failure_threshold=2, cooldown=60)
+
+    assert not await monitor.is_available("svc")
+    assert not await monitor.is_available("svc")
+    assert monitor.snapshot()["svc"]["circuit"] == "open"
+
+    # Offener Circuit: keine weiteren Proben aus Request-Pfaden
+    assert not await monitor.is_available("svc")
+    assert len(calls) == 2
+
+
+async def test_successful_probe_closes_circuit():
+    monitor, _ = _monitor([False, False, True], ttl=0, failure_threshold=2, cooldown=60)
+
+    await monitor.probe("svc")
+    await monitor.probe("svc")
+    assert monitor.states["svc"].circuit_open
+
+    await monitor.probe("svc")
+    assert not monitor.states["svc"].circuit_open
+    assert await monitor.is_available("svc")
+
+
+async def test_services_endpoint_reports_probe_age_and_latency(client):
+    r = await client.get("/api/health/services")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    for name in ("ollama", "paperless"):
+        assert {"available", "latency_ms", "age_seconds", "circuit"} <= body[name].keys()
@@ -0,0 +1,193 @@
+# tests/test_migrations.py
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'migrate.sqlite'}")
+    yield engine
+    await engine.dispose()
+
+
+async def _names(engine, kind: str) -> set[str]:
+    async with engine.connect() as conn:
+        rows = await conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = ?", (kind,)
+        )
+        return {row[0] for row in rows}
+
+
+def test_migrations_are_ordered_and_unique():
+    from app.migrations import load_migrations
+
+    versions = [m.version for m in load_migrations()]
+
+    assert versions == sorted(set(versions))
+    assert versions[0] == "0001"
+
+
+async def test_upgrade_creates_schema_and_is_idempotent(engine):
+    from app.migrations import current, load_migrations, pending, upgrade
+
+    assert await current(engine) is None
+
+    done = await upgrade(engine)
+
+    assert done == [m.version for m in load_migrations()]
+    assert await current(engine) == done[-1]
+    assert await pending(engine) == []
+    assert await upgrade(engine) == []
+    assert {"contacts", "documents", "jobs", "contacts_fts", "documents_fts"} <= await _names(engine, "table")
+    assert "ix_contacts_sort_name" in await _names(engine, "index")
+
+
+async def test_upgrade_stops_at_target(engine):
+    from app.migrations import current, pending, upgrade
+
+    assert await upgrade(engine, target="0001") == ["0001"]
+    assert await current(engine) == "0001"
+    assert "documents_fts" not in await _names(engine, "table")
+
+    await upgrade(engine)
+    assert await pending(engine) == []
+
+
+async def test_upgrade_adopts_database_created_before_migrations(engine):
+    from app.migrations import current, load_migrations, upgrade
+    from app.models.database import Base, Contact
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # Stand vor Einführung der Indizes nachstellen
+        await conn.execute(text("DROP INDEX ix_documents_created_at"))
+        await conn.execute(text("DROP INDEX ix_jobs_document_id"))
+        await conn.execute(Contact.__table__.insert().values(company_name="Altbestand GmbH"))
+
+    await upgrade(engine)
+
+    assert await current(engine) == load_migrations()[-1].version
+    assert {"ix_documents_created_at", "ix_jobs_document_id"} <= await _names(engine, "index")
+    async with engine.connect() as conn:
+        found = await conn.execute(text(
+            "SELECT count(*) FROM contacts_fts WHERE contacts_fts MATCH 'altbestand'"
+        ))
+        assert found.scalar() == 1
+
+
+async def test_pdf_sha256_is_added_without_hashing_at_startup(engine, tmp_path):
+    from app.migrations import upgrade
+    from app.models.database import Base, Contact
+
+    pdf = tmp_path / "alt.pdf"
+    pdf.write_bytes(b"%PDF-1.7 alt")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("ALTER TABLE documents DROP COLUMN pdf_sha256"))
+        await conn.execute(Contact.__table__.insert().values(id=1, company_name="Alt GmbH"))
+        await conn.execute(text(
+            "INSERT INTO documents (doc_type, doc_number, contact_id, status, pdf_path, doc_date, created_at, updated_at) "
+            "VALUES ('letter', 'BR-2024-0001', 1, 'final', :path, '2024-01-01', '2024-01-01', '2024-01-01')"
+        ), {"path": str(pdf)})
+
+    await upgrade(engine)
+
+    # Hash entsteht erst bei der Auslieferung
+    async with engine.connect() as conn:
+        sha = (await conn.execute(text("SELECT pdf_sha256 FROM documents"))).scalar()
+    assert sha is None
+
+
+async def test_migrated_schema_matches_models(engine):
+    from sqlalchemy import inspect
+    from app.migrations import upgrade
+    from app.models.database import Base
+
+    await upgrade(engine)
+
+    def schema(sync_conn):
+        inspector = inspect(sync_conn)
+        return {
+            table.name: {c["name"] for c in inspector.get_columns(table.name)}
+            for table in Base.metadata.sorted_tables
+        }
+
+    async with engine.connect() as conn:
+        columns = await conn.run_sync(schema)
+    indexes = await _names(engine, "index")
+    for table in Base.metadata.sorted_tables:
+        assert columns[table.name] == {c.name for c in table.columns}, table.name
+        assert {i.name for i in table.indexes} <= indexes, table.name
+
+
+async def test_fts_update_triggers_are_scoped_to_indexed_columns(engine):
+    from app.migrations import upgrade
+
+    await upgrade(engine, target="0005")
+    # Trigger in der Fassung vor Migration 0006
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DROP TRIGGER contacts_fts_au")
+        await conn.exec_driver_sql(
+            "CREATE TRIGGER contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+            "INSERT INTO contacts_fts(contacts_fts, rowid, company_name) "
+            "VALUES ('delete', old.id, old.company_name); END"
+        )
+    await upgrade(engine)
+
+    async with engine.connect() as conn:
+        rows = await conn.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_fts_au'"
+        )
+        triggers = dict(rows.all())
+    assert "AFTER UPDATE OF company_name, last_name" in triggers["contacts_fts_au"]
+    assert "AFTER UPDATE OF doc_number, subject, content ON documents" in triggers["documents_fts_au"]
+
+
+def test_index_builds_are_online_safe_on_postgresql():
+    from sqlalchemy.dialects import postgresql, sqlite
+    from app.migrations.ops import create_index_sql
+    from app.models.database import Document
+
+    index = next(i for i in Document.__table__.indexes if i.name == "ix_documents_created_at")
+
+    assert create_index_sql(index, postgresql.dialect()).startswith(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_created_at"
+    )
+    assert create_index_sql(index, sqlite.dialect()).startswith(
+        "CREATE INDEX IF NOT EXISTS ix_documents_created_at"
+    )
+
+
+def test_cli_upgrade_and_status(tmp_path):
+    env = {
+        **os.environ,
+        "KORRESPONDENZ_DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path / 'cli.sqlite'}",
+        "PYTHONPATH": str(ROOT),
+    }
+
+    def run(*args):
+        return subprocess.run(
+            [sys.executable, "-m", "app.migrations", *args],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+        )
+
+    before = run("status")
+    assert before.returncode == 1
+    assert "ausstehend" in before.stdout
+
+    result = run("upgrade")
+    assert result.returncode == 0, result.stderr
+    assert "0001" in result.stdout
+
+    after = run("status")
+    assert after.returncode == 0
+    assert "ausstehend" not in after.stdout
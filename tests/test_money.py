@@ -0,0 +1,60 @@
+# tests/test_money.py
+from decimal import Decimal
+
+from app.services.money import (
+    DocumentTotals, compute_totals, format_euro, format_rate, prepayment_amount
+)
+
+
+def _pos(quantity, unit_price, vat_rate=19.0):
+    return {"description": "x", "quantity": quantity, "unit_price": unit_price, "vat_rate": vat_rate}
+
+
+def test_totals_have_no_float_drift():
+    totals = compute_totals([_pos(3, 0.1)])
+
+    assert totals.lines == (Decimal("0.30"),)
+    assert (totals.net_total, totals.vat_total, totals.gross_total) == (
+        Decimal("0.30"), Decimal("0.06"), Decimal("0.36")
+    )
+
+
+def test_vat_is_rounded_per_rate_not_per_position():
+    totals = compute_totals([_pos(1, 1.05, 7)] * 3 + [_pos(2, 10, 19)])
+
+    assert [(line.rate, line.net, line.vat) for line in totals.vat_breakdown] == [
+        (Decimal("19.0"), Decimal("20.00"), Decimal("3.80")),
+        # je Position gerundet wären es 3 × 0,07 = 0,21
+        (Decimal("7"), Decimal("3.15"), Decimal("0.22")),
+    ]
+    assert totals.vat_total == Decimal("4.02")
+    assert totals.gross_total == totals.net_total + totals.vat_total == Decimal("27.17")
+
+
+def test_kleinunternehmer_has_no_vat():
+    totals = compute_totals([_pos(2, 10)], kleinunternehmer=True)
+
+    assert totals.vat_breakdown == ()
+    assert totals.vat_total == 0
+    assert totals.gross_total == totals.net_total == Decimal("20.00")
+    assert prepayment_amount(totals, 33) == Decimal("6.60")
+
+
+def test_template_data_and_payload_roundtrip():
+    positions = [_pos(1.5, 99.99, 19), _pos(1, 5, 7)]
+    totals = compute_totals(positions)
+
+    assert DocumentTotals.from_payload(totals.to_payload()) == totals
+    data = totals.template_data()
+    assert data["gross_total"] == float(totals.gross_total)
+    assert data["gross_total_fmt"] == format_euro(totals.gross_total)
+    assert [line["rate"] for line in data["vat_breakdown"]] == ["19", "7"]
+    rows = totals.position_rows(positions)
+    assert (rows[0]["unit_price_fmt"], rows[0]["total_fmt"]) == ("99,99 €", "149,99 €")
+
+
+def test_formatting():
+    assert format_euro(Decimal("1234.5")) == "1234,50 €"
+    assert format_euro(Decimal("0.005")) == "0,01 €"
+    assert format_rate(Decimal("5.5")) == "5,5"
+    assert format_rate(Decimal("19.0")) == "19"
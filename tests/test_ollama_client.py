@@ -0,0 +1,254 @@
+# tests/test_ollama_client.py
+import httpx
+import pytest
+
+from app.services import http_pool
+from app.services.ollama_client import OllamaClient, get_ollama_http
+
+pytestmark = pytest.mark.asyncio
+
+
+def _mock_http(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def test_shared_http_client_is_reused_until_closed():
+    first = get_ollama_http()
+    assert get_ollama_http() is first
+    assert OllamaClient().http is first
+
+    await http_pool.close_clients()
+    assert first.is_closed
+    assert get_ollama_http() is not first
+    await http_pool.close_clients()
+
+
+async def test_generate_uses_injected_client():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.path)
+        return httpx.Response(200, json={"response": "Hallo Welt"})
+
+    async with _mock_http(handler) as http:
+        client = OllamaClient(http=http)
+        assert await client.generate("Sag hallo") == "Hallo Welt"
+        assert await client.generate("Nochmal") == "Hallo Welt"
+
+    assert seen == ["/api/generate", "/api/generate"]
+
+
+def _ndjson(*chunks: dict) -> bytes:
+    import json
+    return b"".join(json.dumps(c).encode() + b"\n" for c in chunks)
+
+
+STREAM = _ndjson(
+    {"response": "Sehr ", "done": False},
+    {"response": "gerne.", "done": False},
+    {"response": "", "done": True},
+)
+
+
+async def test_generate_stream_yields_tokens():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert b'"stream": true' in request.content or b'"stream":true' in request.content
+        return httpx.Response(200, content=STREAM)
+
+    async with _mock_http(handler) as http:
+        client = OllamaClient(http=http)
+        tokens = [t async for t in client.generate_stream("Hallo")]
+
+    assert tokens == ["Sehr ", "gerne."]
+
+
+async def test_draft_stream_endpoint_emits_sse(app, client):
+    from app.services.health_monitor import get_health_monitor
+    from app.services.ollama_client import get_ollama_client
+
+    class AlwaysUp:
+        async def is_available(self, name):
+            return True
+
+        def report_failure(self, name):
+            pass
+
+    http = _mock_http(lambda request: httpx.Response(200, content=STREAM))
+    app.dependency_overrides[get_ollama_client] = lambda: OllamaClient(http=http)
+    app.dependency_overrides[get_health_monitor] = lambda: AlwaysUp()
+    try:
+        r = await client.post("/api/ai/draft/stream", json={"context": "Terminbestätigung"})
+    finally:
+        app.dependency_overrides.clear()
+        await http.aclose()
+
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in r.text.strip().split("\n\n")]
+    assert events == ["event: token", "event: token", "event: done"]
+    assert '"text": "gerne."' in r.text
+
+
+async def test_generate_serves_repeats_from_cache():
+    from app.services.llm_cache import LlmCache
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(1)
+        return httpx.Response(200, json={"response": f"Antwort {len(calls)}"})
+
+    cache = LlmCache(max_entries=10, ttl=60, persistent=False)
+    async with _mock_http(handler) as http:
+        client = OllamaClient(http=http, cache=cache)
+        assert await client.improve_text("Text mit Fehlern") == "Antwort 1"
+        assert await client.improve_text("Text mit Fehlern") == "Antwort 1"
+        assert await client.improve_text("Text mit Fehlern", bypass_cache=True) == "Antwort 2"
+        assert await client.improve_text("Text mit Fehlern") == "Antwort 2"
+
+    assert len(calls) == 2
+    assert cache.stats()["memory_hits"] == 2
+
+
+async def test_coalesced_generate_writes_cache_once():
+    import asyncio
+    from app.services.llm_cache import LlmCache
+    from app.services.ollama_client import OllamaScheduler
+
+    class CountingCache(LlmCache):
+        puts = 0
+
+        async def put(self, key, model, text):
+            CountingCache.puts += 1
+            await super().put(key, model, text)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"response": "geteilt"})
+
+    cache = CountingCache(max_entries=10, ttl=60, persistent=False)
+    async with _mock_http(handler) as http:
+        client = OllamaClient(http=http, cache=cache, scheduler=OllamaScheduler(max_in_flight=1, max_queue=4))
+        results = await asyncio.gather(*(client.generate("Gleicher Prompt") for _ in range(3)))
+
+    assert results == ["geteilt"] * 3
+    assert CountingCache.puts == 1
+
+
+async def test_llm_cache_persists_across_instances():
+    from app.services.llm_cache import LlmCache, cache_key
+
+    key = cache_key("model", "system", "persistenter prompt", 0.3)
+    await LlmCache(max_entries=10, ttl=60).put(key, "model", "aus der DB")
+
+    fresh = LlmCache(max_entries=10, ttl=60)
+    assert await fresh.get(key) == "aus der DB"
+    assert fresh.stats()["persistent_hits"] == 1
+
+    expired = LlmCache(max_entries=10, ttl=0)
+    assert await expired.get(key) is None
+
+
+async def test_llm_cache_memory_tier_is_bounded():
+    from app.services.llm_cache import LlmCache
+
+    cache = LlmCache(max_entries=2, ttl=60, persistent=False)
+    for key in ("a", "b", "c"):
+        await cache.put(key, "model", key.upper())
+
+    assert await cache.get("a") is None
+    assert await cache.get("c") == "C"
+
+
+async def test_scheduler_coalesces_identical_requests():
+    import asyncio
+    from app.services.ollama_client import OllamaScheduler
+
+    scheduler = OllamaScheduler(max_in_flight=1, max_queue=4)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "geteilt"
+
+    results = await asyncio.gather(*(scheduler.run("gleich", factory) for _ in range(3)))
+
+    assert results == ["geteilt"] * 3
+    assert len(calls) == 1
+    assert scheduler.stats()["coalesced"] == 2
+
+
+async def test_scheduler_limits_in_flight_in_fifo_order():
+    import asyncio
+    from app.services.ollama_client import OllamaScheduler
+
+    scheduler = OllamaScheduler(max_in_flight=2, max_queue=8)
+    running = 0
+    peak = 0
+    order = []
+
+    async def work(i):
+        nonlocal running, peak
+        async with scheduler.slot():
+            running += 1
+            peak = max(peak, running)
+            order.append(i)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(work(i) for i in range(6)))
+
+    assert peak == 2
+    assert order == list(range(6))
+    assert scheduler.stats()["in_flight"] == 0
+
+
+async def test_scheduler_rejects_when_queue_is_full():
+    import asyncio
+    from app.services.ollama_client import OllamaBusyError, OllamaScheduler
+
+    scheduler = OllamaScheduler(max_in_flight=1, max_queue=1)
+    gate = asyncio.Event()
+
+    async def blocked():
+        await gate.wait()
+        return "ok"
+
+    first = asyncio.create_task(scheduler.run(None, blocked))
+    second = asyncio.create_task(scheduler.run(None, blocked))
+    await asyncio.sleep(0)
+
+    with pytest.raises(OllamaBusyError) as exc:
+        await scheduler.run(None, blocked)
+    assert exc.value.queue_position == 2
+    assert exc.value.retry_after >= 1
+
+    gate.set()
+    assert await asyncio.gather(first, second) == ["ok", "ok"]
+
+
+async def test_busy_scheduler_maps_to_429(app, client):
+    from app.services.health_monitor import get_health_monitor
+    from app.services.ollama_client import OllamaScheduler, get_ollama_client
+
+    class AlwaysUp:
+        async def is_available(self, name):
+            return True
+
+        def report_failure(self, name):
+            pass
+
+    scheduler = OllamaScheduler(max_in_flight=1, max_queue=0)
+    await scheduler.acquire()
+    app.dependency_overrides[get_ollama_client] = lambda: OllamaClient(scheduler=scheduler)
+    app.dependency_overrides[get_health_monitor] = lambda: AlwaysUp()
+    try:
+        r = await client.post("/api/ai/draft/stream", json={"context": "Terminbestätigung"})
+    finally:
+        app.dependency_overrides.clear()
+        scheduler.release()
+
+    assert r.status_code == 429
+    assert "Retry-After" in r.headers
+    assert r.json()["detail"]["queue_position"] == 1
@@ -0,0 +1,59 @@
+# tests/test_query_plans.py
+import pytest
+from sqlalchemy import func, select
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.sqlite_only]
+
+
+async def _plan(query) -> str:
+    from app.database import get_engine
+
+    engine = get_engine()
+    sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    async with engine.connect() as conn:
+        rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("filters, index", [
+    ({}, "ix_documents_created_at"),
+    ({"doc_type": "invoice"}, "ix_documents_doc_type_created_at"),
+    ({"status": "final"}, "ix_documents_status_created_at"),
+])
+async def test_document_list_uses_index_without_sort(app, filters, index):
+    from app.api.documents import document_list_query
+
+    plan = await _plan(document_list_query(**filters))
+
+    assert f"USING INDEX {index}" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_document_keyset_page_seeks_index(app):
+    from datetime import datetime
+    from app.api.documents import document_list_query
+
+    plan = await _plan(document_list_query(after=(datetime(2025, 1, 1), 42)))
+
+    assert "USING INDEX ix_documents_created_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_contact_list_is_ordered_by_expression_index(app):
+    from app.api.contacts import contact_list_query
+
+    for after in (None, ("muster gmbh", 7)):
+        plan = await _plan(contact_list_query(after=after))
+        assert "USING INDEX ix_contacts_sort_name" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+async def test_contact_document_count_uses_covering_index(app):
+    from app.models.database import Document
+
+    plan = await _plan(
+        select(func.count()).select_from(Document).where(Document.contact_id == 1)
+    )
+
+    assert "USING COVERING INDEX ix_documents_contact_id_doc_date" in plan
+
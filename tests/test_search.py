@@ -0,0 +1,65 @@
+# tests/test_search.py
+import pytest
+
+# Treffer/Hervorhebung sind auf FTS5 abgestimmt (PostgreSQL: tsvector)
+pytestmark = [pytest.mark.asyncio, pytest.mark.sqlite_only]
+
+
+async def _contact(client, **fields) -> int:
+    r = await client.post("/api/contacts/", json={"contact_type": "company", **fields})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+async def test_search_ranks_and_highlights_contacts_and_documents(client, typst_env):
+    cid = await _contact(client, company_name="Schreinerei Jürgens", city="Lüneburg")
+    r = await client.post("/api/documents/letter", json={
+        "contact_id": cid,
+        "subject": "Angebot Eichentisch",
+        "content": "Vielen Dank für Ihr Interesse an einem massiven <b>Eichentisch</b> aus eigener Fertigung.",
+    })
+    assert r.status_code == 200, r.text
+    doc_id = r.json()["id"]
+
+    r = await client.get("/api/search", params={"q": "eichen"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    hit = next(d for d in body["documents"] if d["id"] == doc_id)
+    assert hit["highlight"] == "Angebot <mark>Eichentisch</mark>"
+    # Inhalte werden escaped, nur die Treffer-Markierung ist HTML
+    assert "&lt;b&gt;<mark>Eichentisch</mark>&lt;/b&gt;" in hit["snippet"]
+
+    # Umlaute und Groß-/Kleinschreibung spielen keine Rolle
+    r = await client.get("/api/search", params={"q": "jurgens luneburg"})
+    assert [c["id"] for c in r.json()["contacts"]] == [cid]
+    assert r.json()["contacts"][0]["highlight"] == "Schreinerei <mark>Jürgens</mark>"
+
+
+async def test_search_index_follows_updates_and_deletes(client):
+    cid = await _contact(client, company_name="Quaderwerk")
+
+    r = await client.get("/api/search/contacts", params={"q": "quader"})
+    assert [c["id"] for c in r.json()] == [cid]
+
+    r = await client.put(f"/api/contacts/{cid}", json={"company_name": "Kubuswerk"})
+    assert r.status_code == 200, r.text
+    assert (await client.get("/api/search/contacts", params={"q": "quader"})).json() == []
+    assert [c["id"] for c in (await client.get("/api/search/contacts", params={"q": "kubus"})).json()] == [cid]
+
+    await client.delete(f"/api/contacts/{cid}")
+    assert (await client.get("/api/search/contacts", params={"q": "kubus"})).json() == []
+
+
+async def test_autocomplete_prefers_name_matches(client):
+    by_city = await _contact(client, company_name="Nordlicht GmbH", city="Harzburg")
+    by_name = await _contact(client, company_name="Harzer Hütte", city="Kiel")
+
+    hits = (await client.get("/api/search/contacts", params={"q": "harz"})).json()
+    assert [h["id"] for h in hits][:2] == [by_name, by_city]
+
+
+async def test_search_ignores_fts_syntax(client):
+    r = await client.get("/api/search", params={"q": 'NEAR( "" * OR'})
+    assert r.status_code == 200, r.text
+    r = await client.get("/api/search", params={"q": "-- *"})
+    assert r.json() == {"query": "-- *", "contacts": [], "documents": []}
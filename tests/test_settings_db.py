@@ -1,3 +1,5 @@
+import pytest
+
 from app.settings import DatabaseSettings, Settings
 
 def test_database_settings_accepts_url_dict():
@@ -51,3 +53,68 @@ def test_settings_from_yaml_reads_legacy_paperless_api_token_from_env(tmp_path,
 
     s = Settings.from_yaml(str(cfg))
     assert s.paperless.api_token == "legacy-paperless-token"
+
+
+@pytest.mark.sqlite_only
+async def test_sqlite_engines_apply_tuning_pragmas(app):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.database import get_engine, get_read_engine
+
+    async with get_engine().connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+        assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+        assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 0
+
+    assert get_read_engine() is not get_engine()
+    async with get_read_engine().connect() as conn:
+        assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            await conn.execute(text("DELETE FROM contacts"))
+
+
+@pytest.mark.sqlite_only
+async def test_reads_proceed_while_a_write_transaction_is_open(app):
+    import asyncio
+    from sqlalchemy import text
+    from app.database import get_engine, get_read_engine
+
+    async with get_engine().connect() as writer:
+        await writer.execute(text("BEGIN IMMEDIATE"))
+        await writer.execute(text("UPDATE number_sequences SET last_number = last_number"))
+
+        async with get_read_engine().connect() as reader:
+            count = await asyncio.wait_for(
+                reader.execute(text("SELECT count(*) FROM documents")), timeout=1
+            )
+            assert count.scalar() >= 0
+        await writer.rollback()
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("postgres://u:p@db/k", "postgresql+asyncpg://u:p@db/k"),
+    ("postgresql://u:p@db/k", "postgresql+asyncpg://u:p@db/k"),
+    ("postgresql+psycopg2://u:p@db/k", "postgresql+asyncpg://u:p@db/k"),
+    ("postgresql+asyncpg://u:p@db/k", "postgresql+asyncpg://u:p@db/k"),
+    ("sqlite+aiosqlite:////tmp/x.sqlite", "sqlite+aiosqlite:////tmp/x.sqlite"),
+])
+def test_database_url_is_normalized_to_async_driver(url, expected):
+    from app.database import normalize_database_url
+
+    assert normalize_database_url(url) == expected
+
+
+def test_postgres_engine_uses_configured_pool(monkeypatch):
+    pytest.importorskip("asyncpg")
+    from app import database
+    from app.settings import get_settings
+
+    db = get_settings().database
+    monkeypatch.setattr(db, "url", "postgres://u:p@localhost/k")
+    monkeypatch.setattr(db, "pool_size", 7)
+    engine = database._create_engine()
+
+    assert engine.url.drivername == "postgresql+asyncpg"
+    assert engine.pool.size() == 7
+    assert engine.pool._recycle == db.pool_recycle
@@ -0,0 +1,202 @@
+# tests/test_typst_renderer.py
+import asyncio
+import json
+import pytest
+
+from app.services.typst_renderer import TypstRenderer
+from app.settings import get_settings
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_render_writes_pdf_and_cleans_up(typst_env):
+    renderer = TypstRenderer()
+    path = await renderer.render("letter/default.typ", {"subject": "Hallo"}, "brief_test")
+
+    assert path.exists()
+    assert json.loads(path.read_text())["subject"] == "Hallo"
+    assert not list((typst_env / "templates" / ".jobs").iterdir())
+
+
+async def test_concurrent_renders_of_same_template_are_isolated(typst_env, monkeypatch):
+    monkeypatch.setenv("FAKE_TYPST_DELAY", "0.1")
+    renderer = TypstRenderer()
+
+    paths = await asyncio.gather(*(
+        renderer.render("invoice/default.typ", {"n": i}, f"rechnung_{i}")
+        for i in range(6)
+    ))
+
+    assert [json.loads(p.read_text())["n"] for p in paths] == list(range(6))
+
+
+async def test_render_does_not_block_event_loop(typst_env, monkeypatch):
+    monkeypatch.setenv("FAKE_TYPST_DELAY", "0.3")
+    renderer = TypstRenderer()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        await renderer.render("letter/default.typ", {}, "brief_nonblocking")
+    finally:
+        task.cancel()
+
+    assert ticks > 10
+
+
+async def test_render_raises_on_typst_error(typst_env, monkeypatch):
+    monkeypatch.setattr(get_settings().typst, "binary", "/bin/false")
+    renderer = TypstRenderer()
+
+    with pytest.raises(RuntimeError, match="Typst-Fehler"):
+        await renderer.render("letter/default.typ", {}, "brief_fail")
+
+
+class FakeCompiler:
+    """Ersatz für typst.Compiler: liefert die Daten aus sys.inputs.data"""
+    instances = 0
+
+    def __init__(self, input, root, font_paths, sys_inputs):
+        FakeCompiler.instances += 1
+        self.data_path = root + sys_inputs["data"]
+
+    def compile(self):
+        with open(self.data_path, "rb") as f:
+            return f.read()
+
+
+@pytest.fixture
+def warm_engine(typst_env, monkeypatch):
+    from types import SimpleNamespace
+    from app.services import typst_renderer
+
+    FakeCompiler.instances = 0
+    monkeypatch.setattr(typst_renderer, "typst_py", SimpleNamespace(Compiler=FakeCompiler))
+    monkeypatch.setattr(get_settings().typst, "engine", "inprocess")
+    typst_renderer.get_warm_compiler.cache_clear()
+    yield
+    typst_renderer.get_warm_compiler.cache_clear()
+
+
+async def test_inprocess_engine_reuses_compilers(warm_engine, monkeypatch):
+    # CLI darf nicht benutzt werden
+    monkeypatch.setattr(get_settings().typst, "binary", "/bin/false")
+    renderer = TypstRenderer()
+
+    for i in range(3):
+        path = await renderer.render("letter/default.typ", {"n": i}, f"brief_{i}")
+        assert json.loads(path.read_text())["n"] == i
+
+    assert FakeCompiler.instances == 1
+
+
+async def test_inprocess_engine_falls_back_to_cli(warm_engine, monkeypatch):
+    def broken(self):
+        raise RuntimeError("kaputt")
+
+    monkeypatch.setattr(FakeCompiler, "compile", broken)
+    renderer = TypstRenderer()
+
+    path = await renderer.render("letter/default.typ", {"n": 7}, "brief_fallback")
+    assert json.loads(path.read_text())["n"] == 7
+
+
+async def test_render_cache_serves_identical_payload(typst_env, monkeypatch):
+    from app.services.render_cache import get_render_cache
+
+    renderer = TypstRenderer()
+    first = await renderer.render("invoice/default.typ", {"n": 1}, "rechnung_a")
+
+    # Zweiter Aufruf darf Typst nicht mehr benötigen
+    monkeypatch.setenv("FAKE_TYPST_FAIL", "1")
+    second = await renderer.render("invoice/default.typ", {"n": 1}, "rechnung_b")
+
+    assert second.read_bytes() == first.read_bytes()
+    stats = get_render_cache().stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+async def test_render_over_cache_hit_keeps_cache_entry(typst_env):
+    from app.services.render_cache import get_render_cache
+
+    renderer = TypstRenderer()
+    await renderer.render("invoice/default.typ", {"n": 1}, "rechnung_a")
+    path = await renderer.render("invoice/default.typ", {"n": 1}, "rechnung_b")
+    original = path.read_bytes()
+
+    # Neu-Generierung mit geänderten Daten an dieselbe Stelle
+    await renderer.render("invoice/default.typ", {"n": 2}, "rechnung_b")
+    assert json.loads(path.read_text())["n"] == 2
+
+    cache = get_render_cache()
+    key = await cache.key(renderer.templates_dir / "invoice/default.typ", {"n": 1})
+    entry = await cache.lookup(key, ".pdf")
+    assert entry.read_bytes() == original
+
+
+async def test_render_cache_key_tracks_template_changes(typst_env):
+    from app.services.render_cache import get_render_cache
+
+    cache = get_render_cache()
+    template = typst_env / "templates" / "letter" / "default.typ"
+    before = await cache.key(template, {"a": 1, "b": 2})
+
+    assert await cache.key(template, {"b": 2, "a": 1}) == before
+    template.write_text("// geändert\n")
+    assert await cache.key(template, {"a": 1, "b": 2}) != before
+
+
+async def test_render_cache_key_reads_templates_only_when_changed(typst_env, monkeypatch):
+    from pathlib import Path
+    from app.services.render_cache import get_render_cache
+
+    cache = get_render_cache()
+    template = typst_env / "templates" / "letter" / "default.typ"
+    before = await cache.key(template, {"a": 1})
+
+    def no_reads(self):
+        raise AssertionError(f"{self} erneut gelesen")
+
+    monkeypatch.setattr(Path, "read_bytes", no_reads)
+    assert await cache.key(template, {"a": 2}) != before
+    assert await cache.key(template, {"a": 1}) == before
+    assert not cache.root.is_relative_to(get_settings().typst.output_dir)
+
+
+async def test_render_cache_key_tracks_binary_from_path(typst_env, monkeypatch):
+    import os
+    from pathlib import Path
+    from app.services.render_cache import get_render_cache
+
+    binary = Path(get_settings().typst.binary)
+    monkeypatch.setenv("PATH", f"{binary.parent}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(get_settings().typst, "binary", "typst")
+    cache = get_render_cache()
+    template = typst_env / "templates" / "letter" / "default.typ"
+    before = await cache.key(template, {"a": 1})
+
+    # Update des Compilers im PATH, Konfiguration unverändert
+    binary.write_text(binary.read_text().replace("0.0.0", "0.0.1"))
+    assert await cache.key(template, {"a": 1}) != before
+
+
+async def test_render_cache_evicts_least_recently_used(typst_env):
+    from app.services.render_cache import RenderCache
+
+    cache = RenderCache(typst_env / "lru", max_bytes=250)
+    source = typst_env / "payload.pdf"
+    source.write_bytes(b"x" * 100)
+
+    for key in ("aa1", "bb2"):
+        await cache.put(key, source)
+    assert await cache.get("aa1", typst_env / "hit.pdf")
+    await cache.put("cc3", source)
+
+    remaining = {p.stem for p in cache._entries()}
+    assert remaining == {"aa1", "cc3"}
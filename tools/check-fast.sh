@@ -20,5 +20,28 @@ echo "[check-fast] contacts tests"
 cd "${ROOT}"
 PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_contacts_regressions.py
 
+echo "[check-fast] renderer tests"
+cd "${ROOT}"
+PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_typst_renderer.py
+
+echo "[check-fast] documents tests"
+cd "${ROOT}"
+PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_documents.py
+
+echo "[check-fast] service client tests"
+cd "${ROOT}"
+PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_ollama_client.py tests/test_health_monitor.py tests/test_archive.py
+
+echo "[check-fast] query plan and search tests"
+cd "${ROOT}"
+PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_query_plans.py tests/test_search.py
+
+echo "[check-fast] migration tests"
+cd "${ROOT}"
+PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_migrations.py
+
+echo "[check-fast] money tests"
+cd "${ROOT}"
+PYTHONPATH=/opt/korrespondenz "${ROOT}/.venv/bin/python" -m pytest -q tests/test_money.py
 
 echo "[check-fast] OK"